@@ -0,0 +1,218 @@
+import asyncio
+import csv
+import io
+import os
+import tempfile
+import time
+
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
+from pydantic import BaseModel
+from starlette.background import BackgroundTask
+
+from cnpj_core import (
+    normalizar_cnpj, cnpj_valido, consultar_cnpj, montar_linha_csv, build_csv_bytes, CSV_COLS,
+    consultar_cnpj_lote, iterar_lote, validar_cnpjs, LOTE_CSV_COLS, LOTE_MAX_SINCRONO, METRICAS, consultar_grupo,
+    build_csv_grupo,
+    FORMATOS_EXPORTACAO, exportar_linhas, formatos_disponiveis, get_fila_jobs,
+)
+from cnpj_core.exportacao import csv_cell
+from cnpj_core.lote import processar_cnpj_lote
+
+# ---------- API HTTP/JSON (sem Streamlit) ----------
+# uvicorn api:app --host 0.0.0.0 --port 8000   (a partir de consulta_cnpj_app/)
+# Requisições simultâneas para o mesmo CNPJ compartilham um único fetch upstream
+# (coalescência feita em cnpj_core.consulta).
+
+
+app = FastAPI(title="Consulta CNPJ", version="1.0")
+
+
+@app.middleware("http")
+async def medir_requisicao(request: Request, call_next):
+    inicio = time.perf_counter()
+    resposta = await call_next(request)
+    rota = request.scope.get("route")
+    METRICAS.observar(
+        "cnpj_etapa_segundos", time.perf_counter() - inicio,
+        etapa="api", rota=getattr(rota, "path", "desconhecida"), status=resposta.status_code,
+    )
+    return resposta
+
+
+class PedidoLote(BaseModel):
+    cnpjs: list[str]
+
+
+def _validar(cnpj: str) -> str:
+    cnpj_limpo = normalizar_cnpj(cnpj)
+    if len(cnpj_limpo) != 14:
+        raise HTTPException(status_code=422, detail="CNPJ deve conter exatamente 14 caracteres alfanuméricos.")
+    if not cnpj_valido(cnpj_limpo):
+        raise HTTPException(status_code=422, detail="CNPJ inválido: dígitos verificadores não conferem.")
+    return cnpj_limpo
+
+def _resultado_publico(resultado: dict) -> dict:
+    dados = resultado.get("dados")
+    if dados is None:
+        return resultado
+    publico = dict(resultado)
+    publico["fonte"] = dados.get("__fonte")
+    publico["dados"] = {k: v for k, v in dados.items() if not k.startswith("__")}
+    return publico
+
+def _linha_csv_stream(rows, colunas):
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=colunas, extrasaction="ignore")
+    buf.write("\ufeff")
+    writer.writeheader()
+    yield buf.getvalue()
+    for row in rows:
+        buf.seek(0)
+        buf.truncate()
+        writer.writerow({k: csv_cell(row.get(k)) for k in colunas})
+        yield buf.getvalue()
+
+
+@app.get("/saude")
+async def saude():
+    return {"status": "ok"}
+
+
+@app.get("/metricas")
+async def metricas(formato: str = Query("prometheus", pattern="^(prometheus|json)$")):
+    # Formato texto do Prometheus (scrape) ou resumo JSON com p50/p95/p99 por série
+    if formato == "json":
+        return METRICAS.resumo()
+    return PlainTextResponse(METRICAS.exposicao_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/cnpj/{cnpj}")
+async def consultar(cnpj: str, formato: str = Query("json", pattern="^(json|csv)$")):
+    cnpj_limpo = _validar(cnpj)
+    resultado = await asyncio.to_thread(consultar_cnpj, cnpj_limpo)
+    if resultado["erro"] == "not_found":
+        raise HTTPException(status_code=404, detail="CNPJ não encontrado.")
+    if resultado["erro"]:
+        raise HTTPException(status_code=503, detail="Serviço temporariamente indisponível.")
+    if formato == "csv":
+        row = montar_linha_csv(resultado["dados"], resultado["regime"], resultado["ies"])
+        return Response(
+            build_csv_bytes(row, CSV_COLS),
+            media_type="text/csv",
+            headers={"Content-Disposition": f'attachment; filename="CNPJ_{cnpj_limpo}.csv"'},
+        )
+    return _resultado_publico(resultado)
+
+
+@app.get("/empresa/{entrada}")
+async def consultar_empresa(entrada: str, formato: str = Query("json", pattern="^(json|csv)$"), ies: bool = True):
+    # Matriz + filiais de uma raiz (ou de qualquer CNPJ dela), com o regime resolvido pela matriz
+    grupo = await asyncio.to_thread(consultar_grupo, entrada, None, ies)
+    if grupo["erro"] == "invalid":
+        raise HTTPException(status_code=422, detail="Informe um CNPJ válido ou a raiz de 8 caracteres.")
+    if grupo["erro"] == "not_found":
+        raise HTTPException(status_code=404, detail="Nenhum estabelecimento encontrado para esta raiz.")
+    if grupo["erro"]:
+        raise HTTPException(status_code=503, detail="Serviço temporariamente indisponível.")
+    if formato == "csv":
+        return Response(
+            build_csv_grupo(grupo),
+            media_type="text/csv",
+            headers={"Content-Disposition": f'attachment; filename="CNPJ_raiz_{grupo["raiz"]}.csv"'},
+        )
+    publico = dict(grupo)
+    publico["estabelecimentos"] = [_resultado_publico(e) for e in grupo["estabelecimentos"]]
+    return publico
+
+
+def _exportar_lote_arquivo(cnpjs: list, formato: str) -> str:
+    # Parquet/Arrow/XLSX precisam do arquivo inteiro antes do envio: gravado em
+    # disco por row groups e apagado depois que a resposta termina
+    fd, caminho = tempfile.mkstemp(prefix="lote_cnpj_", suffix=FORMATOS_EXPORTACAO[formato]["extensao"])
+    os.close(fd)
+    try:
+        exportar_linhas(iterar_lote(cnpjs, processar=processar_cnpj_lote), LOTE_CSV_COLS, formato, caminho)
+    except BaseException:
+        os.unlink(caminho)
+        raise
+    return caminho
+
+
+@app.post("/cnpj/lote")
+async def consultar_lote(pedido: PedidoLote, formato: str = Query("json", pattern="^(json|csv|parquet|arrow|xlsx)$")):
+    colunas = validar_cnpjs(pedido.cnpjs) if pedido.cnpjs else {"cnpj": [], "valido": []}
+    cnpjs = list(dict.fromkeys(c for c, ok in zip(colunas["cnpj"], colunas["valido"]) if ok))
+    if not cnpjs:
+        raise HTTPException(status_code=422, detail="Nenhum CNPJ válido no pedido.")
+    if formato not in ("json", "csv") and formato not in formatos_disponiveis():
+        raise HTTPException(status_code=501, detail=f"Formato {formato} indisponível neste servidor.")
+    if len(cnpjs) > LOTE_MAX_SINCRONO:
+        # Lote grande vira job na fila (cnpj_core.jobs): 202 com os links de status e resultado
+        fila = get_fila_jobs()
+        job_id = await asyncio.to_thread(fila.criar, cnpjs, "api", "csv" if formato == "json" else formato)
+        await asyncio.to_thread(fila.garantir_workers)
+        return JSONResponse(status_code=202, content={
+            "job": job_id,
+            "total": len(cnpjs),
+            "status": f"/jobs/{job_id}",
+            "resultados": f"/jobs/{job_id}/resultados",
+            "arquivo": f"/jobs/{job_id}/arquivo",
+        })
+    if formato == "csv":
+        # Gerador síncrono: o Starlette o consome em threadpool e envia cada linha ao terminar
+        return StreamingResponse(
+            _linha_csv_stream(iterar_lote(cnpjs, processar=processar_cnpj_lote), LOTE_CSV_COLS),
+            media_type="text/csv",
+            headers={"Content-Disposition": 'attachment; filename="CNPJ_lote.csv"'},
+        )
+    if formato != "json":
+        caminho = await asyncio.to_thread(_exportar_lote_arquivo, cnpjs, formato)
+        return FileResponse(
+            caminho,
+            media_type=FORMATOS_EXPORTACAO[formato]["mime"],
+            filename=f"CNPJ_lote{FORMATOS_EXPORTACAO[formato]['extensao']}",
+            background=BackgroundTask(os.unlink, caminho),
+        )
+    resultados = await asyncio.to_thread(lambda: list(iterar_lote(cnpjs, processar=consultar_cnpj_lote)))
+    return {"total": len(resultados), "resultados": [_resultado_publico(r) for r in resultados]}
+
+
+def _job_ou_404(job_id: str) -> dict:
+    job = get_fila_jobs().status(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado.")
+    return job
+
+
+@app.get("/jobs/{job_id}")
+async def status_job(job_id: str):
+    return await asyncio.to_thread(_job_ou_404, job_id)
+
+
+@app.get("/jobs/{job_id}/resultados")
+async def resultados_job(job_id: str):
+    # Linhas já concluídas (mesmas colunas do CSV do lote); parcial enquanto o job roda
+    job = await asyncio.to_thread(_job_ou_404, job_id)
+    linhas = await asyncio.to_thread(lambda: list(get_fila_jobs().linhas(job_id)))
+    return {"job": job_id, "estado": job["estado"], "total": job["total"], "resultados": linhas}
+
+
+@app.get("/jobs/{job_id}/arquivo")
+async def arquivo_job(job_id: str):
+    # Exporta o que já está pronto; com o job ainda executando o arquivo é parcial
+    job = await asyncio.to_thread(_job_ou_404, job_id)
+    extensao = FORMATOS_EXPORTACAO[job["formato"]]["extensao"]
+    fd, caminho = tempfile.mkstemp(prefix="job_cnpj_", suffix=extensao)
+    os.close(fd)
+    try:
+        await asyncio.to_thread(get_fila_jobs().exportar, job_id, caminho)
+    except BaseException:
+        os.unlink(caminho)
+        raise
+    return FileResponse(
+        caminho,
+        media_type=FORMATOS_EXPORTACAO[job["formato"]]["mime"],
+        filename=f"CNPJ_job_{job_id}{extensao}",
+        background=BackgroundTask(os.unlink, caminho),
+    )
@@ -0,0 +1,261 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from .stub_upstream import StubUpstream, adicionar_argumentos, config_de_argumentos
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# ---------- benchmark de carga contra o stub local dos provedores ----------
+# python -m benchmarks.bench_carga [-n 500] [--concorrencia 16] [--latencia-ms 80]
+#        [--taxa-erro 0.02] [--rajada-429-a-cada 5 --rajada-429-duracao 0.5]
+#        [--json resultado.json] [--comparar resultado_anterior.json]
+# (a partir de consulta_cnpj_app/)
+#
+# Sobe o stub, aponta os provedores para ele via variáveis de ambiente e usa um
+# cache SQLite temporário; só então importa cnpj_core (URLs, cotas e caminho do
+# cache são lidos na importação). Cenários: dados frio/quente, IEs frio/quente,
+# montagem de CSV e consulta em lote.
+
+
+def gerar_cnpjs_validos(n: int, seed: int) -> list:
+    from cnpj_core.validacao import calcular_dvs, caracteres_para_str, TABELA_VALOR
+    rng = np.random.default_rng(seed)
+    base = rng.integers(48, 58, size=(n, 12)).astype(np.uint32)
+    base[:, 8:12] = [48, 48, 48, 49]  # matrizes: evita a consulta extra da matriz no lote
+    dvs = calcular_dvs(TABELA_VALOR[base]).astype(np.uint32) + 48
+    return list(dict.fromkeys(caracteres_para_str(np.concatenate([base, dvs], axis=1)).tolist()))
+
+
+def percentis_ms(latencias: list) -> dict:
+    if not latencias:
+        return {}
+    arr = np.asarray(latencias) * 1000
+    p50, p95, p99 = np.percentile(arr, [50, 95, 99])
+    return {
+        "p50": round(float(p50), 2), "p95": round(float(p95), 2), "p99": round(float(p99), 2),
+        "media": round(float(arr.mean()), 2), "max": round(float(arr.max()), 2),
+    }
+
+
+def _rss_pico_mb() -> float:
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(pico / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _delta_cache(antes: dict, depois: dict) -> dict:
+    chaves = ("hit", "hit_negativo", "stale", "miss", "erro", "despejos")
+    delta = {k: depois.get(k, 0) - antes.get(k, 0) for k in chaves}
+    consultas = delta["hit"] + delta["hit_negativo"] + delta["stale"] + delta["miss"]
+    delta["taxa_acerto"] = round((consultas - delta["miss"]) / consultas, 4) if consultas else 0.0
+    return delta
+
+
+def executar_cenario(nome: str, itens: list, funcao, classificar, concorrencia: int, stub, medir_memoria: bool,
+                     exibir: bool = True) -> dict:
+    from cnpj_core import get_cache
+    from cnpj_core.consulta import COALESCEDOR
+
+    def medido(item):
+        inicio = time.perf_counter()
+        resultado = funcao(item)
+        return time.perf_counter() - inicio, classificar(resultado)
+
+    cache_antes = get_cache().estatisticas()
+    coalescidas_antes = COALESCEDOR.coalescidas
+    stub.zerar_contadores()
+    if medir_memoria:
+        tracemalloc.start()
+    inicio = time.perf_counter()
+    if concorrencia > 1:
+        with ThreadPoolExecutor(max_workers=concorrencia, thread_name_prefix="bench") as pool:
+            medicoes = list(pool.map(medido, itens))
+    else:
+        medicoes = [medido(item) for item in itens]
+    duracao = time.perf_counter() - inicio
+    memoria_pico = None
+    if medir_memoria:
+        memoria_pico = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 2)
+        tracemalloc.stop()
+
+    resultados = {}
+    for _, classe in medicoes:
+        resultados[classe] = resultados.get(classe, 0) + 1
+    relatorio = {
+        "n": len(itens),
+        "concorrencia": concorrencia,
+        "duracao_s": round(duracao, 3),
+        "rps": round(len(itens) / duracao, 1) if duracao else None,
+        "latencia_ms": percentis_ms([lat for lat, _ in medicoes]),
+        "resultados": resultados,
+        "cache": _delta_cache(cache_antes, get_cache().estatisticas()),
+        "coalescidas": COALESCEDOR.coalescidas - coalescidas_antes,
+        "upstream": {p: {str(s): q for s, q in sorted(st.items())} for p, st in stub.contadores.items()},
+        "memoria_pico_mb": memoria_pico,
+    }
+    lat = relatorio["latencia_ms"]
+    if exibir:
+        print(f"{nome:>14}: {relatorio['rps']:>8} req/s | p50 {lat.get('p50')}ms p95 {lat.get('p95')}ms "
+              f"p99 {lat.get('p99')}ms | cache {relatorio['cache']['taxa_acerto']:.0%} | {resultados}")
+    return relatorio
+
+
+def _classificar_dados(dados) -> str:
+    if isinstance(dados, dict) and "cnpj" in dados:
+        return "ok"
+    return (dados or {}).get("__error") or "unavailable"
+
+
+def _classificar_ies(ies) -> str:
+    if ies is None:
+        return "unavailable"
+    return "ok" if ies else "vazio"
+
+
+def _classificar_linha(row) -> str:
+    from cnpj_core.lote import LOTE_STATUS_COL
+    status = row.get(LOTE_STATUS_COL, "")
+    return "ok" if status.startswith("OK") else status or "?"
+
+
+def _versao() -> str:
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"], capture_output=True, text=True,
+            cwd=Path(__file__).resolve().parent, timeout=5,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def comparar(atual: dict, anterior: dict):
+    print(f"\ncomparação com {anterior.get('versao')} ({anterior.get('data')}):")
+    for nome, cen in atual["cenarios"].items():
+        base = anterior.get("cenarios", {}).get(nome)
+        if not base:
+            continue
+        linha = [f"{nome:>14}:"]
+        if cen.get("rps") and base.get("rps"):
+            linha.append(f"rps {(cen['rps'] / base['rps'] - 1):+.1%}")
+        for p in ("p50", "p95", "p99"):
+            a, b = cen["latencia_ms"].get(p), base.get("latencia_ms", {}).get(p)
+            if a is not None and b:
+                linha.append(f"{p} {(a / b - 1):+.1%}")
+        print(" ".join(linha))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de carga com stub local das APIs de CNPJ.")
+    parser.add_argument("-n", type=int, default=500, help="CNPJs distintos por cenário")
+    parser.add_argument("--n-lote", type=int, default=None, help="CNPJs do cenário de lote (padrão: -n)")
+    parser.add_argument("--concorrencia", type=int, default=16, help="threads clientes simultâneas")
+    parser.add_argument("--cota", type=float, default=1000.0,
+                        help="consultas/s permitidas por provedor no cliente HTTP (0 mantém as cotas reais)")
+    parser.add_argument("--tracemalloc", action="store_true", help="mede o pico de memória Python por cenário")
+    parser.add_argument("--json", help="grava os resultados neste arquivo")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior para comparar")
+    adicionar_argumentos(parser)
+    args = parser.parse_args(argv)
+
+    stub = StubUpstream(config_de_argumentos(args)).iniciar()
+    tmp = tempfile.TemporaryDirectory(prefix="bench_carga_")
+    os.environ.update(stub.variaveis_ambiente())
+    os.environ["CNPJ_CACHE_PATH"] = str(Path(tmp.name) / "cache.sqlite3")
+    os.environ["CNPJ_INDICE_PATH"] = str(Path(tmp.name) / "sem_indice.sqlite3")
+    if args.cota:
+        for provedor in ("BRASILAPI", "OPEN_CNPJA", "RECEITAWS"):
+            os.environ[f"CNPJ_RATE_{provedor}"] = str(args.cota)
+            os.environ[f"CNPJ_BURST_{provedor}"] = str(max(1, args.concorrencia))
+
+    from cnpj_core import consulta_brasilapi_cnpj, consulta_ie_open_cnpja, montar_linha_csv, build_csv_bytes, CSV_COLS
+    from cnpj_core.lote import iterar_lote, processar_cnpj_lote, LOTE_MAX_WORKERS
+
+    cnpjs = gerar_cnpjs_validos(args.n, args.seed)
+    cnpjs_lote = gerar_cnpjs_validos(args.n_lote or args.n, args.seed + 1)
+    c = args.concorrencia
+    cenarios = {}
+    try:
+        cenarios["dados_frio"] = executar_cenario(
+            "dados_frio", cnpjs, consulta_brasilapi_cnpj, _classificar_dados, c, stub, args.tracemalloc)
+        cenarios["dados_quente"] = executar_cenario(
+            "dados_quente", cnpjs, consulta_brasilapi_cnpj, _classificar_dados, c, stub, args.tracemalloc)
+        cenarios["ies_frio"] = executar_cenario(
+            "ies_frio", cnpjs, consulta_ie_open_cnpja, _classificar_ies, c, stub, args.tracemalloc)
+        cenarios["ies_quente"] = executar_cenario(
+            "ies_quente", cnpjs, consulta_ie_open_cnpja, _classificar_ies, c, stub, args.tracemalloc)
+
+        def montar_csv(cnpj):
+            dados = consulta_brasilapi_cnpj(cnpj)
+            if "cnpj" not in dados:
+                return None
+            return build_csv_bytes(montar_linha_csv(dados, "SIMPLES NACIONAL", consulta_ie_open_cnpja(cnpj)), CSV_COLS)
+
+        cenarios["csv"] = executar_cenario(
+            "csv", cnpjs, montar_csv, lambda b: "ok" if b else "sem_dados", 1, stub, args.tracemalloc)
+
+        # Lote: a latência por CNPJ é medida dentro do processamento; a vazão é a do lote inteiro
+        latencias, linhas = [], []
+
+        def processar_medindo(cnpj):
+            inicio = time.perf_counter()
+            row = processar_cnpj_lote(cnpj)
+            latencias.append(time.perf_counter() - inicio)
+            return row
+
+        def rodar_lote(lista):
+            linhas.extend(iterar_lote(lista, processar=processar_medindo))
+            return linhas
+
+        relatorio = executar_cenario(
+            "lote", [cnpjs_lote], rodar_lote, lambda rows: "concluido", 1, stub, args.tracemalloc, exibir=False)
+        relatorio["n"] = len(cnpjs_lote)
+        relatorio["concorrencia"] = LOTE_MAX_WORKERS
+        relatorio["rps"] = round(len(cnpjs_lote) / relatorio["duracao_s"], 1)
+        relatorio["latencia_ms"] = percentis_ms(latencias)
+        classes = {}
+        for row in linhas:
+            classes[_classificar_linha(row)] = classes.get(_classificar_linha(row), 0) + 1
+        relatorio["resultados"] = classes
+        cenarios["lote"] = relatorio
+        print(f"{'lote':>14}: {relatorio['rps']} CNPJs/s com {LOTE_MAX_WORKERS} workers | "
+              f"p95 por CNPJ {relatorio['latencia_ms'].get('p95')}ms | {classes}")
+    finally:
+        stub.parar()
+
+    resultado = {
+        "versao": _versao(),
+        "data": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "parametros": {k: v for k, v in vars(args).items() if k not in ("json", "comparar")},
+        "cenarios": cenarios,
+        "memoria_rss_pico_mb": _rss_pico_mb(),
+    }
+    print(f"pico de RSS do processo: {resultado['memoria_rss_pico_mb']} MB")
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            comparar(resultado, json.load(f))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+    tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
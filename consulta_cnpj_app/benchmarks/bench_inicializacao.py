@@ -0,0 +1,135 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+# ---------- benchmark de inicialização (cold start) ----------
+# python -m benchmarks.bench_inicializacao [--amostras 7] [--json resultado.json]
+#        [--comparar resultado_anterior.json] [--perfil]
+# (a partir de consulta_cnpj_app/)
+#
+# Cada amostra roda num processo novo: mede o import de cnpj_core, a primeira
+# execução completa do script Streamlit (AppTest, sem navegador nem rede) e um
+# rerun. Antes do cronômetro um script vazio roda uma vez (imports do próprio
+# Streamlit) e a varredura de manifests de componentes v2, que o AppTest refaz a
+# cada run, é desligada: são custos do Streamlit, iguais em qualquer versão do
+# app, e ficariam misturados à medida.
+
+APP_DIR = Path(__file__).resolve().parent.parent
+
+_MEDIR_IMPORT = """
+import json, sys, time
+inicio = time.perf_counter()
+import cnpj_core
+print(json.dumps({"import_cnpj_core_ms": (time.perf_counter() - inicio) * 1000}))
+"""
+
+_MEDIR_APP = """
+import json, sys, time
+from streamlit.components.v2 import manifest_scanner
+from streamlit.testing.v1 import AppTest
+manifest_scanner.scan_component_manifests = lambda *a, **k: []
+AppTest.from_string("import streamlit as st").run()
+antes = set(sys.modules)
+at = AppTest.from_file(sys.argv[1], default_timeout=60)
+inicio = time.perf_counter()
+at.run()
+primeira = (time.perf_counter() - inicio) * 1000
+inicio = time.perf_counter()
+at.run()
+rerun = (time.perf_counter() - inicio) * 1000
+novos = set(sys.modules) - antes
+print(json.dumps({
+    "primeira_renderizacao_ms": primeira,
+    "rerun_ms": rerun,
+    "modulos_carregados": len(novos),
+    "numpy_carregado": "numpy" in novos,
+    "requests_carregado": "requests" in novos,
+    "excecoes": len(at.exception),
+}))
+"""
+
+
+def _rodar(codigo: str, *args, env=None) -> dict:
+    saida = subprocess.run(
+        [sys.executable, "-c", codigo, *args], capture_output=True, text=True, cwd=APP_DIR, env=env, check=True,
+    ).stdout
+    return json.loads(saida.strip().splitlines()[-1])
+
+
+def medir(amostras: int) -> dict:
+    tmp = tempfile.TemporaryDirectory(prefix="bench_inicializacao_")
+    env = dict(os.environ, CNPJ_CACHE_PATH=str(Path(tmp.name) / "cache.sqlite3"),
+               CNPJ_INDICE_PATH=str(Path(tmp.name) / "sem_indice.sqlite3"))
+    medidas = []
+    for _ in range(amostras):
+        m = _rodar(_MEDIR_IMPORT, env=env)
+        m.update(_rodar(_MEDIR_APP, str(APP_DIR / "consulta_cnpj.py"), env=env))
+        medidas.append(m)
+    tmp.cleanup()
+    resultado = {}
+    for chave in ("import_cnpj_core_ms", "primeira_renderizacao_ms", "rerun_ms"):
+        valores = [m[chave] for m in medidas]
+        resultado[chave] = {"mediana": round(statistics.median(valores), 1), "min": round(min(valores), 1)}
+    for chave in ("modulos_carregados", "numpy_carregado", "requests_carregado", "excecoes"):
+        resultado[chave] = medidas[-1][chave]
+    return resultado
+
+
+def perfil_imports(limite: int = 15):
+    # Maiores tempos cumulativos (python -X importtime) dos nomes que a tela inicial
+    # usa; o que o interpretador carrega até o "site" fica de fora
+    saida = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "from cnpj_core import consultar_cnpj, get_cache"],
+        capture_output=True, text=True, cwd=APP_DIR,
+    ).stderr
+    linhas = []
+    depois_do_site = False
+    for linha in saida.splitlines():
+        partes = linha.split("|")
+        if len(partes) != 3 or not partes[1].strip().isdigit():
+            continue
+        if not depois_do_site:
+            depois_do_site = partes[2].strip() == "site" and not partes[2].startswith("  ", 1)
+            continue
+        linhas.append((int(partes[1]), partes[2].rstrip()))
+    print("\nimports mais caros da consulta individual (cumulativo):")
+    for micros, modulo in sorted(linhas, reverse=True)[:limite]:
+        print(f"{micros / 1000:>8.1f} ms {modulo}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mede o tempo até a primeira renderização do app.")
+    parser.add_argument("--amostras", type=int, default=7)
+    parser.add_argument("--json", help="grava os resultados neste arquivo")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior para comparar")
+    parser.add_argument("--perfil", action="store_true", help="lista os imports mais caros de cnpj_core")
+    args = parser.parse_args(argv)
+
+    resultado = medir(args.amostras)
+    for chave, valor in resultado.items():
+        if isinstance(valor, dict):
+            print(f"{chave:>26}: mediana {valor['mediana']} ms (mín {valor['min']} ms)")
+        else:
+            print(f"{chave:>26}: {valor}")
+    if args.perfil:
+        perfil_imports()
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            anterior = json.load(f)
+        print("\ncomparação (mediana):")
+        for chave, valor in resultado.items():
+            if isinstance(valor, dict) and isinstance(anterior.get(chave), dict) and anterior[chave]["mediana"]:
+                print(f"{chave:>26}: {anterior[chave]['mediana']} → {valor['mediana']} ms "
+                      f"({valor['mediana'] / anterior[chave]['mediana'] - 1:+.0%})")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
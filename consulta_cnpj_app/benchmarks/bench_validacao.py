@@ -0,0 +1,70 @@
+import argparse
+import json
+import time
+
+import numpy as np
+
+from cnpj_core.cnpj import cnpj_valido
+from cnpj_core.validacao import calcular_dvs, caracteres_para_str, validar_cnpjs, TABELA_VALOR
+
+# ---------- benchmark: validação numérica x alfanumérica ----------
+# python -m benchmarks.bench_validacao [-n 1000000] [--json resultado.json]
+# (a partir de consulta_cnpj_app/)
+
+ALFABETO_NUMERICO = np.frombuffer(b"0123456789", dtype=np.uint8).astype(np.uint32)
+ALFABETO_ALFANUMERICO = np.frombuffer(b"0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ", dtype=np.uint8).astype(np.uint32)
+
+
+def gerar_cnpjs(n: int, alfabeto: np.ndarray, seed: int = 0) -> list:
+    # CNPJs válidos e mascarados (XX.XXX.XXX/XXXX-XX)
+    rng = np.random.default_rng(seed)
+    base = alfabeto[rng.integers(0, len(alfabeto), size=(n, 12))]
+    dvs = calcular_dvs(TABELA_VALOR[base]).astype(np.uint32) + 48
+    cnpjs = caracteres_para_str(np.concatenate([base, dvs], axis=1))
+    return [f"{c[0:2]}.{c[2:5]}.{c[5:8]}/{c[8:12]}-{c[12:14]}" for c in cnpjs.tolist()]
+
+
+def medir(funcao, repeticoes: int = 3) -> float:
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark da validação vetorizada de CNPJs.")
+    parser.add_argument("-n", type=int, default=1_000_000, help="quantidade de identificadores por formato")
+    parser.add_argument("--amostra-escalar", type=int, default=100_000, help="tamanho da amostra do laço Python")
+    parser.add_argument("--json", help="grava os resultados neste arquivo")
+    args = parser.parse_args(argv)
+
+    resultados = {"n": args.n, "formatos": {}}
+    for nome, alfabeto in (("numerico", ALFABETO_NUMERICO), ("alfanumerico", ALFABETO_ALFANUMERICO)):
+        cnpjs = gerar_cnpjs(args.n, alfabeto)
+        validos = validar_cnpjs(cnpjs)["valido"]
+        assert validos.all(), f"{nome}: {int((~validos).sum())} CNPJs gerados não validaram"
+        vetorizado = medir(lambda: validar_cnpjs(cnpjs))
+        amostra = cnpjs[:args.amostra_escalar]
+        escalar = medir(lambda: [cnpj_valido(c) for c in amostra], repeticoes=1) * (args.n / len(amostra))
+        resultados["formatos"][nome] = {
+            "vetorizado_s": round(vetorizado, 4),
+            "vetorizado_ids_por_s": round(args.n / vetorizado),
+            "escalar_estimado_s": round(escalar, 4),
+            "aceleracao": round(escalar / vetorizado, 1),
+        }
+        print(f"{nome:>13}: vetorizado {vetorizado:.3f}s ({args.n / vetorizado:,.0f} ids/s) | "
+              f"laço Python ~{escalar:.3f}s | {escalar / vetorizado:.1f}x")
+
+    num = resultados["formatos"]["numerico"]["vetorizado_s"]
+    alfa = resultados["formatos"]["alfanumerico"]["vetorizado_s"]
+    resultados["razao_alfanumerico_numerico"] = round(alfa / num, 3)
+    print(f"alfanumérico / numérico: {alfa / num:.2f}x")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+import argparse
+import copy
+import json
+import random
+import threading
+import time
+import zlib
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from pathlib import Path
+
+# ---------- stub local dos provedores (BrasilAPI / open.cnpja / ReceitaWS) ----------
+# Reproduz os payloads gravados em benchmarks/payloads/ trocando o CNPJ pelo da URL,
+# com latência, taxa de erro, "não encontrado" e rajadas de 429 configuráveis.
+# Rotas: /brasilapi/<cnpj>, /open_cnpja/<cnpj>, /receitaws/<cnpj>
+#
+# python -m benchmarks.stub_upstream --porta 8765 --latencia-ms 80 --taxa-erro 0.02
+# (a partir de consulta_cnpj_app/); depois aponte CNPJ_BRASILAPI_URL etc. para ele.
+
+PAYLOADS_DIR = Path(__file__).resolve().parent / "payloads"
+
+
+def _carregar_payload(nome: str) -> dict:
+    with open(PAYLOADS_DIR / f"{nome}.json", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _payload_brasilapi(modelo: dict, cnpj: str) -> dict:
+    dados = copy.deepcopy(modelo)
+    dados["cnpj"] = cnpj
+    dados["razao_social"] = f"{modelo['razao_social']} {cnpj[:8]}"
+    eh_matriz = cnpj[8:12] == "0001"
+    dados["identificador_matriz_filial"] = 1 if eh_matriz else 2
+    dados["descricao_identificador_matriz_filial"] = "MATRIZ" if eh_matriz else "FILIAL"
+    return dados
+
+
+def _payload_open_cnpja(modelo: dict, cnpj: str) -> dict:
+    dados = copy.deepcopy(modelo)
+    dados["taxId"] = cnpj
+    dados["head"] = cnpj[8:12] == "0001"
+    dados["company"]["name"] = f"{modelo['company']['name']} {cnpj[:8]}"
+    return dados
+
+
+def _payload_receitaws(modelo_brasilapi: dict, cnpj: str) -> dict:
+    # Não há gravação da ReceitaWS: o formato é derivado do payload da BrasilAPI
+    m = modelo_brasilapi
+    return {
+        "status": "OK",
+        "cnpj": f"{cnpj[0:2]}.{cnpj[2:5]}.{cnpj[5:8]}/{cnpj[8:12]}-{cnpj[12:14]}",
+        "nome": f"{m['razao_social']} {cnpj[:8]}",
+        "fantasia": m.get("nome_fantasia"),
+        "situacao": m.get("descricao_situacao_cadastral"),
+        "abertura": "02/03/2015",
+        "atividade_principal": [{"code": "62.01-5-01", "text": m.get("cnae_fiscal_descricao")}],
+        "atividades_secundarias": [{"code": str(a["codigo"]), "text": a["descricao"]} for a in m.get("cnaes_secundarios", [])],
+        "porte": m.get("porte"),
+        "natureza_juridica": m.get("natureza_juridica"),
+        "capital_social": str(m.get("capital_social")),
+        "uf": m.get("uf"),
+        "municipio": m.get("municipio"),
+        "cep": m.get("cep"),
+        "qsa": [{"nome": q["nome_socio"], "qual": q["qualificacao_socio"]} for q in m.get("qsa", [])],
+        "simples": {"optante": m.get("opcao_pelo_simples")},
+        "simei": {"optante": m.get("opcao_pelo_mei")},
+    }
+
+
+class ConfigStub:
+    def __init__(self, latencia_ms: float = 50, jitter_ms: float = 20, taxa_erro: float = 0.0,
+                 taxa_nao_encontrado: float = 0.0, rajada_429_a_cada: float = 0.0,
+                 rajada_429_duracao: float = 0.0, retry_after: float = 1.0, seed: int = 0):
+        self.latencia_ms = latencia_ms
+        self.jitter_ms = jitter_ms
+        self.taxa_erro = taxa_erro                      # fração de respostas 503
+        self.taxa_nao_encontrado = taxa_nao_encontrado  # fração de CNPJs que dão 404 (determinística por CNPJ)
+        self.rajada_429_a_cada = rajada_429_a_cada      # segundos entre rajadas de 429 (0 desativa)
+        self.rajada_429_duracao = rajada_429_duracao    # duração de cada rajada, em segundos
+        self.retry_after = retry_after
+        self.seed = seed
+
+
+class StubUpstream:
+    def __init__(self, config: ConfigStub = None, host: str = "127.0.0.1", porta: int = 0):
+        self.config = config or ConfigStub()
+        self._modelos = {"brasilapi": _carregar_payload("brasilapi"), "open_cnpja": _carregar_payload("open_cnpja")}
+        self._rng = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+        self._inicio = time.monotonic()
+        self.contadores = {}
+        self._servidor = ThreadingHTTPServer((host, porta), self._handler())
+        self._servidor.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url_base(self) -> str:
+        host, porta = self._servidor.server_address[:2]
+        return f"http://{host}:{porta}"
+
+    def variaveis_ambiente(self) -> dict:
+        # Variáveis lidas por cnpj_core.provedores para trocar a URL de cada provedor
+        return {
+            "CNPJ_BRASILAPI_URL": f"{self.url_base}/brasilapi/",
+            "CNPJ_OPEN_CNPJA_URL": f"{self.url_base}/open_cnpja/",
+            "CNPJ_RECEITAWS_URL": f"{self.url_base}/receitaws/",
+        }
+
+    def iniciar(self) -> "StubUpstream":
+        self._inicio = time.monotonic()
+        self._thread = threading.Thread(target=self._servidor.serve_forever, name="stub-upstream", daemon=True)
+        self._thread.start()
+        return self
+
+    def parar(self):
+        self._servidor.shutdown()
+        self._servidor.server_close()
+
+    def alterar_payload(self, provedor: str, **campos):
+        # Troca campos do payload servido ("brasilapi" também alimenta a ReceitaWS),
+        # simulando uma alteração cadastral no upstream
+        with self._lock:
+            self._modelos[provedor].update(campos)
+
+    def zerar_contadores(self):
+        with self._lock:
+            self.contadores = {}
+
+    def _contar(self, provedor: str, status: int):
+        with self._lock:
+            por_status = self.contadores.setdefault(provedor, {})
+            por_status[status] = por_status.get(status, 0) + 1
+
+    def _em_rajada_429(self) -> bool:
+        c = self.config
+        if not c.rajada_429_a_cada or not c.rajada_429_duracao:
+            return False
+        return (time.monotonic() - self._inicio) % c.rajada_429_a_cada < c.rajada_429_duracao
+
+    def _nao_encontrado(self, cnpj: str) -> bool:
+        # Determinístico por CNPJ para que o cache negativo seja exercitado de forma estável
+        return self.config.taxa_nao_encontrado > 0 and (zlib.crc32(cnpj.encode()) % 10_000) < self.config.taxa_nao_encontrado * 10_000
+
+    def responder(self, provedor: str, cnpj: str):
+        c = self.config
+        with self._lock:
+            espera = max(0.0, c.latencia_ms + self._rng.uniform(-c.jitter_ms, c.jitter_ms)) / 1000
+            sorteio = self._rng.random()
+        time.sleep(espera)
+        if provedor not in ("brasilapi", "open_cnpja", "receitaws") or len(cnpj) != 14:
+            return 404, {}, {"message": "rota desconhecida"}
+        if self._em_rajada_429():
+            return 429, {"Retry-After": f"{c.retry_after:g}"}, {"message": "Too Many Requests"}
+        if sorteio < c.taxa_erro:
+            return 503, {}, {"message": "Service Unavailable"}
+        if self._nao_encontrado(cnpj):
+            if provedor == "receitaws":
+                return 200, {}, {"status": "ERROR", "message": "CNPJ não encontrado"}
+            return 404, {}, {"message": "CNPJ não encontrado"}
+        if provedor == "brasilapi":
+            return 200, {}, _payload_brasilapi(self._modelos["brasilapi"], cnpj)
+        if provedor == "open_cnpja":
+            return 200, {}, _payload_open_cnpja(self._modelos["open_cnpja"], cnpj)
+        return 200, {}, _payload_receitaws(self._modelos["brasilapi"], cnpj)
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                partes = self.path.split("?")[0].strip("/").split("/")
+                provedor, cnpj = (partes + ["", ""])[:2]
+                status, cabecalhos, corpo = stub.responder(provedor, cnpj.upper())
+                stub._contar(provedor, status)
+                dados = json.dumps(corpo, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(dados)))
+                for nome, valor in cabecalhos.items():
+                    self.send_header(nome, valor)
+                self.end_headers()
+                self.wfile.write(dados)
+
+        return Handler
+
+
+def adicionar_argumentos(parser: argparse.ArgumentParser):
+    parser.add_argument("--latencia-ms", type=float, default=50, help="latência média por resposta")
+    parser.add_argument("--jitter-ms", type=float, default=20, help="variação uniforme em torno da média")
+    parser.add_argument("--taxa-erro", type=float, default=0.0, help="fração de respostas 503")
+    parser.add_argument("--taxa-nao-encontrado", type=float, default=0.0, help="fração de CNPJs com 404")
+    parser.add_argument("--rajada-429-a-cada", type=float, default=0.0, help="segundos entre rajadas de 429 (0 desativa)")
+    parser.add_argument("--rajada-429-duracao", type=float, default=0.0, help="duração de cada rajada de 429, em segundos")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="valor do Retry-After nas respostas 429")
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def config_de_argumentos(args) -> ConfigStub:
+    return ConfigStub(
+        latencia_ms=args.latencia_ms, jitter_ms=args.jitter_ms, taxa_erro=args.taxa_erro,
+        taxa_nao_encontrado=args.taxa_nao_encontrado, rajada_429_a_cada=args.rajada_429_a_cada,
+        rajada_429_duracao=args.rajada_429_duracao, retry_after=args.retry_after, seed=args.seed,
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stub local das APIs de CNPJ para benchmarks.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=8765)
+    adicionar_argumentos(parser)
+    args = parser.parse_args(argv)
+    stub = StubUpstream(config_de_argumentos(args), args.host, args.porta).iniciar()
+    for nome, valor in stub.variaveis_ambiente().items():
+        print(f"{nome}={valor}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        stub.parar()
+
+
+if __name__ == "__main__":
+    main()
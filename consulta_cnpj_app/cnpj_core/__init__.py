@@ -0,0 +1,66 @@
+import importlib
+
+# ---------- exports sob demanda ----------
+# Os nomes públicos são resolvidos no primeiro acesso (PEP 562): "import cnpj_core"
+# não carrega requests (via consulta/provedores), numpy (via validacao) nem os
+# módulos de lote/jobs até que algo realmente os use. O app e a API continuam
+# importando daqui normalmente (from cnpj_core import consultar_cnpj, ...).
+
+_EXPORTS = {
+    "cnpj": (
+        "only_digits",
+        "normalizar_cnpj",
+        "format_currency_brl",
+        "format_phone",
+        "format_cnpj_mask",
+        "calcular_digitos_verificadores_cnpj",
+        "cnpj_valido",
+        "to_matriz_if_filial",
+        "matriz_da_raiz",
+    ),
+    "regime": ("determinar_regime_unificado", "normalizar_situacao_cadastral", "regime_informado"),
+    "exportacao": (
+        "CSV_COLS",
+        "SITUACAO_CREDITO_TEXTO",
+        "join_ies_for_csv",
+        "montar_linha_csv",
+        "build_csv_bytes",
+        "build_csv_bytes_linhas",
+        "ies_estruturadas",
+    ),
+    "consulta": (
+        "get_cache",
+        "get_indice_local",
+        "consulta_brasilapi_cnpj",
+        "consulta_ie_open_cnpja",
+        "resolver_regime",
+        "fonte_regime",
+        "iniciar_consulta_paralela",
+        "aguardar_resultado",
+        "consultar_cnpj",
+    ),
+    "validacao": ("validar_cnpjs", "validar_cnpjs_df", "agrupar_por_raiz"),
+    "exportadores": ("FORMATOS_EXPORTACAO", "Exportador", "exportar_linhas", "formatos_disponiveis"),
+    "lote": ("extrair_cnpjs_lote", "consultar_cnpj_lote", "iterar_lote", "executar_lote", "LOTE_CSV_COLS",
+             "LOTE_MAX_SINCRONO"),
+    "metricas": ("METRICAS",),
+    "grupo": ("extrair_raiz", "consultar_grupo", "linhas_csv_grupo", "build_csv_grupo"),
+    "monitoramento": ("Monitoramento", "get_monitoramento"),
+    "jobs": ("FilaJobs", "get_fila_jobs", "JOB_ESTADO_TEXTO"),
+}
+_MODULO_DO_NOME = {nome: modulo for modulo, nomes in _EXPORTS.items() for nome in nomes}
+
+__all__ = list(_MODULO_DO_NOME)
+
+
+def __getattr__(nome: str):
+    modulo = _MODULO_DO_NOME.get(nome)
+    if modulo is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {nome!r}")
+    valor = getattr(importlib.import_module(f".{modulo}", __name__), nome)
+    globals()[nome] = valor  # próximos acessos não passam mais por aqui
+    return valor
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
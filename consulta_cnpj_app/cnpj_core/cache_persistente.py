@@ -0,0 +1,217 @@
+import json
+import queue
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from .metricas import METRICAS
+
+# ---------- cache persistente (SQLite) ----------
+# Chave = (fonte, CNPJ de 14 caracteres). Cada entrada guarda quando expira e
+# quando foi acessada pela última vez (LRU). Entradas vencidas ainda podem ser
+# servidas dentro da janela "stale" enquanto uma revalidação roda em segundo plano,
+# mas só as completas: negativas e degradadas (gravadas com TTL menor que o da fonte,
+# ex.: failover) voltam a ser consultadas assim que vencem. acessado_em só é
+# regravado quando muda mais que RESOLUCAO_ACESSO, para a leitura não virar escrita.
+# As revalidações passam por poucas threads daemon com fila limitada: num lote cheio de
+# entradas vencidas, o excedente é descartado (a entrada continua stale e volta a
+# ser revalidada numa leitura futura) em vez de abrir uma thread por chave.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS consultas (
+    fonte       TEXT NOT NULL,
+    chave       TEXT NOT NULL,
+    valor       TEXT NOT NULL,
+    negativo    INTEGER NOT NULL DEFAULT 0,
+    gravado_em  REAL NOT NULL,
+    expira_em   REAL NOT NULL,
+    acessado_em REAL NOT NULL,
+    PRIMARY KEY (fonte, chave)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_consultas_acesso ON consultas (acessado_em);
+"""
+
+TTL_PADRAO = 24 * 3600
+TTL_NEGATIVO_PADRAO = 3600
+JANELA_STALE_PADRAO = 7 * 24 * 3600
+REVALIDACAO_WORKERS = 2
+REVALIDACAO_MAX_PENDENTES = 32
+RESOLUCAO_ACESSO = 3600
+ESTATISTICAS_TTL = 5
+
+
+class CachePersistente:
+    def __init__(self, caminho, ttls: dict = None, ttls_negativos: dict = None,
+                 max_entradas: int = 100_000, janela_stale: float = JANELA_STALE_PADRAO):
+        self.caminho = Path(caminho)
+        self.caminho.parent.mkdir(parents=True, exist_ok=True)
+        self.ttls = ttls or {}
+        self.ttls_negativos = ttls_negativos or {}
+        self.max_entradas = max_entradas
+        self.janela_stale = janela_stale
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._revalidando = set()
+        self._fila_revalidacao = None
+        self._gravacoes = 0
+        self._entradas = None
+        self.contadores = {"hit": 0, "hit_negativo": 0, "stale": 0, "miss": 0, "erro": 0, "despejos": 0,
+                           "revalidacao_descartada": 0}
+        with self._conn() as conn:
+            conn.executescript(SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.caminho), timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _contar(self, nome: str, n: int = 1, fonte: str = None):
+        with self._lock:
+            self.contadores[nome] += n
+        rotulos = {"resultado": nome} if fonte is None else {"fonte": fonte, "resultado": nome}
+        METRICAS.contar("cnpj_cache_total", n, **rotulos)
+
+    # ---------- leitura / escrita ----------
+    def obter(self, fonte: str, chave: str):
+        # Retorna (valor, estado) com estado em "fresh", "stale" ou None (ausente/expirado demais)
+        agora = time.time()
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT valor, negativo, gravado_em, expira_em, acessado_em FROM consultas WHERE fonte = ? AND chave = ?",
+            (fonte, chave),
+        ).fetchone()
+        if row is None:
+            return None, None
+        valor, negativo, gravado_em, expira_em, acessado_em = row
+        estado = "fresh" if agora <= expira_em else "stale"
+        if estado == "stale":
+            completa = not negativo and expira_em - gravado_em >= self.ttls.get(fonte, TTL_PADRAO) - 1e-3
+            if not completa or agora - expira_em > self.janela_stale:
+                return None, None
+        if agora - acessado_em > RESOLUCAO_ACESSO:
+            conn.execute(
+                "UPDATE consultas SET acessado_em = ? WHERE fonte = ? AND chave = ?",
+                (agora, fonte, chave),
+            )
+        if estado == "fresh":
+            self._contar("hit_negativo" if negativo else "hit", fonte=fonte)
+        return json.loads(valor), estado
+
+    def metadados(self, fonte: str, chave: str):
+        # {"gravado_em", "expira_em", "negativo"} sem ler o valor nem contar acesso; None se ausente
+        row = self._conn().execute(
+            "SELECT gravado_em, expira_em, negativo FROM consultas WHERE fonte = ? AND chave = ?",
+            (fonte, chave),
+        ).fetchone()
+        if row is None:
+            return None
+        return {"gravado_em": row[0], "expira_em": row[1], "negativo": bool(row[2])}
+
+    def gravar(self, fonte: str, chave: str, valor, negativo: bool = False, ttl: float = None):
+        # ttl sobrepõe o TTL da fonte (ex.: resposta degradada de um provedor alternativo)
+        agora = time.time()
+        if ttl is None:
+            ttl = (self.ttls_negativos if negativo else self.ttls).get(
+                fonte, TTL_NEGATIVO_PADRAO if negativo else TTL_PADRAO
+            )
+        self._conn().execute(
+            "INSERT OR REPLACE INTO consultas (fonte, chave, valor, negativo, gravado_em, expira_em, acessado_em) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (fonte, chave, json.dumps(valor, ensure_ascii=False), int(negativo), agora, agora + ttl, agora),
+        )
+        with self._lock:
+            self._gravacoes += 1
+            verificar = self._gravacoes % 500 == 0
+        if verificar:
+            self.despejar_excedentes()
+
+    def despejar_excedentes(self):
+        conn = self._conn()
+        total = conn.execute("SELECT COUNT(*) FROM consultas").fetchone()[0]
+        excesso = total - self.max_entradas
+        if excesso > 0:
+            conn.execute(
+                "DELETE FROM consultas WHERE (fonte, chave) IN "
+                "(SELECT fonte, chave FROM consultas ORDER BY acessado_em LIMIT ?)",
+                (excesso,),
+            )
+            self._contar("despejos", excesso)
+
+    def limpar(self):
+        self._conn().execute("DELETE FROM consultas")
+        self._entradas = None
+
+    # ---------- leitura com carga (stale-while-revalidate) ----------
+    def buscar(self, fonte: str, chave: str, carregar, eh_negativo=None, eh_cacheavel=None, aceitar_stale: bool = True,
+               ttl_de=None):
+        # carregar() consulta a origem; eh_cacheavel(v) descarta falhas transitórias
+        # (ex.: serviço indisponível) e eh_negativo(v) aplica o TTL curto de "não encontrado".
+        # ttl_de(v), se informado, devolve um TTL específico para o valor (ou None).
+        # Com aceitar_stale=False uma entrada vencida é tratada como ausente.
+        with METRICAS.span("cache", fonte=fonte):
+            valor, estado = self.obter(fonte, chave)
+        if estado == "fresh":
+            return valor
+        if estado == "stale" and aceitar_stale:
+            self._contar("stale", fonte=fonte)
+            self._revalidar_em_segundo_plano(fonte, chave, carregar, eh_negativo, eh_cacheavel, ttl_de)
+            return valor
+        self._contar("miss", fonte=fonte)
+        return self._carregar_e_gravar(fonte, chave, carregar, eh_negativo, eh_cacheavel, ttl_de)
+
+    def _carregar_e_gravar(self, fonte, chave, carregar, eh_negativo, eh_cacheavel, ttl_de=None):
+        novo = carregar()
+        if eh_cacheavel is not None and not eh_cacheavel(novo):
+            self._contar("erro", fonte=fonte)
+            return novo
+        self.gravar(fonte, chave, novo, negativo=bool(eh_negativo and eh_negativo(novo)),
+                    ttl=ttl_de(novo) if ttl_de else None)
+        return novo
+
+    def _revalidar_em_segundo_plano(self, fonte, chave, carregar, eh_negativo, eh_cacheavel, ttl_de=None):
+        with self._lock:
+            if (fonte, chave) in self._revalidando:
+                return
+            if self._fila_revalidacao is None:
+                self._fila_revalidacao = queue.Queue(maxsize=REVALIDACAO_MAX_PENDENTES)
+                for i in range(REVALIDACAO_WORKERS):
+                    threading.Thread(target=self._revalidar, name=f"revalidacao-{i}", daemon=True).start()
+            try:
+                self._fila_revalidacao.put_nowait((fonte, chave, carregar, eh_negativo, eh_cacheavel, ttl_de))
+            except queue.Full:
+                descartada = True
+            else:
+                descartada = False
+                self._revalidando.add((fonte, chave))
+        if descartada:
+            self._contar("revalidacao_descartada", fonte=fonte)
+
+    def _revalidar(self):
+        while True:
+            fonte, chave, carregar, eh_negativo, eh_cacheavel, ttl_de = self._fila_revalidacao.get()
+            try:
+                self._carregar_e_gravar(fonte, chave, carregar, eh_negativo, eh_cacheavel, ttl_de)
+            except Exception:
+                pass
+            finally:
+                with self._lock:
+                    self._revalidando.discard((fonte, chave))
+
+    # ---------- estatísticas ----------
+    def estatisticas(self) -> dict:
+        with self._lock:
+            stats = dict(self.contadores)
+        # COUNT(*) varre a tabela inteira; a sidebar pede a cada rerun, então o total
+        # fica guardado por ESTATISTICAS_TTL segundos
+        agora = time.monotonic()
+        if self._entradas is None or agora - self._entradas[0] > ESTATISTICAS_TTL:
+            self._entradas = (agora, self._conn().execute("SELECT COUNT(*) FROM consultas").fetchone()[0])
+        stats["entradas"] = self._entradas[1]
+        consultas = stats["hit"] + stats["hit_negativo"] + stats["stale"] + stats["miss"]
+        stats["taxa_acerto"] = (consultas - stats["miss"]) / consultas if consultas else 0.0
+        return stats
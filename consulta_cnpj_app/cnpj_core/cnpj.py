@@ -0,0 +1,62 @@
+import re
+
+_RE_NAO_DIGITO = re.compile(r'[^0-9]')
+_RE_NAO_ALFANUMERICO = re.compile(r'[^0-9A-Z]')
+
+def only_digits(s: str) -> str:
+    return _RE_NAO_DIGITO.sub('', s or "")
+
+# CNPJ alfanumérico (Receita Federal, 2026): 12 primeiros caracteres em [0-9A-Z] e
+# dois dígitos verificadores numéricos. Valor de cada caractere = código ASCII - 48.
+VALOR_CARACTERE_CNPJ = {c: ord(c) - 48 for c in "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"}
+
+def normalizar_cnpj(s: str) -> str:
+    c = _RE_NAO_ALFANUMERICO.sub('', (s or "").upper())
+    if len(c) != 14:
+        # CNPJ numérico no meio de texto (ex.: "CNPJ: 21.746.980/0001-46")
+        d = only_digits(s)
+        if len(d) == 14:
+            return d
+    return c
+
+def format_currency_brl(v):
+    try:
+        return f"R$ {float(v):,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+    except:
+        return "N/A"
+
+def format_phone(ddd, num):
+    return f"({ddd}) {num}" if ddd and num else "N/A"
+
+def format_cnpj_mask(cnpj: str) -> str:
+    c = normalizar_cnpj(cnpj)
+    return f"{c[0:2]}.{c[2:5]}.{c[5:8]}/{c[8:12]}-{c[12:14]}" if len(c) == 14 else cnpj
+
+# ---------- matriz utils ----------
+def calcular_digitos_verificadores_cnpj(cnpj_base_12_digitos: str) -> str:
+    pesos_12 = [5,4,3,2,9,8,7,6,5,4,3,2]
+    pesos_13 = [6,5,4,3,2,9,8,7,6,5,4,3,2]
+    def dv(base, pesos):
+        s = sum(VALOR_CARACTERE_CNPJ[base[i]] * pesos[i] for i in range(len(base)))
+        r = s % 11
+        return '0' if r < 2 else str(11 - r)
+    d13 = dv(cnpj_base_12_digitos[:12], pesos_12)
+    d14 = dv(cnpj_base_12_digitos[:12] + d13, pesos_13)
+    return d13 + d14
+
+def cnpj_valido(cnpj: str) -> bool:
+    c = normalizar_cnpj(cnpj)
+    if len(c) != 14 or c == c[0] * 14 or not c[12:].isdigit():
+        return False
+    return calcular_digitos_verificadores_cnpj(c[:12]) == c[12:]
+
+def matriz_da_raiz(raiz: str) -> str:
+    base12 = raiz + "0001"
+    return base12 + calcular_digitos_verificadores_cnpj(base12)
+
+def to_matriz_if_filial(cnpj_clean: str) -> str:
+    if len(cnpj_clean) != 14:
+        return cnpj_clean
+    if cnpj_clean[8:12] != "0001":
+        return matriz_da_raiz(cnpj_clean[:8])
+    return cnpj_clean
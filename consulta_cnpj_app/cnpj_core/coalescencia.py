@@ -0,0 +1,44 @@
+import threading
+
+# ---------- coalescência de requisições ----------
+# Chamadas concorrentes com a mesma chave (ex.: mesmo CNPJ pedido por duas sessões
+# ou por duas requisições da API) esperam a primeira em vez de repetir o fetch.
+
+class _Chamada:
+    __slots__ = ("evento", "resultado", "erro")
+
+    def __init__(self):
+        self.evento = threading.Event()
+        self.resultado = None
+        self.erro = None
+
+
+class Coalescedor:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._em_andamento = {}
+        self.coalescidas = 0
+
+    def executar(self, chave, funcao):
+        with self._lock:
+            chamada = self._em_andamento.get(chave)
+            lider = chamada is None
+            if lider:
+                chamada = self._em_andamento[chave] = _Chamada()
+            else:
+                self.coalescidas += 1
+        if not lider:
+            chamada.evento.wait()
+            if chamada.erro is not None:
+                raise chamada.erro
+            return chamada.resultado
+        try:
+            chamada.resultado = funcao()
+            return chamada.resultado
+        except BaseException as e:
+            chamada.erro = e
+            raise
+        finally:
+            with self._lock:
+                self._em_andamento.pop(chave, None)
+            chamada.evento.set()
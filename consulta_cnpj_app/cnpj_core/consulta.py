@@ -0,0 +1,169 @@
+import functools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
+from pathlib import Path
+
+from . import provedores
+from .cache_persistente import CachePersistente
+from .cnpj import cnpj_valido, to_matriz_if_filial
+from .coalescencia import Coalescedor
+from .indice_local import IndiceLocal, INDICE_PATH_PADRAO
+from .metricas import METRICAS
+from .regime import determinar_regime_unificado, normalizar_situacao_cadastral, regime_informado
+
+ESPERA_MAX_COTA = 20
+
+# ---------- cache persistente ----------
+CACHE_PATH = os.environ.get("CNPJ_CACHE_PATH", str(Path(__file__).resolve().parent.parent / ".cache" / "consultas.sqlite3"))
+CACHE_TTLS = {"dados_cnpj": 24 * 3600, "open_cnpja": 24 * 3600}
+CACHE_TTLS_NEGATIVOS = {"dados_cnpj": 2 * 3600, "open_cnpja": 6 * 3600}
+# Respostas de provedores alternativos (failover) não trazem regime_tributario:
+# ficam pouco tempo no cache para que a próxima leitura volte à BrasilAPI
+CACHE_TTL_DEGRADADO = 15 * 60
+CACHE_MAX_ENTRADAS = int(os.environ.get("CNPJ_CACHE_MAX_ENTRADAS", "200000"))
+
+@functools.lru_cache(maxsize=None)
+def get_cache() -> CachePersistente:
+    return CachePersistente(CACHE_PATH, CACHE_TTLS, CACHE_TTLS_NEGATIVOS, max_entradas=CACHE_MAX_ENTRADAS)
+
+# ---------- índice local (dados abertos da Receita) ----------
+INDICE_PATH = os.environ.get("CNPJ_INDICE_PATH", INDICE_PATH_PADRAO)
+INDICE_RECHECAGEM = 60  # segundos entre verificações do arquivo enquanto ele não existe
+
+_indice = {"instancia": None, "verificado_em": 0.0}
+_indice_lock = threading.Lock()
+
+def get_indice_local():
+    # A ausência do arquivo só vale por INDICE_RECHECAGEM: um índice importado com o
+    # app no ar passa a ser usado sem reiniciar o processo.
+    with _indice_lock:
+        if _indice["instancia"] is None and time.monotonic() - _indice["verificado_em"] >= INDICE_RECHECAGEM:
+            _indice["verificado_em"] = time.monotonic()
+            if Path(INDICE_PATH).exists():
+                _indice["instancia"] = IndiceLocal(INDICE_PATH)
+        return _indice["instancia"]
+
+def consulta_indice_local(cnpj_limpo: str):
+    indice = get_indice_local()
+    if indice is None:
+        return None
+    with METRICAS.span("indice_local") as rotulos:
+        try:
+            dados = indice.consultar(cnpj_limpo)
+        except Exception as e:
+            METRICAS.contar("cnpj_indice_local_total", resultado="erro", tipo=type(e).__name__)
+            dados = None
+        rotulos["resultado"] = "hit" if dados is not None else "miss"
+    return dados
+
+# ---------- consultas (white-label) ----------
+COALESCEDOR = Coalescedor()
+
+# exigir_atual=True (monitoramento) ignora o índice local, que é um retrato mensal, e
+# não aceita entrada "stale" do cache: só dados dentro do TTL ou buscados agora.
+
+def _consulta_dados_cnpj(cnpj_limpo: str, exigir_atual: bool = False):
+    dados_indice = None if exigir_atual else consulta_indice_local(cnpj_limpo)
+    # O índice não tem regime_tributario: fora do Simples/MEI o regime vem da BrasilAPI
+    if dados_indice is not None and regime_informado(dados_indice):
+        return dados_indice
+    dados = _consulta_dados_upstream(cnpj_limpo, exigir_atual)
+    if dados_indice is not None and not (isinstance(dados, dict) and "cnpj" in dados):
+        return dados_indice  # upstream fora do ar: melhor o retrato do índice (regime N/A) que nada
+    return dados
+
+def _consulta_dados_upstream(cnpj_limpo: str, exigir_atual: bool = False):
+    return get_cache().buscar(
+        "dados_cnpj", cnpj_limpo,
+        lambda: provedores.consultar_dados_cnpj(cnpj_limpo, espera_token=ESPERA_MAX_COTA),
+        eh_negativo=lambda v: v.get("__error") == "not_found",
+        eh_cacheavel=lambda v: v.get("__error") != "unavailable",
+        aceitar_stale=not exigir_atual,
+        ttl_de=lambda v: CACHE_TTL_DEGRADADO if v.get("__fonte") not in (None, "brasilapi") else None,
+    )
+
+def consulta_brasilapi_cnpj(cnpj_limpo: str, exigir_atual: bool = False):
+    if not cnpj_valido(cnpj_limpo):
+        return {"__error": "invalid"}
+    return COALESCEDOR.executar(
+        ("dados_cnpj", cnpj_limpo, exigir_atual), lambda: _consulta_dados_cnpj(cnpj_limpo, exigir_atual)
+    )
+
+def consulta_ie_open_cnpja(cnpj_limpo: str, max_retries: int = 2, exigir_atual: bool = False):
+    if not cnpj_valido(cnpj_limpo):
+        return None  # [] significaria "sem IEs"; None é o "não foi possível consultar" dos chamadores
+    return COALESCEDOR.executar(("open_cnpja", cnpj_limpo, exigir_atual), lambda: get_cache().buscar(
+        "open_cnpja", cnpj_limpo,
+        lambda: provedores.consultar_ies(cnpj_limpo, max_retries, espera_token=ESPERA_MAX_COTA),
+        eh_negativo=lambda v: len(v) == 0,
+        eh_cacheavel=lambda v: v is not None,
+        aceitar_stale=not exigir_atual,
+    ))
+
+# ---------- regime via matriz ----------
+def fonte_regime(cnpj_limpo: str, dados_cnpj: dict, dados_matriz: dict = None, exigir_atual: bool = False) -> tuple:
+    # (payload de onde sai o regime, origem): o da matriz para filiais, o próprio se a matriz falhar
+    cnpj_matriz = to_matriz_if_filial(cnpj_limpo)
+    if cnpj_matriz != cnpj_limpo:
+        if dados_matriz is None:
+            with METRICAS.span("matriz"):
+                dados_matriz = consulta_brasilapi_cnpj(cnpj_matriz, exigir_atual=exigir_atual)
+        if isinstance(dados_matriz, dict) and not dados_matriz.get("__error") and "cnpj" in dados_matriz:
+            return dados_matriz, "matriz"
+    return dados_cnpj, "propria"
+
+def resolver_regime(cnpj_limpo: str, dados_cnpj: dict, dados_matriz: dict = None, exigir_atual: bool = False) -> str:
+    with METRICAS.span("regime") as rotulos:
+        regime_source, rotulos["origem"] = fonte_regime(cnpj_limpo, dados_cnpj, dados_matriz, exigir_atual)
+        return determinar_regime_unificado(regime_source)
+
+# ---------- orquestração paralela (dados + matriz + IEs) ----------
+PRAZO_CONSULTA = 20  # segundos para a consulta inteira, não por chamada
+_pool_consultas = ThreadPoolExecutor(max_workers=32, thread_name_prefix="consulta")
+
+def iniciar_consulta_paralela(cnpj_limpo: str) -> dict:
+    # A matriz é derivada localmente pelos dígitos verificadores, então as três
+    # chamadas partem juntas assim que o CNPJ é validado.
+    cnpj_matriz = to_matriz_if_filial(cnpj_limpo)
+    return {
+        "dados": _pool_consultas.submit(consulta_brasilapi_cnpj, cnpj_limpo),
+        "ies": _pool_consultas.submit(consulta_ie_open_cnpja, cnpj_limpo),
+        "matriz": _pool_consultas.submit(consulta_brasilapi_cnpj, cnpj_matriz) if cnpj_matriz != cnpj_limpo else None,
+        "prazo": time.monotonic() + PRAZO_CONSULTA,
+    }
+
+def aguardar_resultado(futuros: dict, chave: str, padrao=None):
+    fut = futuros.get(chave)
+    if fut is None:
+        return padrao
+    try:
+        return fut.result(timeout=max(0.0, futuros["prazo"] - time.monotonic()))
+    except FuturesTimeout:
+        return padrao
+
+def consultar_cnpj(cnpj_limpo: str) -> dict:
+    # Consulta completa (dados, regime pela matriz, situação e IEs) para clientes não-UI
+    with METRICAS.span("consulta_total") as rotulos:
+        resultado = _consultar_cnpj(cnpj_limpo)
+        rotulos["resultado"] = resultado["erro"] or "ok"
+    return resultado
+
+def _consultar_cnpj(cnpj_limpo: str) -> dict:
+    if not cnpj_valido(cnpj_limpo):
+        return {"cnpj": cnpj_limpo, "erro": "invalid"}
+    consulta = iniciar_consulta_paralela(cnpj_limpo)
+    dados = aguardar_resultado(consulta, "dados", {"__error": "unavailable"})
+    if not isinstance(dados, dict) or "cnpj" not in dados:
+        erro = dados.get("__error") if isinstance(dados, dict) else None
+        return {"cnpj": cnpj_limpo, "erro": erro or "unavailable"}
+    dados_matriz = aguardar_resultado(consulta, "matriz", {"__error": "unavailable"})
+    return {
+        "cnpj": cnpj_limpo,
+        "erro": None,
+        "dados": dados,
+        "regime": resolver_regime(cnpj_limpo, dados, dados_matriz),
+        "situacao": normalizar_situacao_cadastral(dados.get("descricao_situacao_cadastral")),
+        "ies": aguardar_resultado(consulta, "ies"),
+    }
@@ -0,0 +1,120 @@
+import csv
+import datetime
+import io
+
+from .cnpj import format_cnpj_mask, format_phone
+from .metricas import METRICAS
+from .regime import normalizar_situacao_cadastral
+
+# ---------- colunas aninhadas ----------
+# IEs, QSA e CNAEs secundários entram na linha como listas de dicts: Parquet/Arrow
+# guardam as listas como list<struct>; CSV e XLSX recebem o texto achatado por
+# csv_cell ("Campo: valor | ..." por item, itens separados por " || ").
+def ies_estruturadas(ies_list) -> list:
+    return [
+        {
+            "UF": ie.get("uf") or "",
+            "IE": str(ie.get("numero") or ""),
+            "Habilitada": bool(ie.get("habilitada")),
+            "Status": ie.get("status_texto") or "",
+            "Tipo": ie.get("tipo_texto") or "",
+        }
+        for ie in (ies_list or [])
+    ]
+
+def qsa_estruturado(dados_cnpj: dict) -> list:
+    return [
+        {"Nome": q.get("nome_socio") or "", "Qualificação": q.get("qualificacao_socio") or ""}
+        for q in (dados_cnpj.get("qsa") or [])
+    ]
+
+def cnaes_secundarios_estruturados(dados_cnpj: dict) -> list:
+    return [
+        {"Código": str(c.get("codigo") or ""), "Descrição": c.get("descricao") or ""}
+        for c in (dados_cnpj.get("cnaes_secundarios") or [])
+        if c.get("codigo")
+    ]
+
+# ---------- Helpers CSV ----------
+def _texto_item(item) -> str:
+    if not isinstance(item, dict):
+        return csv_cell(item)
+    partes = []
+    for campo, v in item.items():
+        if isinstance(v, bool):
+            v = "Sim" if v else "Não"
+        partes.append(f"{campo}: {'' if v is None else v}")
+    return " | ".join(partes)
+
+def join_ies_for_csv(ies_list):
+    return csv_cell(ies_estruturadas(ies_list))
+
+CSV_COLS = [
+    "CNPJ","Razão Social","Nome Fantasia","Situação Cadastral","Regime Tributário",
+    "Situação do Fornecedor p/ crédito CBS/IBS","Regime do Simples (Regular ou Normal)",
+    "Data Início Atividade","CNAE Fiscal Código","CNAE Fiscal Descrição","Porte",
+    "Natureza Jurídica","Capital Social","Email","Telefone 1","Telefone 2",
+    "Logradouro","Número","Complemento","Bairro","Município","UF","CEP",
+    "Inscrições Estaduais","Data/Hora da Consulta",
+    # colunas novas vão sempre no fim, para não deslocar as de quem já lê o CSV
+    "QSA","CNAEs Secundários"
+]
+COLS_ANINHADAS = ("Inscrições Estaduais", "QSA", "CNAEs Secundários")
+
+SITUACAO_CREDITO_TEXTO = "Em construção"
+
+def montar_linha_csv(dados_cnpj: dict, regime_final: str, ies) -> dict:
+    sit_norm = normalizar_situacao_cadastral(dados_cnpj.get('descricao_situacao_cadastral', 'N/A'))
+    regime_simples_text = "Em construção" if regime_final.upper() == "SIMPLES NACIONAL" else ""
+    cnae_cod = dados_cnpj.get('cnae_fiscal', '')
+    cnae_desc = dados_cnpj.get('cnae_fiscal_descricao', '')
+    tel1 = format_phone(dados_cnpj.get('ddd_telefone_1'), dados_cnpj.get('telefone_1'))
+    tel2 = format_phone(dados_cnpj.get('ddd_telefone_2'), dados_cnpj.get('telefone_2'))
+    return {
+        "CNPJ": format_cnpj_mask(dados_cnpj.get('cnpj', '')),
+        "Razão Social": dados_cnpj.get('razao_social', 'N/A'),
+        "Nome Fantasia": dados_cnpj.get('nome_fantasia', ''),
+        "Situação Cadastral": sit_norm.title() if sit_norm != "N/A" else "",
+        "Regime Tributário": regime_final,
+        "Situação do Fornecedor p/ crédito CBS/IBS": SITUACAO_CREDITO_TEXTO,
+        "Regime do Simples (Regular ou Normal)": regime_simples_text,
+        "Data Início Atividade": dados_cnpj.get('data_inicio_atividade', ''),
+        "CNAE Fiscal Código": cnae_cod if cnae_cod is not None else "",
+        "CNAE Fiscal Descrição": cnae_desc if cnae_desc is not None else "",
+        "Porte": dados_cnpj.get('porte', ''),
+        "Natureza Jurídica": dados_cnpj.get('natureza_juridica', ''),
+        "Capital Social": dados_cnpj.get('capital_social', ''),
+        "Email": dados_cnpj.get('email', ''),
+        "Telefone 1": "" if tel1 == "N/A" else tel1,
+        "Telefone 2": "" if tel2 == "N/A" else tel2,
+        "Logradouro": f"{dados_cnpj.get('descricao_tipo_de_logradouro','') or ''} {dados_cnpj.get('logradouro','') or ''}".strip(),
+        "Número": dados_cnpj.get('numero', ''),
+        "Complemento": dados_cnpj.get('complemento', ''),
+        "Bairro": dados_cnpj.get('bairro', ''),
+        "Município": dados_cnpj.get('municipio', ''),
+        "UF": dados_cnpj.get('uf', ''),
+        "CEP": dados_cnpj.get('cep', ''),
+        "Inscrições Estaduais": ies_estruturadas(ies),
+        "Data/Hora da Consulta": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "QSA": qsa_estruturado(dados_cnpj),
+        "CNAEs Secundários": cnaes_secundarios_estruturados(dados_cnpj),
+    }
+
+def csv_cell(v):
+    if v is None:
+        return ""
+    if isinstance(v, list):
+        return " || ".join(_texto_item(item) for item in v)
+    return str(v)
+
+def build_csv_bytes(row_dict: dict, field_order: list) -> bytes:
+    return build_csv_bytes_linhas([row_dict], field_order)
+
+def build_csv_bytes_linhas(rows: list, field_order: list) -> bytes:
+    with METRICAS.span("csv"):
+        buf = io.StringIO()
+        writer = csv.DictWriter(buf, fieldnames=field_order, extrasaction="ignore")
+        writer.writeheader()
+        for row_dict in rows:
+            writer.writerow({k: csv_cell(row_dict.get(k)) for k in field_order})
+        return buf.getvalue().encode("utf-8-sig")
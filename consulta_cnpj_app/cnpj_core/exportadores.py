@@ -0,0 +1,217 @@
+import csv
+import datetime
+import importlib.util
+
+from .exportacao import COLS_ANINHADAS, csv_cell
+from .metricas import METRICAS
+
+# ---------- exportação em streaming (CSV, Parquet, Arrow, XLSX) ----------
+# Cada escritor recebe as linhas uma a uma e grava direto no arquivo de destino:
+# Parquet/Arrow acumulam no máximo LINHAS_POR_GRUPO linhas antes de gravar um
+# row group / record batch, o XLSX usa o modo write_only do openpyxl e o CSV vai
+# por um buffer de arquivo. A memória fica constante qualquer que seja o total.
+# pyarrow e openpyxl são opcionais: formatos_disponiveis() lista o que dá para usar.
+
+LINHAS_POR_GRUPO = 5000
+XLSX_MAX_LINHAS = 1_048_575      # por planilha, sem o cabeçalho; acima disso abre outra aba
+XLSX_MAX_CARACTERES = 32_767     # limite do Excel por célula
+
+FORMATOS_EXPORTACAO = {
+    "csv": {"extensao": ".csv", "mime": "text/csv", "rotulo": "CSV", "modulo": None},
+    "parquet": {"extensao": ".parquet", "mime": "application/vnd.apache.parquet", "rotulo": "Parquet", "modulo": "pyarrow"},
+    "arrow": {"extensao": ".arrow", "mime": "application/vnd.apache.arrow.file", "rotulo": "Arrow (IPC)", "modulo": "pyarrow"},
+    "xlsx": {
+        "extensao": ".xlsx",
+        "mime": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        "rotulo": "Excel (XLSX)",
+        "modulo": "openpyxl",
+    },
+}
+
+CAMPOS_ANINHADOS = {
+    "Inscrições Estaduais": (("UF", "str"), ("IE", "str"), ("Habilitada", "bool"), ("Status", "str"), ("Tipo", "str")),
+    "QSA": (("Nome", "str"), ("Qualificação", "str")),
+    "CNAEs Secundários": (("Código", "str"), ("Descrição", "str")),
+}
+COLS_NUMERICAS = ("Capital Social",)
+COLS_DATA = ("Data Início Atividade",)
+COLS_DATA_HORA = ("Data/Hora da Consulta",)
+
+
+def formatos_disponiveis() -> list:
+    return [f for f, info in FORMATOS_EXPORTACAO.items() if info["modulo"] is None or importlib.util.find_spec(info["modulo"])]
+
+# ---------- conversão de valores ----------
+def _numero(v):
+    if v is None or v == "":
+        return None
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return None
+
+def _data(v):
+    if not v:
+        return None
+    try:
+        return datetime.date.fromisoformat(str(v)[:10])
+    except ValueError:
+        return None
+
+def _data_hora(v):
+    if not v:
+        return None
+    try:
+        return datetime.datetime.strptime(str(v), "%Y-%m-%d %H:%M:%S")
+    except ValueError:
+        return None
+
+def valor_tipado(coluna: str, v):
+    # Valor da linha no tipo da coluna (números, datas, listas); texto para o resto
+    if coluna in COLS_ANINHADAS:
+        return v if isinstance(v, list) else None
+    if coluna in COLS_NUMERICAS:
+        return _numero(v)
+    if coluna in COLS_DATA:
+        return _data(v)
+    if coluna in COLS_DATA_HORA:
+        return _data_hora(v)
+    return None if v is None or v == "" else str(v)
+
+def schema_arrow(colunas: list):
+    import pyarrow as pa
+    tipos_campo = {"str": pa.string(), "bool": pa.bool_()}
+    campos = []
+    for c in colunas:
+        if c in CAMPOS_ANINHADOS:
+            tipo = pa.list_(pa.struct([(nome, tipos_campo[t]) for nome, t in CAMPOS_ANINHADOS[c]]))
+        elif c in COLS_NUMERICAS:
+            tipo = pa.float64()
+        elif c in COLS_DATA:
+            tipo = pa.date32()
+        elif c in COLS_DATA_HORA:
+            tipo = pa.timestamp("s")
+        else:
+            tipo = pa.string()
+        campos.append(pa.field(c, tipo))
+    return pa.schema(campos)
+
+# ---------- escritores ----------
+class _EscritorCSV:
+    def __init__(self, caminho: str, colunas: list):
+        self.colunas = colunas
+        self._arquivo = open(caminho, "w", newline="", encoding="utf-8-sig", buffering=1024 * 1024)
+        self._writer = csv.DictWriter(self._arquivo, fieldnames=colunas, extrasaction="ignore")
+        self._writer.writeheader()
+
+    def escrever(self, row: dict):
+        self._writer.writerow({k: csv_cell(row.get(k)) for k in self.colunas})
+
+    def fechar(self):
+        self._arquivo.close()
+
+
+class _EscritorArrow:
+    # Parquet (row groups) ou Arrow IPC em formato de arquivo (record batches)
+    def __init__(self, caminho: str, colunas: list, formato: str):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        self._pa = pa
+        self.colunas = colunas
+        self.formato = formato
+        self.schema = schema_arrow(colunas)
+        if formato == "parquet":
+            self._writer = pq.ParquetWriter(caminho, self.schema, compression="zstd")
+        else:
+            self._writer = pa.ipc.new_file(caminho, self.schema)
+        self._pendentes = []
+
+    def escrever(self, row: dict):
+        self._pendentes.append({c: valor_tipado(c, row.get(c)) for c in self.colunas})
+        if len(self._pendentes) >= LINHAS_POR_GRUPO:
+            self._descarregar()
+
+    def _descarregar(self):
+        if not self._pendentes:
+            return
+        with METRICAS.span("exportacao", formato=self.formato):
+            self._writer.write_batch(self._pa.RecordBatch.from_pylist(self._pendentes, schema=self.schema))
+        self._pendentes = []
+
+    def fechar(self):
+        self._descarregar()
+        self._writer.close()
+
+
+class _EscritorXLSX:
+    def __init__(self, caminho: str, colunas: list):
+        from openpyxl import Workbook
+        self.caminho = caminho
+        self.colunas = colunas
+        self._wb = Workbook(write_only=True)
+        self._planilha = None
+        self._linhas = 0
+        self._nova_planilha()
+
+    def _nova_planilha(self):
+        numero = len(self._wb.worksheets) + 1
+        self._planilha = self._wb.create_sheet(title="CNPJs" if numero == 1 else f"CNPJs ({numero})")
+        self._planilha.append(self.colunas)
+        self._linhas = 0
+
+    def escrever(self, row: dict):
+        if self._linhas >= XLSX_MAX_LINHAS:
+            self._nova_planilha()
+        celulas = []
+        for c in self.colunas:
+            v = valor_tipado(c, row.get(c))
+            if isinstance(v, list):
+                v = csv_cell(v) or None
+            if isinstance(v, str) and len(v) > XLSX_MAX_CARACTERES:
+                v = v[:XLSX_MAX_CARACTERES]
+            celulas.append(v)
+        self._planilha.append(celulas)
+        self._linhas += 1
+
+    def fechar(self):
+        with METRICAS.span("exportacao", formato="xlsx"):
+            self._wb.save(self.caminho)
+
+
+class Exportador:
+    # with Exportador("parquet", caminho, colunas) as exp: exp.escrever(row) ...
+    def __init__(self, formato: str, caminho: str, colunas: list):
+        if formato not in FORMATOS_EXPORTACAO:
+            raise ValueError(f"Formato de exportação desconhecido: {formato}")
+        if formato not in formatos_disponiveis():
+            raise RuntimeError(f"Formato {formato} requer o pacote {FORMATOS_EXPORTACAO[formato]['modulo']}")
+        if formato == "csv":
+            self._escritor = _EscritorCSV(caminho, colunas)
+        elif formato == "xlsx":
+            self._escritor = _EscritorXLSX(caminho, colunas)
+        else:
+            self._escritor = _EscritorArrow(caminho, colunas, formato)
+        self.formato = formato
+        self.caminho = caminho
+        self.linhas = 0
+
+    def escrever(self, row: dict):
+        self._escritor.escrever(row)
+        self.linhas += 1
+
+    def fechar(self):
+        self._escritor.fechar()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+        return False
+
+
+def exportar_linhas(linhas, colunas: list, formato: str, caminho: str) -> int:
+    with Exportador(formato, caminho, colunas) as exp:
+        for row in linhas:
+            exp.escrever(row)
+    return exp.linhas
@@ -0,0 +1,120 @@
+import re
+
+from .cnpj import cnpj_valido, format_cnpj_mask, matriz_da_raiz, normalizar_cnpj
+from .consulta import consulta_brasilapi_cnpj, consulta_ie_open_cnpja, get_indice_local
+from .exportacao import build_csv_bytes_linhas, montar_linha_csv
+from .lote import LOTE_CSV_COLS, LOTE_LIMITE_BRASILAPI, LOTE_LIMITE_OPEN_CNPJA, LOTE_STATUS_COL, LOTE_STATUS_TEXTO, iterar_lote
+from .metricas import METRICAS
+from .regime import determinar_regime_unificado, normalizar_situacao_cadastral
+from .validacao import validar_cnpjs
+
+# ---------- consulta por raiz (matriz + filiais) ----------
+# Dado um CNPJ qualquer ou a raiz de 8 caracteres, monta a lista de estabelecimentos
+# da empresa (índice local de dados abertos + CNPJs informados), consulta todos em
+# paralelo e resolve o regime uma única vez a partir da matriz: filiais não
+# disparam a consulta extra da matriz que resolver_regime faria para cada uma.
+
+GRUPO_MAX_ESTABELECIMENTOS = 500
+_RE_RAIZ = re.compile(r'[0-9A-Z]{8}')
+
+
+def extrair_raiz(entrada: str):
+    # Aceita raiz de 8 caracteres (com ou sem máscara) ou um CNPJ completo válido
+    limpo = normalizar_cnpj(entrada)
+    if len(limpo) == 8 and _RE_RAIZ.fullmatch(limpo):
+        return limpo
+    if len(limpo) == 14 and cnpj_valido(limpo):
+        return limpo[:8]
+    return None
+
+def listar_estabelecimentos(raiz: str, informados=None) -> tuple:
+    # Retorna (CNPJs com a matriz primeiro, origem da lista). Sem índice local, só a
+    # matriz e os CNPJs informados que pertencem à mesma raiz entram na lista.
+    matriz = matriz_da_raiz(raiz)
+    cnpjs = [matriz]
+    origem = "informados"
+    indice = get_indice_local()
+    if indice is not None:
+        try:
+            cnpjs += indice.listar_estabelecimentos(raiz)
+            origem = "indice_local"
+        except Exception:
+            pass
+    if informados:
+        colunas = validar_cnpjs(list(informados))
+        cnpjs += [c for c, ok, r in zip(colunas["cnpj"], colunas["valido"], colunas["raiz"]) if ok and r == raiz]
+    unicos = list(dict.fromkeys(cnpjs))
+    return [matriz] + sorted(c for c in unicos if c != matriz), origem
+
+def _consultar_estabelecimento(cnpj_limpo: str, incluir_ies: bool) -> dict:
+    with LOTE_LIMITE_BRASILAPI:
+        dados = consulta_brasilapi_cnpj(cnpj_limpo)
+    if not isinstance(dados, dict) or "cnpj" not in dados:
+        erro = dados.get("__error") if isinstance(dados, dict) else None
+        return {"cnpj": cnpj_limpo, "erro": erro or "unavailable", "dados": None, "ies": None}
+    ies = None
+    if incluir_ies:
+        with LOTE_LIMITE_OPEN_CNPJA:
+            ies = consulta_ie_open_cnpja(cnpj_limpo)
+    return {"cnpj": cnpj_limpo, "erro": None, "dados": dados, "ies": ies}
+
+def consultar_grupo(entrada: str, informados=None, incluir_ies: bool = True,
+                    max_estabelecimentos: int = GRUPO_MAX_ESTABELECIMENTOS, on_progress=None) -> dict:
+    raiz = extrair_raiz(entrada)
+    if raiz is None:
+        return {"raiz": None, "erro": "invalid", "estabelecimentos": []}
+    informados = list(informados or [])
+    if len(normalizar_cnpj(entrada)) == 14:
+        informados.append(entrada)
+    cnpjs, origem = listar_estabelecimentos(raiz, informados)
+    truncado = len(cnpjs) > max_estabelecimentos
+    cnpjs = cnpjs[:max_estabelecimentos]
+
+    with METRICAS.span("grupo", origem=origem):
+        resultados = {}
+        for feitos, r in enumerate(iterar_lote(cnpjs, processar=lambda c: _consultar_estabelecimento(c, incluir_ies)), start=1):
+            resultados[r["cnpj"]] = r
+            if on_progress:
+                on_progress(feitos, len(cnpjs))
+
+    matriz = resultados[cnpjs[0]]
+    estabelecimentos = []
+    for cnpj in cnpjs:
+        r = resultados[cnpj]
+        dados = r["dados"] or {}
+        r["matriz"] = cnpj[8:12] == "0001"
+        r["situacao"] = normalizar_situacao_cadastral(dados.get("descricao_situacao_cadastral")) if dados else None
+        estabelecimentos.append(r)
+    encontrados = [e for e in estabelecimentos if e["erro"] is None]
+    if not encontrados:
+        erro = matriz["erro"] if all(e["erro"] == matriz["erro"] for e in estabelecimentos) else "unavailable"
+        return {"raiz": raiz, "erro": erro, "estabelecimentos": estabelecimentos}
+    # Regime da matriz; se ela não respondeu, do primeiro estabelecimento encontrado
+    fonte_regime = matriz["dados"] or encontrados[0]["dados"]
+    return {
+        "raiz": raiz,
+        "erro": None,
+        "matriz": cnpjs[0],
+        "razao_social": fonte_regime.get("razao_social"),
+        "regime": determinar_regime_unificado(fonte_regime),
+        "origem_lista": origem,
+        "truncado": truncado,
+        "incluir_ies": incluir_ies,
+        "estabelecimentos": estabelecimentos,
+    }
+
+def linhas_csv_grupo(grupo: dict) -> list:
+    # Uma linha por estabelecimento, todas com o regime resolvido pela matriz
+    linhas = []
+    for e in grupo.get("estabelecimentos", []):
+        if e["erro"]:
+            linhas.append({"CNPJ": format_cnpj_mask(e["cnpj"]), LOTE_STATUS_COL: LOTE_STATUS_TEXTO.get(e["erro"], e["erro"])})
+            continue
+        row = montar_linha_csv(e["dados"], grupo["regime"], e["ies"])
+        ie_falhou = grupo.get("incluir_ies") and e["ies"] is None
+        row[LOTE_STATUS_COL] = "OK (IE indisponível)" if ie_falhou else "OK"
+        linhas.append(row)
+    return linhas
+
+def build_csv_grupo(grupo: dict) -> bytes:
+    return build_csv_bytes_linhas(linhas_csv_grupo(grupo), LOTE_CSV_COLS)
@@ -0,0 +1,271 @@
+import os
+import random
+import sqlite3
+import threading
+import time
+import email.utils
+from pathlib import Path
+
+from .metricas import METRICAS
+
+# ---------- cliente HTTP compartilhado ----------
+# Uma Session por provedor (pool de conexões keep-alive por host), timeouts de
+# conexão/leitura separados, retry com backoff exponencial + jitter respeitando
+# Retry-After e um token bucket por provedor para ficar dentro da cota upstream.
+# O bucket fica num arquivo SQLite (CNPJ_COTA_PATH, padrão .cache/cotas.sqlite3) e
+# todos os processos do app (Streamlit, API, workers de jobs) dividem a mesma cota;
+# CNPJ_COTA_PATH vazio ou "0" volta ao bucket em memória de cada processo.
+
+STATUS_RETRY = (429, 500, 502, 503, 504)
+
+
+def classificar_status(status: int) -> str:
+    if status < 300:
+        return "ok"
+    if status in (400, 404):
+        return "not_found"
+    if status == 429:
+        return "429"
+    if status >= 500:
+        return "5xx"
+    return str(status)
+
+
+class LimiteTaxaExcedido(Exception):
+    pass
+
+
+class TokenBucket:
+    def __init__(self, taxa_por_segundo: float, capacidade: float):
+        self.taxa = float(taxa_por_segundo)
+        self.capacidade = float(capacidade)
+        self._tokens = float(capacidade)
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reabastecer(self, agora: float):
+        self._tokens = min(self.capacidade, self._tokens + (agora - self._ultimo) * self.taxa)
+        self._ultimo = agora
+
+    def adquirir(self, timeout: float = None) -> bool:
+        limite = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                agora = time.monotonic()
+                self._reabastecer(agora)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                espera = (1 - self._tokens) / self.taxa
+            if limite is not None and agora + espera > limite:
+                return False
+            time.sleep(espera)
+
+    def penalizar(self, segundos: float):
+        # Após um 429, esvazia o bucket para que as outras threads também recuem
+        with self._lock:
+            self._reabastecer(time.monotonic())
+            self._tokens = min(self._tokens, -segundos * self.taxa)
+
+
+class TokenBucketCompartilhado:
+    # Mesmo contrato do TokenBucket, com o estado na tabela "cotas": cada aquisição é
+    # uma transação BEGIN IMMEDIATE, serializada entre processos pelo lock do SQLite.
+    def __init__(self, caminho: str, nome: str, taxa_por_segundo: float, capacidade: float):
+        self.caminho = caminho
+        self.nome = nome
+        self.taxa = float(taxa_por_segundo)
+        self.capacidade = float(capacidade)
+        self._local = threading.local()
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS cotas (provedor TEXT PRIMARY KEY, tokens REAL NOT NULL, atualizado_em REAL NOT NULL)"
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.caminho)), exist_ok=True)
+            conn = sqlite3.connect(self.caminho, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _atualizar(self, consumir: float = 0.0, teto: float = None) -> float:
+        # Reabastece pelo relógio de parede (comum aos processos), consome se houver
+        # token e retorna quanto falta esperar (0 = adquirido)
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            agora = time.time()
+            row = conn.execute("SELECT tokens, atualizado_em FROM cotas WHERE provedor = ?", (self.nome,)).fetchone()
+            tokens = self.capacidade if row is None else min(self.capacidade, row[0] + max(0.0, agora - row[1]) * self.taxa)
+            espera = 0.0
+            if teto is not None:
+                tokens = min(tokens, teto)
+            elif tokens >= consumir:
+                tokens -= consumir
+            else:
+                espera = (consumir - tokens) / self.taxa
+            conn.execute(
+                "INSERT INTO cotas (provedor, tokens, atualizado_em) VALUES (?, ?, ?) "
+                "ON CONFLICT(provedor) DO UPDATE SET tokens = excluded.tokens, atualizado_em = excluded.atualizado_em",
+                (self.nome, tokens, agora),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return espera
+
+    def adquirir(self, timeout: float = None) -> bool:
+        limite = None if timeout is None else time.monotonic() + timeout
+        while True:
+            espera = self._atualizar(consumir=1)
+            if not espera:
+                return True
+            if limite is not None and time.monotonic() + espera > limite:
+                return False
+            # jitter para que processos acordados juntos não disputem o mesmo token
+            time.sleep(espera * random.uniform(1.0, 1.2))
+
+    def penalizar(self, segundos: float):
+        self._atualizar(teto=-segundos * self.taxa)
+
+
+def parse_retry_after(valor) -> float:
+    if not valor:
+        return None
+    try:
+        return max(0.0, float(valor))
+    except ValueError:
+        pass
+    try:
+        dt = email.utils.parsedate_to_datetime(valor)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, dt.timestamp() - time.time())
+
+
+class ClienteHTTP:
+    def __init__(self, nome: str, taxa_por_segundo: float, rajada: float = 1,
+                 timeout_conexao: float = 5, timeout_leitura: float = 15,
+                 max_tentativas: int = 4, backoff_base: float = 0.5, backoff_max: float = 8,
+                 retry_after_max: float = 30, pool_maxsize: int = 16, bucket=None):
+        self.nome = nome
+        self.timeout = (timeout_conexao, timeout_leitura)
+        self.max_tentativas = max_tentativas
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_after_max = retry_after_max
+        self.bucket = bucket or TokenBucket(taxa_por_segundo, rajada)
+        # requests só é importado quando o primeiro cliente é criado (primeira
+        # consulta upstream), não na subida do app
+        import requests
+        from requests.adapters import HTTPAdapter
+        self._excecoes_rede = (requests.exceptions.Timeout, requests.exceptions.ConnectionError)
+        self._timeout_exc = requests.exceptions.Timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _backoff(self, tentativa: int) -> float:
+        # "full jitter": espera aleatória em [0, min(max, base * 2^tentativa)]
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** tentativa)))
+
+    def get(self, url: str, max_tentativas: int = None, espera_token: float = None, **kwargs):
+        # max_tentativas conta todas as requisições, a primeira inclusive. Retorna a
+        # última resposta (inclusive 429/5xx quando as tentativas se esgotam);
+        # erros de rede são relançados após a última tentativa.
+        tentativas = max(1, self.max_tentativas if max_tentativas is None else max_tentativas)
+        kwargs.setdefault("timeout", self.timeout)
+        tentativa = 0
+        while True:
+            inicio = time.perf_counter()
+            if not self.bucket.adquirir(timeout=espera_token):
+                METRICAS.contar("cnpj_upstream_respostas_total", provedor=self.nome, resultado="cota_local")
+                raise LimiteTaxaExcedido(self.nome)
+            METRICAS.observar("cnpj_etapa_segundos", time.perf_counter() - inicio, etapa="espera_cota", provedor=self.nome)
+            inicio = time.perf_counter()
+            try:
+                resp = self.session.get(url, **kwargs)
+            except self._excecoes_rede as e:
+                resultado = "timeout" if isinstance(e, self._timeout_exc) else "erro_conexao"
+                METRICAS.observar("cnpj_etapa_segundos", time.perf_counter() - inicio, etapa="http", provedor=self.nome)
+                METRICAS.contar("cnpj_upstream_respostas_total", provedor=self.nome, resultado=resultado)
+                if tentativa + 1 >= tentativas:
+                    raise
+                espera = self._backoff(tentativa)
+                METRICAS.contar("cnpj_upstream_espera_segundos_total", espera, provedor=self.nome, motivo=resultado)
+                time.sleep(espera)
+                tentativa += 1
+                continue
+            METRICAS.observar("cnpj_etapa_segundos", time.perf_counter() - inicio, etapa="http", provedor=self.nome)
+            resultado = classificar_status(resp.status_code)
+            METRICAS.contar("cnpj_upstream_respostas_total", provedor=self.nome, resultado=resultado)
+            if resp.status_code not in STATUS_RETRY or tentativa + 1 >= tentativas:
+                return resp
+            espera = parse_retry_after(resp.headers.get("Retry-After"))
+            if espera is not None and espera > self.retry_after_max:
+                return resp
+            if espera is None:
+                espera = self._backoff(tentativa)
+            if resp.status_code == 429:
+                self.bucket.penalizar(espera)
+            resp.close()
+            METRICAS.contar("cnpj_upstream_espera_segundos_total", espera, provedor=self.nome, motivo=resultado)
+            time.sleep(espera)
+            tentativa += 1
+
+
+# ---------- registro de clientes por provedor ----------
+def _env_float(nome: str, padrao: float) -> float:
+    try:
+        return float(os.environ.get(nome, padrao))
+    except ValueError:
+        return padrao
+
+# Cotas públicas: open.cnpja aceita ~5 consultas/min por IP e ReceitaWS ~3/min; BrasilAPI não publica
+# limite fixo, mas devolve 429 sob rajadas. Ajustáveis por variável de ambiente.
+CONFIG_PROVEDORES = {
+    "brasilapi": {
+        "taxa_por_segundo": _env_float("CNPJ_RATE_BRASILAPI", 3.0),
+        "rajada": _env_float("CNPJ_BURST_BRASILAPI", 5),
+    },
+    "open_cnpja": {
+        "taxa_por_segundo": _env_float("CNPJ_RATE_OPEN_CNPJA", 5 / 60),
+        "rajada": _env_float("CNPJ_BURST_OPEN_CNPJA", 5),
+    },
+    "receitaws": {
+        "taxa_por_segundo": _env_float("CNPJ_RATE_RECEITAWS", 3 / 60),
+        "rajada": _env_float("CNPJ_BURST_RECEITAWS", 3),
+    },
+    "receita_dados_abertos": {"taxa_por_segundo": 1.0, "rajada": 2},
+}
+
+COTA_PATH_PADRAO = str(Path(__file__).resolve().parent.parent / ".cache" / "cotas.sqlite3")
+_cota_path = os.environ.get("CNPJ_COTA_PATH", COTA_PATH_PADRAO)
+COTA_COMPARTILHADA_PATH = None if _cota_path in ("", "0") else _cota_path
+
+_clientes = {}
+_clientes_lock = threading.Lock()
+
+
+def get_cliente(nome: str) -> ClienteHTTP:
+    with _clientes_lock:
+        cliente = _clientes.get(nome)
+        if cliente is None:
+            config = CONFIG_PROVEDORES.get(nome, {"taxa_por_segundo": 1.0, "rajada": 1})
+            bucket = None
+            if COTA_COMPARTILHADA_PATH:
+                bucket = TokenBucketCompartilhado(COTA_COMPARTILHADA_PATH, nome, config["taxa_por_segundo"], config["rajada"])
+            cliente = ClienteHTTP(
+                nome,
+                timeout_conexao=_env_float("CNPJ_HTTP_TIMEOUT_CONEXAO", 5),
+                timeout_leitura=_env_float("CNPJ_HTTP_TIMEOUT_LEITURA", 15),
+                bucket=bucket,
+                **config,
+            )
+            _clientes[nome] = cliente
+        return cliente
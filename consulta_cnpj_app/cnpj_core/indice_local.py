@@ -0,0 +1,363 @@
+import argparse
+import csv
+import io
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+import zipfile
+from pathlib import Path
+
+# ---------- índice local (dados abertos do CNPJ - Receita Federal) ----------
+# Os arquivos mensais (Empresas*, Estabelecimentos*, Socios*, Simples e tabelas de
+# domínio) são CSV zipados, separados por ";", em latin-1 e sem cabeçalho. A
+# importação lê cada zip em streaming e grava em lotes, então a memória fica
+# constante; consultas usam o CNPJ (14 dígitos) ou a raiz (8 dígitos).
+
+URL_DADOS_ABERTOS = os.environ.get(
+    "CNPJ_DADOS_ABERTOS_URL",
+    "https://arquivos.receitafederal.gov.br/dados/cnpj/dados_abertos_cnpj/",
+)
+INDICE_PATH_PADRAO = str(Path(__file__).resolve().parent.parent / ".cache" / "indice_cnpj.sqlite3")
+TAMANHO_LOTE = 20_000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS empresas (
+    raiz TEXT PRIMARY KEY, razao_social TEXT, natureza_juridica INTEGER,
+    capital_social REAL, porte TEXT
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS estabelecimentos (
+    cnpj TEXT PRIMARY KEY, raiz TEXT NOT NULL, matriz_filial INTEGER, nome_fantasia TEXT,
+    situacao INTEGER, data_inicio TEXT, cnae_principal INTEGER, cnaes_secundarios TEXT,
+    tipo_logradouro TEXT, logradouro TEXT, numero TEXT, complemento TEXT, bairro TEXT,
+    cep TEXT, uf TEXT, municipio INTEGER, ddd1 TEXT, tel1 TEXT, ddd2 TEXT, tel2 TEXT, email TEXT
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_estabelecimentos_raiz ON estabelecimentos (raiz);
+CREATE TABLE IF NOT EXISTS socios (
+    raiz TEXT NOT NULL, nome TEXT, cnpj_cpf TEXT, qualificacao INTEGER, data_entrada TEXT,
+    representante TEXT, nome_representante TEXT, qualificacao_representante INTEGER,
+    referencia TEXT NOT NULL, arquivo TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_socios_raiz ON socios (raiz);
+CREATE TABLE IF NOT EXISTS simples (
+    raiz TEXT PRIMARY KEY, opcao_simples INTEGER, opcao_mei INTEGER
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS dominios (
+    tabela TEXT NOT NULL, codigo INTEGER NOT NULL, descricao TEXT,
+    PRIMARY KEY (tabela, codigo)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS arquivos_importados (
+    arquivo TEXT PRIMARY KEY, referencia TEXT, tamanho INTEGER, importado_em REAL
+) WITHOUT ROWID;
+"""
+
+SITUACOES = {1: "NULA", 2: "ATIVA", 3: "SUSPENSA", 4: "INAPTA", 8: "BAIXADA"}
+PORTES = {"00": "NÃO INFORMADO", "01": "MICRO EMPRESA", "03": "EMPRESA DE PEQUENO PORTE", "05": "DEMAIS"}
+DOMINIOS = {"Cnaes": "cnae", "Municipios": "municipio", "Naturezas": "natureza", "Qualificacoes": "qualificacao"}
+
+
+def _int_ou_none(s):
+    s = (s or "").strip()
+    return int(s) if s.isdigit() else None
+
+def _float_br(s):
+    try:
+        return float((s or "").replace(".", "").replace(",", "."))
+    except ValueError:
+        return None
+
+def _data_iso(s):
+    s = (s or "").strip()
+    return f"{s[0:4]}-{s[4:6]}-{s[6:8]}" if len(s) == 8 and s != "00000000" else None
+
+def _sim_nao(s):
+    s = (s or "").strip().upper()
+    return 1 if s == "S" else 0 if s == "N" else None
+
+
+# ---------- conversão de linhas ----------
+def _linha_empresa(r):
+    return (r[0], r[1], _int_ou_none(r[2]), _float_br(r[4]), r[5] or None)
+
+def _linha_estabelecimento(r):
+    return (
+        r[0] + r[1] + r[2], r[0], _int_ou_none(r[3]), r[4] or None, _int_ou_none(r[5]),
+        _data_iso(r[10]), _int_ou_none(r[11]), r[12] or None, r[13] or None, r[14] or None,
+        r[15] or None, r[16] or None, r[17] or None, r[18] or None, r[19] or None,
+        _int_ou_none(r[20]), r[21] or None, r[22] or None, r[23] or None, r[24] or None,
+        (r[27] or "").lower() or None,
+    )
+
+def _linha_socio(r, referencia, arquivo):
+    return (r[0], r[2] or None, r[3] or None, _int_ou_none(r[4]), _data_iso(r[5]),
+            r[7] or None, r[8] or None, _int_ou_none(r[9]), referencia, arquivo)
+
+def _linha_simples(r):
+    return (r[0], _sim_nao(r[1]), _sim_nao(r[4]))
+
+SQL_INSERT = {
+    "Empresas": "INSERT OR REPLACE INTO empresas VALUES (?, ?, ?, ?, ?)",
+    "Estabelecimentos": "INSERT OR REPLACE INTO estabelecimentos VALUES (" + ", ".join("?" * 21) + ")",
+    "Socios": "INSERT INTO socios VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+    "Simples": "INSERT OR REPLACE INTO simples VALUES (?, ?, ?)",
+    "dominio": "INSERT OR REPLACE INTO dominios VALUES (?, ?, ?)",
+}
+
+
+class IndiceLocal:
+    def __init__(self, caminho: str = INDICE_PATH_PADRAO, somente_leitura: bool = True):
+        self.caminho = Path(caminho)
+        self.somente_leitura = somente_leitura
+        self._local = threading.local()
+        if not somente_leitura:
+            self.caminho.parent.mkdir(parents=True, exist_ok=True)
+            conn = self._conn()
+            conn.executescript(SCHEMA)
+            # Índices importados antes da coluna "arquivo" em socios
+            if "arquivo" not in {r["name"] for r in conn.execute("PRAGMA table_info(socios)")}:
+                conn.execute("ALTER TABLE socios ADD COLUMN arquivo TEXT")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            if self.somente_leitura:
+                conn = sqlite3.connect(f"file:{self.caminho}?mode=ro", uri=True, timeout=30)
+            else:
+                conn = sqlite3.connect(str(self.caminho), timeout=30, isolation_level=None)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=OFF")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    # ---------- consulta ----------
+    def _dominio(self, tabela: str, codigo):
+        if codigo is None:
+            return None
+        row = self._conn().execute(
+            "SELECT descricao FROM dominios WHERE tabela = ? AND codigo = ?", (tabela, codigo)
+        ).fetchone()
+        return row[0] if row else None
+
+    def consultar(self, cnpj_limpo: str):
+        # Mesmo formato da BrasilAPI; None quando o CNPJ não está no índice
+        conn = self._conn()
+        est = conn.execute("SELECT * FROM estabelecimentos WHERE cnpj = ?", (cnpj_limpo,)).fetchone()
+        if est is None:
+            return None
+        return self._montar(est)
+
+    def listar_estabelecimentos(self, raiz: str) -> list:
+        rows = self._conn().execute(
+            "SELECT cnpj FROM estabelecimentos WHERE raiz = ? ORDER BY cnpj", (raiz,)
+        ).fetchall()
+        return [r[0] for r in rows]
+
+    def _montar(self, est) -> dict:
+        conn = self._conn()
+        raiz = est["raiz"]
+        emp = conn.execute("SELECT * FROM empresas WHERE raiz = ?", (raiz,)).fetchone()
+        simples = conn.execute("SELECT * FROM simples WHERE raiz = ?", (raiz,)).fetchone()
+        socios = conn.execute("SELECT * FROM socios WHERE raiz = ?", (raiz,)).fetchall()
+        secundarios = [int(c) for c in (est["cnaes_secundarios"] or "").split(",") if c.strip().isdigit()]
+        natureza = emp["natureza_juridica"] if emp else None
+        return {
+            "cnpj": est["cnpj"],
+            "razao_social": emp["razao_social"] if emp else None,
+            "nome_fantasia": est["nome_fantasia"] or "",
+            "descricao_situacao_cadastral": SITUACOES.get(est["situacao"]),
+            "data_inicio_atividade": est["data_inicio"],
+            "cnae_fiscal": est["cnae_principal"],
+            "cnae_fiscal_descricao": self._dominio("cnae", est["cnae_principal"]),
+            "porte": PORTES.get(emp["porte"]) if emp else None,
+            "natureza_juridica": self._dominio("natureza", natureza) or natureza,
+            "capital_social": emp["capital_social"] if emp else None,
+            "email": est["email"],
+            "ddd_telefone_1": est["ddd1"],
+            "telefone_1": est["tel1"],
+            "ddd_telefone_2": est["ddd2"],
+            "telefone_2": est["tel2"],
+            "descricao_tipo_de_logradouro": est["tipo_logradouro"],
+            "logradouro": est["logradouro"],
+            "numero": est["numero"],
+            "complemento": est["complemento"],
+            "bairro": est["bairro"],
+            "municipio": self._dominio("municipio", est["municipio"]),
+            "uf": est["uf"],
+            "cep": est["cep"],
+            "opcao_pelo_simples": None if simples is None else bool(simples["opcao_simples"]),
+            "opcao_pelo_mei": None if simples is None else bool(simples["opcao_mei"]),
+            "qsa": [
+                {
+                    "nome_socio": s["nome"],
+                    "qualificacao_socio": self._dominio("qualificacao", s["qualificacao"]),
+                    "data_entrada_sociedade": s["data_entrada"],
+                    "cnpj_cpf_do_socio": s["cnpj_cpf"],
+                    "nome_representante_legal": s["nome_representante"],
+                    "cpf_representante_legal": s["representante"],
+                    "qualificacao_representante_legal": self._dominio("qualificacao", s["qualificacao_representante"]),
+                }
+                for s in socios
+            ],
+            "cnaes_secundarios": [
+                {"codigo": c, "descricao": self._dominio("cnae", c)} for c in secundarios
+            ],
+            "__fonte": "indice_local",
+        }
+
+    # ---------- importação ----------
+    def arquivo_ja_importado(self, arquivo: str, referencia: str, tamanho: int) -> bool:
+        row = self._conn().execute(
+            "SELECT referencia, tamanho FROM arquivos_importados WHERE arquivo = ?", (arquivo,)
+        ).fetchone()
+        return row is not None and row["referencia"] == referencia and row["tamanho"] == tamanho
+
+    def importar_zip(self, caminho_zip: Path, referencia: str, ufs: set = None, on_progress=None) -> int:
+        nome = caminho_zip.name
+        tipo = re.sub(r'\d+$', '', caminho_zip.stem)
+        tamanho = caminho_zip.stat().st_size
+        if self.arquivo_ja_importado(nome, referencia, tamanho):
+            return 0
+        conn = self._conn()
+        if tipo == "Socios":
+            # Sócios não têm chave natural: uma importação interrompida deste arquivo
+            # nesta referência é refeita do zero em vez de duplicar o que já entrou
+            conn.execute("DELETE FROM socios WHERE arquivo = ? AND referencia = ?", (nome, referencia))
+        total = 0
+        with zipfile.ZipFile(caminho_zip) as zf:
+            for membro in zf.namelist():
+                with zf.open(membro) as raw:
+                    texto = io.TextIOWrapper(raw, encoding="latin-1", newline="")
+                    leitor = csv.reader(texto, delimiter=";", quotechar='"')
+                    lote = []
+                    for r in leitor:
+                        linha = self._converter(tipo, r, referencia, ufs, nome)
+                        if linha is None:
+                            continue
+                        lote.append(linha)
+                        if len(lote) >= TAMANHO_LOTE:
+                            total += self._gravar_lote(tipo, lote)
+                            lote = []
+                            if on_progress:
+                                on_progress(nome, total)
+                    total += self._gravar_lote(tipo, lote)
+        conn.execute(
+            "INSERT OR REPLACE INTO arquivos_importados VALUES (?, ?, ?, ?)",
+            (nome, referencia, tamanho, time.time()),
+        )
+        if on_progress:
+            on_progress(nome, total)
+        return total
+
+    def _converter(self, tipo: str, r: list, referencia: str, ufs: set, arquivo: str = None):
+        try:
+            if tipo == "Empresas":
+                return _linha_empresa(r)
+            if tipo == "Estabelecimentos":
+                if ufs and r[19] not in ufs:
+                    return None
+                return _linha_estabelecimento(r)
+            if tipo == "Socios":
+                return _linha_socio(r, referencia, arquivo)
+            if tipo == "Simples":
+                return _linha_simples(r)
+            if tipo in DOMINIOS:
+                return (DOMINIOS[tipo], _int_ou_none(r[0]), r[1])
+        except IndexError:
+            return None
+        return None
+
+    def _gravar_lote(self, tipo: str, lote: list) -> int:
+        if not lote:
+            return 0
+        sql = SQL_INSERT["dominio" if tipo in DOMINIOS else tipo]
+        conn = self._conn()
+        conn.execute("BEGIN")
+        if tipo == "Socios":
+            # Sócios não têm chave natural: substitui o quadro da raiz pelo da nova referência
+            conn.executemany(
+                "DELETE FROM socios WHERE raiz = ? AND referencia <> ?",
+                {(linha[0], linha[8]) for linha in lote},
+            )
+        conn.executemany(sql, lote)
+        conn.execute("COMMIT")
+        return len(lote)
+
+    def importar_diretorio(self, diretorio: Path, referencia: str, ufs: set = None, on_progress=None) -> dict:
+        # Domínios primeiro, depois as tabelas principais; arquivos com mesmo
+        # nome/tamanho já importados nesta referência são pulados (refresh incremental).
+        prioridade = {t: 0 for t in DOMINIOS}
+        zips = sorted(
+            Path(diretorio).glob("*.zip"),
+            key=lambda p: (prioridade.get(re.sub(r'\d+$', '', p.stem), 1), p.name),
+        )
+        resumo = {}
+        for z in zips:
+            resumo[z.name] = self.importar_zip(z, referencia, ufs, on_progress)
+        if any(z.name.startswith("Socios") for z in zips):
+            self._conn().execute("DELETE FROM socios WHERE referencia <> ?", (referencia,))
+        self._conn().execute("PRAGMA optimize")
+        return resumo
+
+
+# ---------- download mensal ----------
+ARQUIVOS_MENSAIS = (
+    ["Cnaes", "Municipios", "Naturezas", "Qualificacoes", "Simples"]
+    + [f"Empresas{i}" for i in range(10)]
+    + [f"Estabelecimentos{i}" for i in range(10)]
+    + [f"Socios{i}" for i in range(10)]
+)
+
+def baixar_referencia(referencia: str, destino: Path, on_progress=None) -> list:
+    # Baixa os zips da referência (AAAA-MM) em streaming; arquivos já presentes com o
+    # mesmo tamanho (Content-Length) não são baixados de novo.
+    from .http_client import get_cliente
+    cliente = get_cliente("receita_dados_abertos")
+    destino.mkdir(parents=True, exist_ok=True)
+    baixados = []
+    for nome in ARQUIVOS_MENSAIS:
+        url = f"{URL_DADOS_ABERTOS}{referencia}/{nome}.zip"
+        alvo = destino / f"{nome}.zip"
+        with cliente.get(url, stream=True, timeout=(10, 120)) as resp:
+            if resp.status_code != 200:
+                continue
+            tamanho = int(resp.headers.get("Content-Length") or 0)
+            if alvo.exists() and tamanho and alvo.stat().st_size == tamanho:
+                baixados.append(alvo)
+                continue
+            parcial = alvo.with_suffix(".zip.part")
+            with open(parcial, "wb") as f:
+                for bloco in resp.iter_content(chunk_size=1 << 20):
+                    f.write(bloco)
+            parcial.replace(alvo)
+        baixados.append(alvo)
+        if on_progress:
+            on_progress(nome, alvo.stat().st_size)
+    return baixados
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Importa os dados abertos do CNPJ para o índice local.")
+    parser.add_argument("referencia", help="mês de referência no formato AAAA-MM")
+    parser.add_argument("--diretorio", default="dados_abertos_cnpj", help="pasta com (ou para) os arquivos .zip")
+    parser.add_argument("--indice", default=os.environ.get("CNPJ_INDICE_PATH", INDICE_PATH_PADRAO))
+    parser.add_argument("--baixar", action="store_true", help="baixa os arquivos da Receita antes de importar")
+    parser.add_argument("--ufs", default="", help="importa apenas estabelecimentos destas UFs (ex.: SP,RJ)")
+    args = parser.parse_args(argv)
+
+    def progresso(nome, n):
+        print(f"{nome}: {n}", file=sys.stderr)
+
+    diretorio = Path(args.diretorio) / args.referencia
+    if args.baixar:
+        baixar_referencia(args.referencia, diretorio, progresso)
+    ufs = {u.strip().upper() for u in args.ufs.split(",") if u.strip()} or None
+    indice = IndiceLocal(args.indice, somente_leitura=False)
+    resumo = indice.importar_diretorio(diretorio, args.referencia, ufs, progresso)
+    print(f"{sum(resumo.values())} linhas importadas de {len([v for v in resumo.values() if v])} arquivos.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,519 @@
+import argparse
+import functools
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from .exportadores import Exportador
+from .http_client import COTA_COMPARTILHADA_PATH
+from .lote import (
+    LOTE_CSV_COLS, LOTE_MAX_WORKERS, LOTE_STATUS_COL, LOTE_STATUS_OK_SEM_IE, LOTE_STATUS_TEXTO,
+    _linha_erro_lote, iterar_lote, processar_cnpj_lote,
+)
+
+# ---------- jobs em segundo plano (lotes grandes) ----------
+# Um lote vira um job numa fila SQLite, dividido em chunks de TAMANHO_CHUNK CNPJs.
+# Processos worker (python -m cnpj_core.jobs worker) reservam um chunk por vez com
+# lease renovado por batimento; se um worker morre, o chunk volta para a fila depois
+# de LEASE_SEGUNDOS. Cada linha concluída é gravada no próprio item (checkpoint):
+# ao retomar, só os CNPJs sem resultado são consultados de novo. O app acompanha o
+# progresso pela tabela de jobs e exporta a qualquer momento o que já está pronto.
+#
+# Falhas transitórias (serviço indisponível, IE sem cota, exceção num item) são
+# gravadas como linhas "retentáveis": o chunk volta para a fila após uma espera
+# crescente e só esses itens são consultados de novo. Cada reserva conta como uma
+# tentativa; depois de CHUNK_MAX_TENTATIVAS as linhas ficam como estão e um chunk
+# cujo worker sempre morre é encerrado como "falhou", com linha de erro nos itens.
+#
+# Os workers recebem o mesmo arquivo de cota do processo que os sobe
+# (http_client.COTA_COMPARTILHADA_PATH): app, API e workers dividem o token bucket
+# de cada provedor, então jobs em paralelo não multiplicam a cota.
+#
+# python -m cnpj_core.jobs worker [--ocioso-max 30]
+# python -m cnpj_core.jobs enviar cnpjs.csv
+# python -m cnpj_core.jobs status [job_id]
+
+JOBS_PATH = os.environ.get(
+    "CNPJ_JOBS_PATH", str(Path(__file__).resolve().parent.parent / ".cache" / "jobs.sqlite3")
+)
+APP_DIR = Path(__file__).resolve().parent.parent
+
+TAMANHO_CHUNK = 500
+LEASE_SEGUNDOS = 120
+BATIMENTO_SEGUNDOS = 10
+CHECKPOINT_LINHAS = 25           # grava o checkpoint a cada N linhas...
+CHECKPOINT_SEGUNDOS = 5          # ...ou a cada N segundos, o que vier primeiro
+WORKERS_PADRAO = 2
+OCIOSO_MAX_PADRAO = 30           # worker sem trabalho por N segundos encerra
+CHUNK_MAX_TENTATIVAS = 3
+ESPERA_RETENTATIVA = 60          # segundos antes de reprocessar um chunk; dobra a cada tentativa
+DISPARO_LEASE_SEGUNDOS = 15      # janela em que só uma sessão do app sobe workers
+STATUS_RETENTAVEIS = (LOTE_STATUS_TEXTO["unavailable"], LOTE_STATUS_OK_SEM_IE)
+JOB_ESTADO_TEXTO = {
+    "na_fila": "Na fila",
+    "executando": "Em andamento",
+    "concluido": "Concluído",
+    "cancelado": "Cancelado",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id            TEXT PRIMARY KEY,
+    nome          TEXT,
+    estado        TEXT NOT NULL,
+    criado_em     REAL NOT NULL,
+    atualizado_em REAL NOT NULL,
+    concluido_em  REAL,
+    total         INTEGER NOT NULL,
+    feitos        INTEGER NOT NULL DEFAULT 0,
+    ok            INTEGER NOT NULL DEFAULT 0,
+    erros         INTEGER NOT NULL DEFAULT 0,
+    formato       TEXT NOT NULL DEFAULT 'csv'
+);
+CREATE TABLE IF NOT EXISTS chunks (
+    job_id      TEXT NOT NULL,
+    chunk       INTEGER NOT NULL,
+    inicio      INTEGER NOT NULL,
+    fim         INTEGER NOT NULL,
+    estado      TEXT NOT NULL,
+    worker      TEXT,
+    lease_ate   REAL,
+    tentativas  INTEGER NOT NULL DEFAULT 0,
+    disponivel_em REAL,
+    PRIMARY KEY (job_id, chunk)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_chunks_estado ON chunks (estado, lease_ate);
+CREATE TABLE IF NOT EXISTS itens (
+    job_id    TEXT NOT NULL,
+    seq       INTEGER NOT NULL,
+    cnpj      TEXT NOT NULL,
+    resultado TEXT,
+    retentar  INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (job_id, seq)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS workers (
+    id          TEXT PRIMARY KEY,
+    pid         INTEGER NOT NULL,
+    iniciado_em REAL NOT NULL,
+    visto_em    REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS controle (
+    nome TEXT PRIMARY KEY,
+    ate  REAL NOT NULL
+);
+"""
+# Colunas acrescentadas depois da primeira versão do banco (ALTER TABLE se faltarem)
+COLUNAS_MIGRADAS = (
+    ("chunks", "tentativas", "INTEGER NOT NULL DEFAULT 0"),
+    ("chunks", "disponivel_em", "REAL"),
+    ("itens", "retentar", "INTEGER NOT NULL DEFAULT 0"),
+)
+
+
+def _linha_ok(row: dict) -> bool:
+    return row.get(LOTE_STATUS_COL, "").startswith("OK")
+
+def _linha_retentavel(row: dict) -> bool:
+    return row.get(LOTE_STATUS_COL) in STATUS_RETENTAVEIS
+
+
+class FilaJobs:
+    def __init__(self, caminho: str = JOBS_PATH):
+        self.caminho = Path(caminho)
+        self.caminho.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+        for tabela, coluna, definicao in COLUNAS_MIGRADAS:
+            if coluna not in {r["name"] for r in conn.execute(f"PRAGMA table_info({tabela})")}:
+                conn.execute(f"ALTER TABLE {tabela} ADD COLUMN {coluna} {definicao}")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.caminho), timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _transacao(self, funcao):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            resultado = funcao(conn)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return resultado
+
+    # ---------- jobs ----------
+    def criar(self, cnpjs: list, nome: str = None, formato: str = "csv", tamanho_chunk: int = TAMANHO_CHUNK) -> str:
+        job_id = uuid.uuid4().hex[:12]
+        agora = time.time()
+
+        def inserir(conn):
+            conn.execute(
+                "INSERT INTO jobs (id, nome, estado, criado_em, atualizado_em, total, formato) VALUES (?, ?, 'na_fila', ?, ?, ?, ?)",
+                (job_id, nome, agora, agora, len(cnpjs), formato),
+            )
+            conn.executemany(
+                "INSERT INTO itens (job_id, seq, cnpj) VALUES (?, ?, ?)",
+                ((job_id, seq, cnpj) for seq, cnpj in enumerate(cnpjs)),
+            )
+            conn.executemany(
+                "INSERT INTO chunks (job_id, chunk, inicio, fim, estado) VALUES (?, ?, ?, ?, 'pendente')",
+                ((job_id, n, inicio, min(inicio + tamanho_chunk, len(cnpjs)) - 1)
+                 for n, inicio in enumerate(range(0, len(cnpjs), tamanho_chunk))),
+            )
+        self._transacao(inserir)
+        return job_id
+
+    def status(self, job_id: str) -> dict:
+        row = self._conn().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["progresso"] = job["feitos"] / job["total"] if job["total"] else 1.0
+        return job
+
+    def listar(self, limite: int = 20) -> list:
+        rows = self._conn().execute("SELECT id FROM jobs ORDER BY criado_em DESC LIMIT ?", (limite,)).fetchall()
+        return [self.status(r["id"]) for r in rows]
+
+    def cancelar(self, job_id: str):
+        def cancelar(conn):
+            conn.execute(
+                "UPDATE jobs SET estado = 'cancelado', atualizado_em = ? WHERE id = ? AND estado IN ('na_fila', 'executando')",
+                (time.time(), job_id),
+            )
+            conn.execute(
+                "UPDATE chunks SET estado = 'cancelado' WHERE job_id = ? AND estado NOT IN ('feito', 'falhou')", (job_id,)
+            )
+        self._transacao(cancelar)
+
+    def remover(self, job_id: str):
+        def remover(conn):
+            for tabela, coluna in (("itens", "job_id"), ("chunks", "job_id"), ("jobs", "id")):
+                conn.execute(f"DELETE FROM {tabela} WHERE {coluna} = ?", (job_id,))
+        self._transacao(remover)
+
+    def linhas(self, job_id: str):
+        # Linhas já concluídas, na ordem do arquivo enviado (parcial enquanto o job roda)
+        cursor = self._conn().execute(
+            "SELECT resultado FROM itens WHERE job_id = ? AND resultado IS NOT NULL ORDER BY seq", (job_id,)
+        )
+        for (resultado,) in cursor:
+            yield json.loads(resultado)
+
+    def exportar(self, job_id: str, caminho: str, formato: str = None) -> int:
+        job = self.status(job_id)
+        with Exportador(formato or job["formato"], caminho, LOTE_CSV_COLS) as exportador:
+            for row in self.linhas(job_id):
+                exportador.escrever(row)
+        return exportador.linhas
+
+    # ---------- workers ----------
+    def workers_ativos(self) -> int:
+        limite = time.time() - 3 * BATIMENTO_SEGUNDOS
+        return self._conn().execute("SELECT COUNT(*) FROM workers WHERE visto_em >= ?", (limite,)).fetchone()[0]
+
+    def garantir_workers(self, quantidade: int = WORKERS_PADRAO) -> int:
+        # Sobe processos destacados do app: continuam mesmo se a sessão do navegador cair.
+        # Várias sessões chamam isto ao mesmo tempo (render_jobs a cada 3s): quem decide
+        # disparar pega um lease na tabela controle, e as demais esperam ele vencer, tempo
+        # suficiente para os novos workers se registrarem.
+        agora = time.time()
+
+        def reservar_disparo(conn):
+            lease = conn.execute("SELECT ate FROM controle WHERE nome = 'disparo_workers'").fetchone()
+            if lease is not None and lease["ate"] > agora:
+                return 0
+            faltam = max(0, quantidade - self.workers_ativos())
+            if faltam:
+                conn.execute(
+                    "INSERT OR REPLACE INTO controle (nome, ate) VALUES ('disparo_workers', ?)",
+                    (agora + DISPARO_LEASE_SEGUNDOS,),
+                )
+            return faltam
+
+        faltam = self._transacao(reservar_disparo)
+        if not faltam:
+            return 0
+        env = dict(os.environ, CNPJ_JOBS_PATH=str(self.caminho))
+        env["CNPJ_COTA_PATH"] = COTA_COMPARTILHADA_PATH or ""
+        log = open(self.caminho.with_suffix(".log"), "ab")
+        for _ in range(faltam):
+            subprocess.Popen(
+                [sys.executable, "-m", "cnpj_core.jobs", "worker"],
+                cwd=str(APP_DIR), env=env, stdin=subprocess.DEVNULL, stdout=log, stderr=log,
+                start_new_session=True,
+            )
+        log.close()
+        return faltam
+
+    def _reservar_chunk(self, worker_id: str):
+        agora = time.time()
+
+        def reservar(conn):
+            while True:
+                row = conn.execute(
+                    "SELECT c.job_id, c.chunk, c.inicio, c.fim, c.tentativas FROM chunks c JOIN jobs j ON j.id = c.job_id "
+                    "WHERE (c.estado = 'pendente' AND COALESCE(c.disponivel_em, 0) <= ?) "
+                    "OR (c.estado = 'reservado' AND c.lease_ate < ?) "
+                    "ORDER BY j.criado_em, c.chunk LIMIT 1",
+                    (agora, agora),
+                ).fetchone()
+                if row is None:
+                    return None
+                if row["tentativas"] < CHUNK_MAX_TENTATIVAS:
+                    break
+                # Lease vencido na última tentativa: o worker morreu em todas elas
+                self._abandonar_chunk(conn, dict(row), agora)
+            conn.execute(
+                "UPDATE chunks SET estado = 'reservado', worker = ?, lease_ate = ?, tentativas = tentativas + 1 "
+                "WHERE job_id = ? AND chunk = ?",
+                (worker_id, agora + LEASE_SEGUNDOS, row["job_id"], row["chunk"]),
+            )
+            conn.execute(
+                "UPDATE jobs SET estado = 'executando', atualizado_em = ? WHERE id = ? AND estado = 'na_fila'",
+                (agora, row["job_id"]),
+            )
+            return dict(row)
+        return self._transacao(reservar)
+
+    def _gravar_checkpoint(self, job_id: str, chunk: int, worker_id: str, linhas: list) -> bool:
+        # Grava as linhas prontas e renova o lease; False se o job foi cancelado ou o
+        # chunk passou para outro worker (lease vencido), e este deve largá-lo
+        agora = time.time()
+
+        def gravar(conn):
+            dono = conn.execute(
+                "SELECT c.estado, c.worker, j.estado FROM chunks c JOIN jobs j ON j.id = c.job_id "
+                "WHERE c.job_id = ? AND c.chunk = ?",
+                (job_id, chunk),
+            ).fetchone()
+            if dono is None or dono[0] != "reservado" or dono[1] != worker_id or dono[2] == "cancelado":
+                return False
+            feitos = ok = erros = 0
+            for seq, row in linhas:
+                anterior = conn.execute(
+                    "SELECT resultado, retentar FROM itens WHERE job_id = ? AND seq = ?", (job_id, seq)
+                ).fetchone()
+                if anterior is None or (anterior["resultado"] is not None and not anterior["retentar"]):
+                    continue
+                conn.execute(
+                    "UPDATE itens SET resultado = ?, retentar = ? WHERE job_id = ? AND seq = ?",
+                    (json.dumps(row, ensure_ascii=False), int(_linha_retentavel(row)), job_id, seq),
+                )
+                if anterior["resultado"] is None:
+                    feitos += 1
+                elif _linha_ok(json.loads(anterior["resultado"])):
+                    ok -= 1  # nova tentativa substitui a linha contada antes
+                else:
+                    erros -= 1
+                if _linha_ok(row):
+                    ok += 1
+                else:
+                    erros += 1
+            conn.execute(
+                "UPDATE jobs SET feitos = feitos + ?, ok = ok + ?, erros = erros + ?, atualizado_em = ? WHERE id = ?",
+                (feitos, ok, erros, agora, job_id),
+            )
+            conn.execute(
+                "UPDATE chunks SET lease_ate = ? WHERE job_id = ? AND chunk = ?", (agora + LEASE_SEGUNDOS, job_id, chunk)
+            )
+            return True
+        return self._transacao(gravar)
+
+    def _concluir_job_se_pronto(self, conn, job_id: str, agora: float):
+        restantes = conn.execute(
+            "SELECT COUNT(*) FROM chunks WHERE job_id = ? AND estado NOT IN ('feito', 'falhou')", (job_id,)
+        ).fetchone()[0]
+        if not restantes:
+            conn.execute(
+                "UPDATE jobs SET estado = 'concluido', concluido_em = ?, atualizado_em = ? WHERE id = ? AND estado = 'executando'",
+                (agora, agora, job_id),
+            )
+
+    def _concluir_chunk(self, chunk: dict, worker_id: str):
+        # Chunk com linhas retentáveis volta para a fila (após ESPERA_RETENTATIVA × 2^n)
+        # enquanto houver tentativas; na última, as linhas ficam como estão
+        agora = time.time()
+        job_id = chunk["job_id"]
+
+        def concluir(conn):
+            atual = conn.execute(
+                "SELECT tentativas FROM chunks WHERE job_id = ? AND chunk = ? AND worker = ? AND estado = 'reservado'",
+                (job_id, chunk["chunk"], worker_id),
+            ).fetchone()
+            if atual is None:
+                return
+            faixa = (job_id, chunk["inicio"], chunk["fim"])
+            retentar = conn.execute(
+                "SELECT COUNT(*) FROM itens WHERE job_id = ? AND seq BETWEEN ? AND ? AND retentar = 1", faixa
+            ).fetchone()[0]
+            if retentar and atual["tentativas"] < CHUNK_MAX_TENTATIVAS:
+                conn.execute(
+                    "UPDATE chunks SET estado = 'pendente', worker = NULL, lease_ate = NULL, disponivel_em = ? "
+                    "WHERE job_id = ? AND chunk = ?",
+                    (agora + ESPERA_RETENTATIVA * 2 ** (atual["tentativas"] - 1), job_id, chunk["chunk"]),
+                )
+                return
+            conn.execute("UPDATE itens SET retentar = 0 WHERE job_id = ? AND seq BETWEEN ? AND ? AND retentar = 1", faixa)
+            conn.execute(
+                "UPDATE chunks SET estado = 'feito', lease_ate = NULL WHERE job_id = ? AND chunk = ?", (job_id, chunk["chunk"])
+            )
+            self._concluir_job_se_pronto(conn, job_id, agora)
+        self._transacao(concluir)
+
+    def _abandonar_chunk(self, conn, chunk: dict, agora: float):
+        # Estado terminal: itens sem resultado recebem linha de erro, retentáveis ficam como estão
+        job_id = chunk["job_id"]
+        faixa = (job_id, chunk["inicio"], chunk["fim"])
+        sem_resultado = conn.execute(
+            "SELECT seq, cnpj FROM itens WHERE job_id = ? AND seq BETWEEN ? AND ? AND resultado IS NULL", faixa
+        ).fetchall()
+        conn.executemany(
+            "UPDATE itens SET resultado = ? WHERE job_id = ? AND seq = ?",
+            [(json.dumps(_linha_erro_lote(r["cnpj"], "falha_processamento"), ensure_ascii=False), job_id, r["seq"])
+             for r in sem_resultado],
+        )
+        conn.execute("UPDATE itens SET retentar = 0 WHERE job_id = ? AND seq BETWEEN ? AND ? AND retentar = 1", faixa)
+        conn.execute(
+            "UPDATE jobs SET feitos = feitos + ?, erros = erros + ?, atualizado_em = ? WHERE id = ?",
+            (len(sem_resultado), len(sem_resultado), agora, job_id),
+        )
+        conn.execute(
+            "UPDATE chunks SET estado = 'falhou', worker = NULL, lease_ate = NULL WHERE job_id = ? AND chunk = ?",
+            (job_id, chunk["chunk"]),
+        )
+        self._concluir_job_se_pronto(conn, job_id, agora)
+
+    def _bater(self, worker_id: str, chunk_atual: dict):
+        agora = time.time()
+        conn = self._conn()
+        conn.execute("UPDATE workers SET visto_em = ? WHERE id = ?", (agora, worker_id))
+        atual = chunk_atual.get("chunk")
+        if atual:
+            conn.execute(
+                "UPDATE chunks SET lease_ate = ? WHERE job_id = ? AND chunk = ? AND worker = ? AND estado = 'reservado'",
+                (agora + LEASE_SEGUNDOS, atual["job_id"], atual["chunk"], worker_id),
+            )
+
+    def processar_chunk(self, chunk: dict, worker_id: str, max_workers: int = LOTE_MAX_WORKERS) -> bool:
+        job_id = chunk["job_id"]
+        pendentes = self._conn().execute(
+            "SELECT seq, cnpj FROM itens WHERE job_id = ? AND seq BETWEEN ? AND ? "
+            "AND (resultado IS NULL OR retentar = 1) ORDER BY seq",
+            (job_id, chunk["inicio"], chunk["fim"]),
+        ).fetchall()
+
+        def processar(item):
+            seq, cnpj = item
+            try:
+                return seq, processar_cnpj_lote(cnpj)
+            except Exception as e:
+                # Um item com erro (ex.: sqlite3.OperationalError no cache) vira linha
+                # retentável em vez de derrubar o worker
+                print(f"job {job_id}: {cnpj}: {type(e).__name__}: {e}", file=sys.stderr)
+                return seq, _linha_erro_lote(cnpj, "unavailable")
+
+        buffer, ultimo = [], time.monotonic()
+        itens = [(r["seq"], r["cnpj"]) for r in pendentes]
+        for seq, row in iterar_lote(itens, processar=processar, max_workers=max_workers):
+            buffer.append((seq, row))
+            if len(buffer) >= CHECKPOINT_LINHAS or time.monotonic() - ultimo >= CHECKPOINT_SEGUNDOS:
+                if not self._gravar_checkpoint(job_id, chunk["chunk"], worker_id, buffer):
+                    return False
+                buffer, ultimo = [], time.monotonic()
+        if buffer and not self._gravar_checkpoint(job_id, chunk["chunk"], worker_id, buffer):
+            return False
+        self._concluir_chunk(chunk, worker_id)
+        return True
+
+    def executar_worker(self, ocioso_max: float = OCIOSO_MAX_PADRAO, max_workers: int = LOTE_MAX_WORKERS):
+        worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        agora = time.time()
+        self._conn().execute(
+            "INSERT INTO workers (id, pid, iniciado_em, visto_em) VALUES (?, ?, ?, ?)", (worker_id, os.getpid(), agora, agora)
+        )
+        chunk_atual = {}
+        parar = threading.Event()
+
+        def batimento():
+            while not parar.wait(BATIMENTO_SEGUNDOS):
+                try:
+                    self._bater(worker_id, chunk_atual)
+                except sqlite3.Error:
+                    pass
+
+        threading.Thread(target=batimento, name="jobs-batimento", daemon=True).start()
+        ocioso_desde = time.monotonic()
+        try:
+            while True:
+                chunk = self._reservar_chunk(worker_id)
+                if chunk is None:
+                    if ocioso_max is not None and time.monotonic() - ocioso_desde > ocioso_max:
+                        break
+                    time.sleep(1)
+                    continue
+                chunk_atual["chunk"] = chunk
+                try:
+                    self.processar_chunk(chunk, worker_id, max_workers=max_workers)
+                except Exception as e:
+                    # Ex.: banco ocupado no checkpoint; o chunk volta à fila quando o lease
+                    # vencer e a tentativa já foi contada
+                    print(f"chunk {chunk['job_id']}/{chunk['chunk']}: {type(e).__name__}: {e}", file=sys.stderr)
+                chunk_atual.pop("chunk", None)
+                ocioso_desde = time.monotonic()
+        finally:
+            parar.set()
+            self._conn().execute("DELETE FROM workers WHERE id = ?", (worker_id,))
+
+
+@functools.lru_cache(maxsize=None)
+def get_fila_jobs() -> FilaJobs:
+    return FilaJobs(JOBS_PATH)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fila de jobs de consulta de CNPJ em lote.")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    p_worker = sub.add_parser("worker", help="processa chunks da fila até ficar ocioso")
+    p_worker.add_argument("--ocioso-max", type=float, default=OCIOSO_MAX_PADRAO,
+                          help="segundos sem trabalho antes de encerrar (0 = nunca)")
+    p_worker.add_argument("--threads", type=int, default=LOTE_MAX_WORKERS)
+    p_enviar = sub.add_parser("enviar", help="cria um job com os CNPJs de um arquivo CSV/TXT")
+    p_enviar.add_argument("arquivo")
+    p_enviar.add_argument("--formato", default="csv")
+    p_status = sub.add_parser("status", help="mostra o andamento dos jobs")
+    p_status.add_argument("job_id", nargs="?")
+    args = parser.parse_args(argv)
+
+    fila = get_fila_jobs()
+    if args.comando == "worker":
+        fila.executar_worker(ocioso_max=args.ocioso_max or None, max_workers=args.threads)
+    elif args.comando == "enviar":
+        from .lote import extrair_cnpjs_lote
+        with open(args.arquivo, "rb") as f:
+            cnpjs, invalidos = extrair_cnpjs_lote(f.read())
+        job_id = fila.criar(cnpjs, nome=Path(args.arquivo).name, formato=args.formato)
+        print(f"job {job_id}: {len(cnpjs)} CNPJs ({invalidos} inválidos ignorados)")
+    else:
+        jobs = [fila.status(args.job_id)] if args.job_id else fila.listar()
+        for job in jobs:
+            if job:
+                print(f"{job['id']} {job['estado']:>10} {job['feitos']}/{job['total']} ok={job['ok']} erros={job['erros']} {job['nome'] or ''}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from .cnpj import format_cnpj_mask
+from .consulta import consulta_brasilapi_cnpj, consulta_ie_open_cnpja, resolver_regime
+from .exportacao import CSV_COLS, montar_linha_csv
+from .exportadores import Exportador
+from .regime import normalizar_situacao_cadastral
+from .validacao import validar_cnpjs
+
+# ---------- consulta em lote ----------
+LOTE_MAX_WORKERS = 8
+# Cada linha consulta as IEs no open.cnpja (~5/min): acima disso um lote síncrono
+# prenderia a requisição/sessão por horas, então API e app o mandam para a fila de jobs
+LOTE_MAX_SINCRONO = int(os.environ.get("CNPJ_LOTE_MAX_SINCRONO", "25"))
+LOTE_LIMITE_BRASILAPI = threading.BoundedSemaphore(4)
+LOTE_LIMITE_OPEN_CNPJA = threading.BoundedSemaphore(2)
+LOTE_STATUS_COL = "Status da Consulta"
+LOTE_CSV_COLS = CSV_COLS + [LOTE_STATUS_COL]
+LOTE_STATUS_TEXTO = {
+    "not_found": "CNPJ não encontrado",
+    "unavailable": "Serviço indisponível",
+    "invalid": "CNPJ inválido",
+    "falha_processamento": "Falha no processamento",
+}
+LOTE_STATUS_OK_SEM_IE = "OK (IE indisponível)"
+_RE_SEPARADORES = re.compile(r'[\r\n;,\t]+')
+
+def extrair_cnpjs_lote(conteudo: bytes):
+    # Células sem dígito (cabeçalhos, nomes) são ignoradas; as demais passam pela
+    # validação vetorizada e só CNPJs com dígitos verificadores corretos seguem para a rede.
+    texto = conteudo.decode("utf-8-sig", errors="ignore")
+    cells = _RE_SEPARADORES.split(texto)
+    if not cells:
+        return [], 0
+    colunas = validar_cnpjs(cells)
+    com_digitos = colunas["n_digitos"] > 0
+    invalidos = int((com_digitos & ~colunas["valido"]).sum())
+    return list(dict.fromkeys(colunas["cnpj"][colunas["valido"]].tolist())), invalidos
+
+def _linha_erro_lote(cnpj_limpo: str, erro: str) -> dict:
+    return {"CNPJ": format_cnpj_mask(cnpj_limpo), LOTE_STATUS_COL: LOTE_STATUS_TEXTO.get(erro, erro)}
+
+def consultar_cnpj_lote(cnpj_limpo: str) -> dict:
+    # Mesmo formato de consultar_cnpj, mas etapa por etapa sob os limites do lote
+    with LOTE_LIMITE_BRASILAPI:
+        dados_cnpj = consulta_brasilapi_cnpj(cnpj_limpo)
+    if not isinstance(dados_cnpj, dict) or "cnpj" not in dados_cnpj:
+        erro = dados_cnpj.get("__error") if isinstance(dados_cnpj, dict) else None
+        return {"cnpj": cnpj_limpo, "erro": erro or "unavailable"}
+    with LOTE_LIMITE_BRASILAPI:
+        regime_final = resolver_regime(cnpj_limpo, dados_cnpj)
+    with LOTE_LIMITE_OPEN_CNPJA:
+        ies = consulta_ie_open_cnpja(cnpj_limpo)
+    return {
+        "cnpj": cnpj_limpo,
+        "erro": None,
+        "dados": dados_cnpj,
+        "regime": regime_final,
+        "situacao": normalizar_situacao_cadastral(dados_cnpj.get("descricao_situacao_cadastral")),
+        "ies": ies,
+    }
+
+def processar_cnpj_lote(cnpj_limpo: str) -> dict:
+    resultado = consultar_cnpj_lote(cnpj_limpo)
+    if resultado["erro"]:
+        return _linha_erro_lote(cnpj_limpo, resultado["erro"])
+    row = montar_linha_csv(resultado["dados"], resultado["regime"], resultado["ies"])
+    row[LOTE_STATUS_COL] = "OK" if resultado["ies"] is not None else LOTE_STATUS_OK_SEM_IE
+    return row
+
+def iterar_lote(cnpjs, processar=processar_cnpj_lote, max_workers: int = LOTE_MAX_WORKERS):
+    # Janela limitada de futures: cada resultado é entregue assim que termina e
+    # descartado em seguida, mantendo a memória constante para listas grandes.
+    pendentes = iter(cnpjs)
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="lote") as pool:
+        em_voo = set()
+        while True:
+            while len(em_voo) < max_workers * 4:
+                cnpj = next(pendentes, None)
+                if cnpj is None:
+                    break
+                em_voo.add(pool.submit(processar, cnpj))
+            if not em_voo:
+                break
+            concluidos, em_voo = wait(em_voo, return_when=FIRST_COMPLETED)
+            for fut in concluidos:
+                yield fut.result()
+
+def executar_lote(cnpjs: list, caminho: str, on_progress=None, max_workers: int = LOTE_MAX_WORKERS,
+                  formato: str = "csv") -> dict:
+    # Cada linha vai direto para o arquivo no formato pedido (csv, parquet, arrow, xlsx)
+    resumo = {"total": len(cnpjs), "ok": 0, "erros": 0, "formato": formato}
+    with Exportador(formato, caminho, LOTE_CSV_COLS) as exportador:
+        for feitos, row in enumerate(iterar_lote(cnpjs, max_workers=max_workers), start=1):
+            exportador.escrever(row)
+            if row.get(LOTE_STATUS_COL, "").startswith("OK"):
+                resumo["ok"] += 1
+            else:
+                resumo["erros"] += 1
+            if on_progress:
+                on_progress(feitos, resumo["total"])
+    return resumo
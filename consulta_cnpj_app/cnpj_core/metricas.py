@@ -0,0 +1,175 @@
+import bisect
+import contextlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+# ---------- métricas (contadores + histogramas de latência) ----------
+# Registro em memória, por processo, sem dependências externas. Cada etapa da
+# consulta abre um span (upstream, cache, índice local, regime, CSV, renderização)
+# que alimenta o histograma cnpj_etapa_segundos; os desfechos viram contadores por
+# provedor e resultado (ok, not_found, 429, 5xx, timeout, cota_local, ...).
+# Exposição em texto Prometheus (api.py: GET /metricas) ou resumo JSON com p50/p95/p99.
+# Com CNPJ_METRICAS_LOG=1 cada span também sai como uma linha JSON no stderr.
+
+BUCKETS_SEGUNDOS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30)
+AJUDA = {
+    "cnpj_etapa_segundos": "Duração de cada etapa da consulta (upstream, http, espera_cota, cache, indice_local, regime, matriz, csv, render, ...).",
+    "cnpj_etapa_excecoes_total": "Exceções que escaparam de uma etapa, por tipo.",
+    "cnpj_upstream_respostas_total": "Tentativas HTTP por provedor e resultado (ok, not_found, 429, 5xx, timeout, erro_conexao, cota_local).",
+    "cnpj_upstream_espera_segundos_total": "Tempo dormindo entre tentativas (Retry-After/backoff) por provedor e motivo.",
+    "cnpj_provedor_resultados_total": "Desfecho de cada consulta a um provedor (ok, not_found, unavailable, cota_local).",
+    "cnpj_provedor_excecoes_total": "Exceções tratadas dentro dos provedores, por tipo.",
+    "cnpj_cache_total": "Leituras do cache persistente por fonte e resultado (hit, hit_negativo, stale, miss, erro, despejos, revalidacao_descartada).",
+    "cnpj_indice_local_total": "Falhas de leitura do índice local.",
+    "cnpj_monitoramento_verificacoes_total": "Verificações da carteira monitorada por resultado (baseline, sem_mudanca, alterado, cache, falha).",
+}
+
+logger = logging.getLogger(__name__)
+
+
+class _Histograma:
+    __slots__ = ("contagens", "soma", "total")
+
+    def __init__(self):
+        self.contagens = [0] * (len(BUCKETS_SEGUNDOS) + 1)  # último = +Inf
+        self.soma = 0.0
+        self.total = 0
+
+    def observar(self, valor: float):
+        self.contagens[bisect.bisect_left(BUCKETS_SEGUNDOS, valor)] += 1
+        self.soma += valor
+        self.total += 1
+
+    def quantil(self, q: float):
+        # Interpolação linear dentro do bucket, como o histogram_quantile do Prometheus
+        if not self.total:
+            return None
+        alvo = q * self.total
+        acumulado = 0
+        for i, n in enumerate(self.contagens):
+            if acumulado + n >= alvo and n:
+                inicio = BUCKETS_SEGUNDOS[i - 1] if i > 0 else 0.0
+                if i >= len(BUCKETS_SEGUNDOS):
+                    return inicio
+                return inicio + (BUCKETS_SEGUNDOS[i] - inicio) * (alvo - acumulado) / n
+            acumulado += n
+        return BUCKETS_SEGUNDOS[-1]
+
+
+def _rotulos_str(rotulos: tuple) -> str:
+    if not rotulos:
+        return ""
+    partes = []
+    for k, v in rotulos:
+        v = str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        partes.append(f'{k}="{v}"')
+    return "{" + ",".join(partes) + "}"
+
+
+class Metricas:
+    def __init__(self, log_json: bool = False):
+        self._lock = threading.Lock()
+        self._contadores = {}
+        self._histogramas = {}
+        self.log_json = log_json
+
+    def _chave(self, nome: str, rotulos: dict):
+        return nome, tuple(sorted((k, str(v)) for k, v in rotulos.items()))
+
+    def contar(self, nome: str, valor: float = 1, **rotulos):
+        chave = self._chave(nome, rotulos)
+        with self._lock:
+            self._contadores[chave] = self._contadores.get(chave, 0) + valor
+
+    def observar(self, nome: str, segundos: float, **rotulos):
+        chave = self._chave(nome, rotulos)
+        with self._lock:
+            hist = self._histogramas.get(chave)
+            if hist is None:
+                hist = self._histogramas[chave] = _Histograma()
+            hist.observar(segundos)
+
+    @contextlib.contextmanager
+    def span(self, etapa: str, **rotulos):
+        # Mede a etapa e a registra em cnpj_etapa_segundos{etapa=...}; exceções são
+        # contadas em cnpj_etapa_excecoes_total com o tipo e relançadas.
+        inicio = time.perf_counter()
+        erro = None
+        try:
+            yield rotulos
+        except BaseException as e:
+            erro = type(e).__name__
+            self.contar("cnpj_etapa_excecoes_total", etapa=etapa, tipo=erro, **rotulos)
+            raise
+        finally:
+            duracao = time.perf_counter() - inicio
+            self.observar("cnpj_etapa_segundos", duracao, etapa=etapa, **rotulos)
+            if self.log_json:
+                evento = {"ts": round(time.time(), 3), "evento": "span", "etapa": etapa, "duracao_ms": round(duracao * 1000, 2), **rotulos}
+                if erro:
+                    evento["erro"] = erro
+                logger.info(json.dumps(evento, ensure_ascii=False, default=str))
+
+    def limpar(self):
+        with self._lock:
+            self._contadores.clear()
+            self._histogramas.clear()
+
+    # ---------- exposição ----------
+    def exposicao_prometheus(self) -> str:
+        with self._lock:
+            contadores = sorted(self._contadores.items())
+            histogramas = sorted((k, (list(h.contagens), h.soma, h.total)) for k, h in self._histogramas.items())
+        linhas = []
+        anterior = None
+        for (nome, rotulos), valor in contadores:
+            if nome != anterior:
+                if nome in AJUDA:
+                    linhas.append(f"# HELP {nome} {AJUDA[nome]}")
+                linhas.append(f"# TYPE {nome} counter")
+                anterior = nome
+            linhas.append(f"{nome}{_rotulos_str(rotulos)} {valor:g}")
+        for (nome, rotulos), (contagens, soma, total) in histogramas:
+            if nome != anterior:
+                if nome in AJUDA:
+                    linhas.append(f"# HELP {nome} {AJUDA[nome]}")
+                linhas.append(f"# TYPE {nome} histogram")
+                anterior = nome
+            acumulado = 0
+            for limite, n in zip(list(BUCKETS_SEGUNDOS) + ["+Inf"], contagens):
+                acumulado += n
+                le = limite if isinstance(limite, str) else f"{limite:g}"
+                linhas.append(f"{nome}_bucket{_rotulos_str(rotulos + (('le', le),))} {acumulado}")
+            linhas.append(f"{nome}_sum{_rotulos_str(rotulos)} {soma:.6f}")
+            linhas.append(f"{nome}_count{_rotulos_str(rotulos)} {total}")
+        return "\n".join(linhas) + "\n"
+
+    def resumo(self) -> dict:
+        # {"contadores": [...], "latencias": [...]} com p50/p95/p99 em ms por série
+        with self._lock:
+            contadores = [
+                {"nome": nome, "rotulos": dict(rotulos), "valor": valor}
+                for (nome, rotulos), valor in sorted(self._contadores.items())
+            ]
+            latencias = []
+            for (nome, rotulos), h in sorted(self._histogramas.items()):
+                serie = {"nome": nome, "rotulos": dict(rotulos), "total": h.total,
+                         "media_ms": round(h.soma / h.total * 1000, 2) if h.total else None}
+                for q in (0.5, 0.95, 0.99):
+                    v = h.quantil(q)
+                    serie[f"p{int(q * 100)}_ms"] = round(v * 1000, 2) if v is not None else None
+                latencias.append(serie)
+        return {"contadores": contadores, "latencias": latencias}
+
+
+METRICAS = Metricas(log_json=os.environ.get("CNPJ_METRICAS_LOG", "") not in ("", "0"))
+if METRICAS.log_json and not logger.handlers:
+    _handler = logging.StreamHandler(sys.stderr)
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
@@ -0,0 +1,337 @@
+import argparse
+import functools
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+
+from .cnpj import format_cnpj_mask, to_matriz_if_filial
+from .consulta import consulta_brasilapi_cnpj, consulta_ie_open_cnpja, fonte_regime, get_cache
+from .lote import extrair_cnpjs_lote, iterar_lote
+from .metricas import METRICAS
+from .regime import determinar_regime_unificado, normalizar_situacao_cadastral, regime_informado
+
+# ---------- monitoramento de carteira de fornecedores ----------
+# Cada CNPJ monitorado guarda só o estado relevante (situação normalizada, regime,
+# opção pelo Simples/MEI e IEs com "habilitada") e uma impressão digital (hash) dele.
+# A verificação agenda cada CNPJ pela idade da última checagem ponderada pelo risco
+# e registra apenas as diferenças (ex.: ATIVO → INAPTO, saída do Simples, IE desabilitada).
+#
+# python -m cnpj_core.monitoramento adicionar fornecedores.csv
+# python -m cnpj_core.monitoramento verificar --limite 200
+# python -m cnpj_core.monitoramento mudancas --dias 7
+
+MONITORAMENTO_PATH = os.environ.get(
+    "CNPJ_MONITORAMENTO_PATH", str(Path(__file__).resolve().parent.parent / ".cache" / "monitoramento.sqlite3")
+)
+DIA = 24 * 3600
+INTERVALO_BASE = 7 * DIA        # CNPJ ativo, sem mudanças recentes: uma vez por semana
+INTERVALO_MINIMO = 1 * DIA
+INTERVALO_BAIXADO = 30 * DIA    # baixa é terminal: checagem só de vez em quando
+ESPERA_FALHA_BASE = 3600        # após falha: 1h, 2h, 4h... até INTERVALO_MINIMO
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS monitorados (
+    cnpj          TEXT PRIMARY KEY,
+    apelido       TEXT,
+    adicionado_em REAL NOT NULL,
+    verificado_em REAL,
+    proxima_em    REAL NOT NULL,
+    impressao     TEXT,
+    estado        TEXT,
+    risco         REAL NOT NULL DEFAULT 0,
+    falhas        INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_monitorados_proxima ON monitorados (proxima_em);
+CREATE TABLE IF NOT EXISTS mudancas (
+    id           INTEGER PRIMARY KEY AUTOINCREMENT,
+    cnpj         TEXT NOT NULL,
+    detectado_em REAL NOT NULL,
+    campo        TEXT NOT NULL,
+    antes        TEXT,
+    depois       TEXT,
+    descricao    TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_mudancas_data ON mudancas (detectado_em);
+"""
+
+
+# ---------- estado monitorado + impressão digital ----------
+CAMPOS_OPCIONAIS = ("regime", "simples", "mei", "ies")
+
+def estado_monitorado(dados: dict, regime: str, ies) -> dict:
+    # Campo que a fonte não trouxe fica None ("desconhecido"): regime=None quando o payload
+    # não permite determiná-lo, simples/mei ausentes, ies=None (falha ao consultar)
+    simples, mei = dados.get("opcao_pelo_simples"), dados.get("opcao_pelo_mei")
+    return {
+        "situacao": normalizar_situacao_cadastral(dados.get("descricao_situacao_cadastral")),
+        "regime": None if regime is None else regime.upper(),
+        "simples": None if simples is None else bool(simples),
+        "mei": None if mei is None else bool(mei),
+        "ies": None if ies is None else sorted(
+            [ie.get("uf") or "", str(ie.get("numero") or ""), bool(ie.get("habilitada"))] for ie in ies
+        ),
+    }
+
+def impressao_digital(estado: dict) -> str:
+    return hashlib.sha1(json.dumps(estado, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()[:16]
+
+def _sim_nao(v) -> str:
+    return "Sim" if v else "Não"
+
+def _habilitada(v) -> str:
+    return "habilitada" if v else "desabilitada"
+
+def diferencas(anterior: dict, atual: dict) -> list:
+    # Lista de {"campo", "antes", "depois", "descricao"} entre dois estados monitorados
+    mudancas = []
+
+    def registrar(campo, antes, depois, descricao):
+        mudancas.append({"campo": campo, "antes": antes, "depois": depois, "descricao": descricao})
+
+    def comparavel(campo):
+        # Campo desconhecido (None) em qualquer dos lados não é comparado
+        return anterior.get(campo) is not None and atual.get(campo) is not None and anterior[campo] != atual[campo]
+
+    if anterior["situacao"] != atual["situacao"]:
+        registrar("situacao", anterior["situacao"], atual["situacao"],
+                  f"Situação cadastral: {anterior['situacao']} → {atual['situacao']}")
+    if comparavel("regime"):
+        registrar("regime", anterior["regime"], atual["regime"], f"Regime: {anterior['regime']} → {atual['regime']}")
+    if comparavel("simples"):
+        registrar("simples", _sim_nao(anterior["simples"]), _sim_nao(atual["simples"]),
+                  "Saída do Simples Nacional" if anterior["simples"] else "Opção pelo Simples Nacional")
+    if comparavel("mei"):
+        registrar("mei", _sim_nao(anterior["mei"]), _sim_nao(atual["mei"]),
+                  "Desenquadramento do MEI" if anterior["mei"] else "Enquadramento no MEI")
+    if anterior.get("ies") is None or atual["ies"] is None:
+        return mudancas
+    ies_antes = {(uf, numero): hab for uf, numero, hab in anterior["ies"]}
+    ies_depois = {(uf, numero): hab for uf, numero, hab in atual["ies"]}
+    for (uf, numero), hab in sorted(ies_depois.items()):
+        if (uf, numero) not in ies_antes:
+            registrar("ie", None, f"{uf} {numero}", f"Nova IE: {uf} {numero}")
+        elif ies_antes[(uf, numero)] != hab:
+            registrar("ie", f"{uf} {numero} {_habilitada(ies_antes[(uf, numero)])}", f"{uf} {numero} {_habilitada(hab)}",
+                      f"IE {uf} {numero} {'reabilitada' if hab else 'desabilitada'}")
+    for (uf, numero) in sorted(set(ies_antes) - set(ies_depois)):
+        registrar("ie", f"{uf} {numero}", None, f"IE removida: {uf} {numero}")
+    return mudancas
+
+def calcular_risco(estado: dict, houve_mudanca: bool) -> float:
+    risco = 0.0
+    if estado["situacao"] not in ("ATIVO", "BAIXADO"):
+        risco += 2  # inapta/suspensa: pode ser regularizada ou baixada
+    if any(not hab for _, _, hab in estado["ies"] or []):
+        risco += 1
+    if houve_mudanca:
+        risco += 1
+    return risco
+
+def proximo_intervalo(estado: dict, risco: float) -> float:
+    if estado["situacao"] == "BAIXADO":
+        return INTERVALO_BAIXADO
+    return max(INTERVALO_MINIMO, INTERVALO_BASE / (1 + risco))
+
+
+class Monitoramento:
+    def __init__(self, caminho: str = MONITORAMENTO_PATH):
+        self.caminho = Path(caminho)
+        self.caminho.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.caminho), timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    # ---------- carteira ----------
+    def adicionar(self, cnpjs, apelido: str = None) -> int:
+        # CNPJs já monitorados são mantidos como estão; novos entram como pendentes
+        agora = time.time()
+        conn = self._conn()
+        antes = conn.total_changes
+        conn.executemany(
+            "INSERT OR IGNORE INTO monitorados (cnpj, apelido, adicionado_em, proxima_em) VALUES (?, ?, ?, ?)",
+            [(c, apelido, agora, agora) for c in dict.fromkeys(cnpjs)],
+        )
+        return conn.total_changes - antes
+
+    def remover(self, cnpj: str):
+        self._conn().execute("DELETE FROM monitorados WHERE cnpj = ?", (cnpj,))
+
+    def listar(self) -> list:
+        rows = self._conn().execute("SELECT * FROM monitorados ORDER BY cnpj").fetchall()
+        return [dict(r) for r in rows]
+
+    def resumo(self) -> dict:
+        agora = time.time()
+        total, pendentes, nunca = self._conn().execute(
+            "SELECT COUNT(*), SUM(proxima_em <= ?), SUM(verificado_em IS NULL) FROM monitorados", (agora,)
+        ).fetchone()
+        return {"total": total, "pendentes": pendentes or 0, "nunca_verificados": nunca or 0}
+
+    def pendentes(self, limite: int = 100, agora: float = None) -> list:
+        # Vencidos primeiro os nunca verificados, depois por idade da checagem × (1 + risco)
+        agora = time.time() if agora is None else agora
+        rows = self._conn().execute(
+            "SELECT cnpj FROM monitorados WHERE proxima_em <= ? "
+            "ORDER BY verificado_em IS NOT NULL, (? - COALESCE(verificado_em, 0)) * (1 + risco) DESC LIMIT ?",
+            (agora, agora, limite),
+        ).fetchall()
+        return [r[0] for r in rows]
+
+    def mudancas(self, desde: float = None, limite: int = 1000) -> list:
+        rows = self._conn().execute(
+            "SELECT * FROM mudancas WHERE detectado_em >= ? ORDER BY detectado_em DESC, id DESC LIMIT ?",
+            (desde or 0, limite),
+        ).fetchall()
+        return [dict(r) for r in rows]
+
+    # ---------- verificação ----------
+    def _cache_vale_ate(self, cnpj: str, verificado_em):
+        # Se os dados em cache (do CNPJ, das IEs e da matriz) ainda valem e já existiam na
+        # última verificação, consultar de novo devolveria exatamente o que foi comparado:
+        # retorna até quando isso vale (vencimento do cache), ou None se há algo novo a buscar.
+        if verificado_em is None:
+            return None
+        cache = get_cache()
+        agora = time.time()
+        validade = float("inf")
+        chaves = [("dados_cnpj", cnpj), ("open_cnpja", cnpj)]
+        if to_matriz_if_filial(cnpj) != cnpj:
+            chaves.append(("dados_cnpj", to_matriz_if_filial(cnpj)))
+        for fonte, chave in chaves:
+            meta = cache.metadados(fonte, chave)
+            if meta is None or meta["expira_em"] < agora or meta["gravado_em"] > verificado_em:
+                return None
+            validade = min(validade, meta["expira_em"])
+        return validade
+
+    def _resultado(self, cnpj: str, resultado: str, mudancas: list = None) -> dict:
+        METRICAS.contar("cnpj_monitoramento_verificacoes_total", resultado=resultado)
+        return {"cnpj": cnpj, "resultado": resultado, "mudancas": mudancas or []}
+
+    def verificar(self, cnpj: str) -> dict:
+        # Retorna {"cnpj", "resultado": "baseline" | "sem_mudanca" | "alterado" | "cache" | "falha", "mudancas"}
+        # ("cache" = nada novo desde a última verificação, sem nenhuma chamada de rede)
+        conn = self._conn()
+        row = conn.execute("SELECT * FROM monitorados WHERE cnpj = ?", (cnpj,)).fetchone()
+        if row is None:
+            return {"cnpj": cnpj, "resultado": "nao_monitorado", "mudancas": []}
+        anterior = json.loads(row["estado"]) if row["estado"] else None
+
+        cache_vale_ate = self._cache_vale_ate(cnpj, row["verificado_em"]) if anterior is not None else None
+        if cache_vale_ate is not None:
+            # Não antes do intervalo normal de checagem, mesmo que o cache vença antes
+            proxima = max(cache_vale_ate, row["verificado_em"] + proximo_intervalo(anterior, row["risco"]))
+            conn.execute("UPDATE monitorados SET proxima_em = ? WHERE cnpj = ?", (proxima, cnpj))
+            return self._resultado(cnpj, "cache")
+
+        dados = consulta_brasilapi_cnpj(cnpj, exigir_atual=True)
+        if not isinstance(dados, dict) or "cnpj" not in dados:
+            falhas = row["falhas"] + 1
+            espera = min(INTERVALO_MINIMO, ESPERA_FALHA_BASE * 2 ** (falhas - 1))
+            conn.execute(
+                "UPDATE monitorados SET falhas = ?, proxima_em = ? WHERE cnpj = ?", (falhas, time.time() + espera, cnpj)
+            )
+            return self._resultado(cnpj, "falha")
+        ies = consulta_ie_open_cnpja(cnpj, exigir_atual=True)
+        regime_source, _ = fonte_regime(cnpj, dados, exigir_atual=True)
+        regime = determinar_regime_unificado(regime_source) if regime_informado(regime_source) else None
+        atual = estado_monitorado(dados, regime, ies)
+        if anterior is not None:
+            # Campo que a fonte não trouxe agora (IE indisponível, payload sem regime) mantém
+            # o último valor conhecido em vez de virar mudança
+            for campo in CAMPOS_OPCIONAIS:
+                if atual[campo] is None:
+                    atual[campo] = anterior.get(campo)
+        impressao = impressao_digital(atual)
+        # Carimbado depois das consultas: as entradas de cache gravadas agora ficam
+        # anteriores a verificado_em, e a próxima verificação pode usar o atalho "cache"
+        agora = time.time()
+
+        mudancas = [] if anterior is None or impressao == row["impressao"] else diferencas(anterior, atual)
+        risco = calcular_risco(atual, bool(mudancas))
+        conn.execute("BEGIN")
+        try:
+            conn.execute(
+                "UPDATE monitorados SET verificado_em = ?, proxima_em = ?, impressao = ?, estado = ?, risco = ?, falhas = 0 "
+                "WHERE cnpj = ?",
+                (agora, agora + proximo_intervalo(atual, risco), impressao,
+                 json.dumps(atual, ensure_ascii=False), risco, cnpj),
+            )
+            conn.executemany(
+                "INSERT INTO mudancas (cnpj, detectado_em, campo, antes, depois, descricao) VALUES (?, ?, ?, ?, ?, ?)",
+                [(cnpj, agora, m["campo"], m["antes"], m["depois"], m["descricao"]) for m in mudancas],
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        resultado = "baseline" if anterior is None else ("alterado" if mudancas else "sem_mudanca")
+        return self._resultado(cnpj, resultado, mudancas)
+
+    def executar_ciclo(self, limite: int = 100, on_progress=None, max_workers: int = 4) -> dict:
+        # Verifica até `limite` CNPJs vencidos, em ordem de prioridade
+        cnpjs = self.pendentes(limite)
+        resumo = {"verificados": 0, "alterados": 0, "mudancas": []}
+        for feitos, r in enumerate(iterar_lote(cnpjs, processar=self.verificar, max_workers=max_workers), start=1):
+            resumo[r["resultado"]] = resumo.get(r["resultado"], 0) + 1
+            resumo["verificados"] += 1
+            if r["mudancas"]:
+                resumo["alterados"] += 1
+                resumo["mudancas"] += [{"cnpj": r["cnpj"], **m} for m in r["mudancas"]]
+            if on_progress:
+                on_progress(feitos, len(cnpjs))
+        return resumo
+
+
+@functools.lru_cache(maxsize=None)
+def get_monitoramento() -> Monitoramento:
+    return Monitoramento(MONITORAMENTO_PATH)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Monitoramento de mudanças cadastrais de uma carteira de CNPJs.")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    p_add = sub.add_parser("adicionar", help="adiciona os CNPJs de um arquivo CSV/TXT à carteira")
+    p_add.add_argument("arquivo")
+    p_add.add_argument("--apelido")
+    p_ver = sub.add_parser("verificar", help="verifica os CNPJs vencidos, em ordem de prioridade")
+    p_ver.add_argument("--limite", type=int, default=100)
+    p_mud = sub.add_parser("mudancas", help="lista as mudanças detectadas")
+    p_mud.add_argument("--dias", type=float, default=7)
+    args = parser.parse_args(argv)
+
+    monitor = get_monitoramento()
+    if args.comando == "adicionar":
+        with open(args.arquivo, "rb") as f:
+            cnpjs, invalidos = extrair_cnpjs_lote(f.read())
+        novos = monitor.adicionar(cnpjs, args.apelido)
+        print(f"{novos} CNPJs adicionados ({len(cnpjs) - novos} já monitorados, {invalidos} inválidos).")
+    elif args.comando == "verificar":
+        def progresso(feitos, total):
+            print(f"{feitos}/{total}", file=sys.stderr)
+        resumo = monitor.executar_ciclo(args.limite, progresso)
+        for m in resumo["mudancas"]:
+            print(f"{format_cnpj_mask(m['cnpj'])}: {m['descricao']}")
+        print(f"{resumo['verificados']} verificados, {resumo['alterados']} com mudanças.")
+    else:
+        for m in monitor.mudancas(desde=time.time() - args.dias * DIA):
+            data = time.strftime("%Y-%m-%d %H:%M", time.localtime(m["detectado_em"]))
+            print(f"{data}  {format_cnpj_mask(m['cnpj'])}: {m['descricao']}")
+
+
+if __name__ == "__main__":
+    main()
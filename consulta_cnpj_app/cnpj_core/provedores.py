@@ -0,0 +1,327 @@
+import os
+import re
+from abc import ABC, abstractmethod
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from .cnpj import normalizar_cnpj
+from .http_client import get_cliente, LimiteTaxaExcedido
+from .metricas import METRICAS
+
+# ---------- provedores de dados de CNPJ ----------
+# Cada provedor devolve o mesmo formato de dicionário da BrasilAPI (consumido pela
+# renderização e pelo CSV) ou {"__error": "not_found" | "unavailable"}.
+# O campo "__fonte" indica qual provedor respondeu.
+
+_RE_NAO_DIGITO = re.compile(r'[^0-9]')
+_RE_DATA_BR = re.compile(r'^(\d{2})/(\d{2})/(\d{4})$')
+_RE_TELEFONE = re.compile(r'^\((\d+)\)\s*(.+)$')
+
+def _digitos(s) -> str:
+    return _RE_NAO_DIGITO.sub('', str(s or ""))
+
+def _int_ou_none(s):
+    d = _digitos(s)
+    return int(d) if d else None
+
+def _data_br_para_iso(s):
+    m = _RE_DATA_BR.match(s or "")
+    return f"{m.group(3)}-{m.group(2)}-{m.group(1)}" if m else s
+
+
+class Provedor(ABC):
+    nome = ""
+    url_padrao = ""
+    env_url = ""
+    hedge = True  # pode ser disparado em paralelo (hedging), não só como failover
+
+    def __init__(self):
+        self.url_base = os.environ.get(self.env_url, self.url_padrao) if self.env_url else self.url_padrao
+
+    def _get(self, cnpj_limpo: str, espera_token: float = None):
+        return get_cliente(self.nome).get(f"{self.url_base}{cnpj_limpo}", espera_token=espera_token)
+
+    def consultar(self, cnpj_limpo: str, espera_token: float = None) -> dict:
+        try:
+            r = self._get(cnpj_limpo, espera_token)
+            if r.status_code in (400, 404):
+                return {"__error": "not_found"}
+            if r.status_code != 200:
+                return {"__error": "unavailable"}
+            dados = self.normalizar(r.json())
+        except LimiteTaxaExcedido:
+            return {"__error": "unavailable", "__cota": True}
+        except Exception as e:
+            # RequestException, JSON inválido ou falha do normalizador: a consulta segue
+            # para o próximo provedor, mas o tipo da exceção fica registrado
+            METRICAS.contar("cnpj_provedor_excecoes_total", provedor=self.nome, tipo=type(e).__name__)
+            return {"__error": "unavailable"}
+        if "__error" not in dados:
+            dados["__fonte"] = self.nome
+        return dados
+
+    @abstractmethod
+    def normalizar(self, data: dict) -> dict:
+        ...
+
+
+class ProvedorBrasilAPI(Provedor):
+    nome = "brasilapi"
+    url_padrao = "https://brasilapi.com.br/api/cnpj/v1/"
+    env_url = "CNPJ_BRASILAPI_URL"
+
+    def normalizar(self, data: dict) -> dict:
+        if not isinstance(data, dict) or "cnpj" not in data:
+            return {"__error": "unavailable"}
+        return data
+
+
+class ProvedorOpenCnpja(Provedor):
+    nome = "open_cnpja"
+    url_padrao = "https://open.cnpja.com/office/"
+    env_url = "CNPJ_OPEN_CNPJA_URL"
+    hedge = False  # cota de ~5/min é a mesma das IEs: só entra como failover
+
+    def normalizar(self, data: dict) -> dict:
+        if not isinstance(data, dict) or not data.get("taxId"):
+            return {"__error": "unavailable"}
+        company = data.get("company") or {}
+        address = data.get("address") or {}
+        phones = data.get("phones") or []
+        emails = data.get("emails") or []
+        main = data.get("mainActivity") or {}
+        nature = company.get("nature") or {}
+        size = company.get("size") or {}
+        dados = {
+            "cnpj": normalizar_cnpj(data.get("taxId")),
+            "razao_social": company.get("name"),
+            "nome_fantasia": data.get("alias") or "",
+            "descricao_situacao_cadastral": ((data.get("status") or {}).get("text") or "").upper(),
+            "data_inicio_atividade": data.get("founded"),
+            "cnae_fiscal": main.get("id"),
+            "cnae_fiscal_descricao": main.get("text"),
+            "porte": (size.get("text") or "").upper() or None,
+            "natureza_juridica": f"{nature.get('id')} - {nature.get('text')}" if nature.get("id") else nature.get("text"),
+            "capital_social": company.get("equity"),
+            "email": (emails[0] or {}).get("address") if emails else None,
+            "logradouro": address.get("street"),
+            "numero": address.get("number"),
+            "complemento": address.get("details"),
+            "bairro": address.get("district"),
+            "municipio": (address.get("city") or "").upper() or None,
+            "uf": address.get("state"),
+            "cep": address.get("zip"),
+            "opcao_pelo_simples": (company.get("simples") or {}).get("optant"),
+            "opcao_pelo_mei": (company.get("simei") or {}).get("optant"),
+            "qsa": [
+                {
+                    "nome_socio": (m.get("person") or {}).get("name"),
+                    "qualificacao_socio": (m.get("role") or {}).get("text"),
+                    "data_entrada_sociedade": m.get("since"),
+                    "cnpj_cpf_do_socio": (m.get("person") or {}).get("taxId"),
+                }
+                for m in (company.get("members") or [])
+            ],
+            "cnaes_secundarios": [
+                {"codigo": a.get("id"), "descricao": a.get("text")}
+                for a in (data.get("sideActivities") or [])
+            ],
+        }
+        for i, phone in enumerate(phones[:2], start=1):
+            dados[f"ddd_telefone_{i}"] = (phone or {}).get("area")
+            dados[f"telefone_{i}"] = (phone or {}).get("number")
+        return dados
+
+    @staticmethod
+    def normalizar_ies(data) -> list:
+        regs = data.get("registrations", []) if isinstance(data, dict) else []
+        ies = []
+        for reg in regs:
+            ies.append({
+                "uf": (reg or {}).get("state"),
+                "numero": (reg or {}).get("number"),
+                "habilitada": (reg or {}).get("enabled"),
+                "status_texto": ((reg or {}).get("status") or {}).get("text"),
+                "tipo_texto": ((reg or {}).get("type") or {}).get("text"),
+            })
+        return ies
+
+    def consultar_ies(self, cnpj_limpo: str, max_retries: int = 2, espera_token: float = None):
+        # Lista de IEs normalizadas, [] quando não há registro e None em falha transitória
+        try:
+            resp = get_cliente(self.nome).get(
+                f"{self.url_base}{cnpj_limpo}", max_tentativas=max_retries + 1, espera_token=espera_token
+            )
+            if resp.status_code == 200:
+                return self.normalizar_ies(resp.json())
+            if resp.status_code == 404:
+                return []
+            return None
+        except LimiteTaxaExcedido:
+            return None
+        except Exception as e:
+            METRICAS.contar("cnpj_provedor_excecoes_total", provedor=f"{self.nome}_ie", tipo=type(e).__name__)
+            return None
+
+
+class ProvedorReceitaWS(Provedor):
+    nome = "receitaws"
+    url_padrao = "https://receitaws.com.br/v1/cnpj/"
+    env_url = "CNPJ_RECEITAWS_URL"
+
+    def normalizar(self, data: dict) -> dict:
+        if not isinstance(data, dict):
+            return {"__error": "unavailable"}
+        if data.get("status") == "ERROR":
+            msg = (data.get("message") or "").lower()
+            return {"__error": "not_found" if "inválido" in msg or "invalido" in msg or "não encontrado" in msg else "unavailable"}
+        atividade = (data.get("atividade_principal") or [{}])[0] or {}
+        fones = [f.strip() for f in (data.get("telefone") or "").split("/") if f.strip()]
+        dados = {
+            "cnpj": normalizar_cnpj(data.get("cnpj")),
+            "razao_social": data.get("nome"),
+            "nome_fantasia": data.get("fantasia") or "",
+            "descricao_situacao_cadastral": data.get("situacao"),
+            "data_inicio_atividade": _data_br_para_iso(data.get("abertura")),
+            "cnae_fiscal": _int_ou_none(atividade.get("code")),
+            "cnae_fiscal_descricao": atividade.get("text"),
+            "porte": data.get("porte"),
+            "natureza_juridica": data.get("natureza_juridica"),
+            "capital_social": data.get("capital_social"),
+            "email": data.get("email"),
+            "logradouro": data.get("logradouro"),
+            "numero": data.get("numero"),
+            "complemento": data.get("complemento"),
+            "bairro": data.get("bairro"),
+            "municipio": data.get("municipio"),
+            "uf": data.get("uf"),
+            "cep": _digitos(data.get("cep")),
+            "opcao_pelo_simples": (data.get("simples") or {}).get("optante"),
+            "opcao_pelo_mei": (data.get("simei") or {}).get("optante"),
+            "qsa": [
+                {"nome_socio": q.get("nome"), "qualificacao_socio": q.get("qual")}
+                for q in (data.get("qsa") or [])
+            ],
+            "cnaes_secundarios": [
+                {"codigo": _int_ou_none(a.get("code")), "descricao": a.get("text")}
+                for a in (data.get("atividades_secundarias") or [])
+                if _int_ou_none(a.get("code"))
+            ],
+        }
+        for i, fone in enumerate(fones[:2], start=1):
+            m = _RE_TELEFONE.match(fone)
+            dados[f"ddd_telefone_{i}"], dados[f"telefone_{i}"] = (m.group(1), m.group(2)) if m else (None, fone)
+        return dados
+
+
+# ---------- estatísticas por provedor ----------
+class EstatisticasProvedores:
+    # Latência média móvel exponencial e taxa de erro recente (também EWMA) por provedor
+    def __init__(self, alfa: float = 0.2, taxa_erro_rebaixa: float = 0.5, latencia_rebaixa: float = 8.0):
+        self.alfa = alfa
+        self.taxa_erro_rebaixa = taxa_erro_rebaixa
+        self.latencia_rebaixa = latencia_rebaixa  # segundos; acima disso o provedor está "pendurado"
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def registrar(self, nome: str, latencia: float, sucesso: bool):
+        with self._lock:
+            st = self._stats.setdefault(nome, {"chamadas": 0, "erros": 0, "latencia_ewma": latencia, "taxa_erro": 0.0})
+            st["chamadas"] += 1
+            st["erros"] += 0 if sucesso else 1
+            st["latencia_ewma"] += self.alfa * (latencia - st["latencia_ewma"])
+            st["taxa_erro"] += self.alfa * ((0.0 if sucesso else 1.0) - st["taxa_erro"])
+
+    def rebaixado(self, nome: str) -> bool:
+        # As estatísticas só tiram um provedor da sua posição (erro recente alto ou
+        # latência muito acima do normal); nunca promovem um sem histórico ou mais lento
+        with self._lock:
+            st = self._stats.get(nome)
+        if st is None:
+            return False
+        return st["taxa_erro"] >= self.taxa_erro_rebaixa or st["latencia_ewma"] >= self.latencia_rebaixa
+
+    def resumo(self) -> dict:
+        with self._lock:
+            return {k: dict(v) for k, v in self._stats.items()}
+
+
+# ---------- failover + hedging ----------
+PROVEDORES_DADOS = [ProvedorBrasilAPI(), ProvedorOpenCnpja(), ProvedorReceitaWS()]
+PROVEDOR_IE = PROVEDORES_DADOS[1]
+ESTATISTICAS = EstatisticasProvedores()
+HEDGE_APOS = float(os.environ.get("CNPJ_HEDGE_APOS", "0") or 0)  # segundos; 0 (padrão) desativa
+_pool_provedores = ThreadPoolExecutor(max_workers=16, thread_name_prefix="provedor")
+
+def ordenar_provedores(provedores: list = None) -> list:
+    # Ordem configurada, com os rebaixados no fim. Provedor de cota apertada (hedge=False,
+    # open.cnpja divide a cota com as IEs) nunca assume a primeira posição.
+    provedores = provedores or PROVEDORES_DADOS
+    ordem = sorted(provedores, key=lambda p: (ESTATISTICAS.rebaixado(p.nome), provedores.index(p)))
+    if not ordem[0].hedge:
+        primario = next((p for p in ordem if p.hedge), None)
+        if primario is not None:
+            ordem.remove(primario)
+            ordem.insert(0, primario)
+    return ordem
+
+def _resultado_dados(dados: dict) -> str:
+    if dados.get("__cota"):
+        return "cota_local"
+    return dados.get("__error") or "ok"
+
+def _consultar_medindo(provedor: Provedor, cnpj_limpo: str, espera_token: float = None) -> dict:
+    inicio = time.monotonic()
+    with METRICAS.span("upstream", provedor=provedor.nome) as rotulos:
+        dados = provedor.consultar(cnpj_limpo, espera_token)
+        rotulos["resultado"] = _resultado_dados(dados)
+    METRICAS.contar("cnpj_provedor_resultados_total", provedor=provedor.nome, resultado=rotulos["resultado"])
+    if dados.pop("__cota", False):
+        return dados  # sem cota disponível não é falha do provedor
+    ESTATISTICAS.registrar(provedor.nome, time.monotonic() - inicio, dados.get("__error") != "unavailable")
+    return dados
+
+def consultar_dados_cnpj(cnpj_limpo: str, espera_token: float = None, hedge_apos: float = None) -> dict:
+    # Tenta os provedores na ordem de ordenar_provedores. "not_found" é resposta
+    # definitiva; só "unavailable" dispara o próximo provedor (failover) quando
+    # nada mais está em voo. Com hedging (opt-in, CNPJ_HEDGE_APOS), a cada hedge_apos
+    # sem resposta o próximo provedor com hedge=True é disparado em paralelo (apenas
+    # se houver cota imediata) e vale a primeira resposta conclusiva.
+    hedge_apos = HEDGE_APOS if hedge_apos is None else hedge_apos
+    fila = ordenar_provedores()
+    em_voo = {}
+    proximo_hedge = None
+    resultado = {"__error": "unavailable"}
+    while fila or em_voo:
+        if not em_voo:
+            provedor = fila.pop(0)
+            em_voo[_pool_provedores.submit(_consultar_medindo, provedor, cnpj_limpo, espera_token)] = provedor
+            proximo_hedge = time.monotonic() + hedge_apos
+        elif hedge_apos and time.monotonic() >= proximo_hedge:
+            provedor = next((p for p in fila if p.hedge), None)
+            if provedor is not None:
+                fila.remove(provedor)
+                em_voo[_pool_provedores.submit(_consultar_medindo, provedor, cnpj_limpo, 0)] = provedor
+            proximo_hedge = time.monotonic() + hedge_apos
+        timeout = None
+        if hedge_apos and any(p.hedge for p in fila):
+            timeout = max(0.0, proximo_hedge - time.monotonic())
+        concluidos, _ = wait(em_voo, timeout=timeout, return_when=FIRST_COMPLETED)
+        for fut in concluidos:
+            em_voo.pop(fut)
+            dados = fut.result()
+            if dados.get("__error") != "unavailable":
+                return dados
+            resultado = dados
+    return resultado
+
+def consultar_ies(cnpj_limpo: str, max_retries: int = 2, espera_token: float = None):
+    inicio = time.monotonic()
+    nome = f"{PROVEDOR_IE.nome}_ie"
+    with METRICAS.span("upstream", provedor=nome) as rotulos:
+        ies = PROVEDOR_IE.consultar_ies(cnpj_limpo, max_retries, espera_token)
+        rotulos["resultado"] = "unavailable" if ies is None else ("ok" if ies else "not_found")
+    METRICAS.contar("cnpj_provedor_resultados_total", provedor=nome, resultado=rotulos["resultado"])
+    ESTATISTICAS.registrar(nome, time.monotonic() - inicio, ies is not None)
+    return ies
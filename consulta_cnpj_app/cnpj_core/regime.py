@@ -0,0 +1,46 @@
+import datetime
+import functools
+
+# ---------- regime unificado ----------
+def determinar_regime_unificado(dados_cnpj: dict) -> str:
+    is_mei = dados_cnpj.get("opcao_pelo_mei")
+    if is_mei: return "MEI"
+    is_simples = dados_cnpj.get("opcao_pelo_simples")
+    if is_simples: return "SIMPLES NACIONAL"
+    regimes = dados_cnpj.get("regime_tributario") or []
+    if regimes:
+        current_year = datetime.date.today().year
+        anos = [r.get("ano") for r in regimes if isinstance(r.get("ano"), int)]
+        if anos:
+            candidatos = [a for a in anos if a <= current_year]
+            alvo = max(candidatos) if candidatos else max(anos)
+            regime_alvo = next((r for r in reversed(regimes) if r.get("ano") == alvo), regimes[-1])
+            forma = (regime_alvo or {}).get("forma_de_tributacao", "N/A")
+            return str(forma).upper()
+        forma = (regimes[-1] or {}).get("forma_de_tributacao", "N/A")
+        return str(forma).upper()
+    return "N/A"
+
+def regime_informado(dados_cnpj: dict) -> bool:
+    # O payload permite determinar o regime? Índice local e provedores alternativos não
+    # trazem regime_tributario: deles só sai Simples/MEI, o resto seria um "N/A" falso.
+    return bool("regime_tributario" in dados_cnpj or dados_cnpj.get("opcao_pelo_simples") or dados_cnpj.get("opcao_pelo_mei"))
+
+# ---------- Situação Cadastral (normalizada) ----------
+# (trecho, situação) na ordem de teste; o primeiro trecho contido no texto decide
+SITUACOES_CADASTRAIS = (
+    ("ATIV", "ATIVO"),
+    ("INAPT", "INAPTO"),
+    ("SUSP", "SUSPENSO"),
+    ("BAIX", "BAIXADO"),
+)
+
+@functools.lru_cache(maxsize=256)  # poucos valores distintos, chamada a cada linha de lote
+def normalizar_situacao_cadastral(txt: str) -> str:
+    s = (txt or "").strip().upper()
+    if not s:
+        return "N/A"
+    for trecho, situacao in SITUACOES_CADASTRAIS:
+        if trecho in s:
+            return situacao
+    return s
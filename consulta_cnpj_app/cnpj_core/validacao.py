@@ -0,0 +1,106 @@
+import numpy as np
+
+# ---------- validação vetorizada de CNPJs ----------
+# Recebe listas grandes de CNPJs (com ou sem máscara, numéricos ou alfanuméricos) e
+# faz tudo em arrays NumPy: extração dos caracteres, cálculo dos dois dígitos
+# verificadores, derivação da matriz (ordem 0001) e agrupamento por raiz, sem
+# laço Python por CNPJ.
+
+PESOS_13 = np.array([5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2], dtype=np.int32)
+PESOS_14 = np.array([6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2], dtype=np.int32)
+ORDEM_MATRIZ = np.array([48, 48, 48, 49], dtype=np.uint32)  # "0001"
+
+# Tabelas por code point ASCII: valor do caractere no cálculo do DV (ASCII - 48,
+# -1 para caracteres descartados) e a versão maiúscula de cada caractere.
+TABELA_VALOR = np.full(128, -1, dtype=np.int32)
+TABELA_VALOR[48:58] = np.arange(10)
+TABELA_VALOR[65:91] = np.arange(65, 91) - 48
+TABELA_VALOR[97:123] = np.arange(65, 91) - 48
+TABELA_MAIUSCULA = np.arange(128, dtype=np.uint32)
+TABELA_MAIUSCULA[97:123] -= 32
+
+
+def _codepoints(cnpjs) -> np.ndarray:
+    # Array de strings "<Un" visto como matriz (N, n) de code points, zero-preenchida
+    u = np.asarray(cnpjs, dtype=str).ravel()
+    largura = u.dtype.itemsize // 4
+    cp = np.ascontiguousarray(u).view(np.uint32).reshape(len(u), largura)
+    return np.where(cp < 128, cp, 0)  # fora do ASCII conta como separador
+
+def normalizar_cnpjs(cnpjs):
+    # Retorna (caracteres (N, 14) em code points maiúsculos, qtd. de caracteres
+    # alfanuméricos por entrada, qtd. de dígitos por entrada)
+    cp = _codepoints(cnpjs)
+    eh_alnum = TABELA_VALOR[cp] >= 0
+    eh_digito = (cp >= 48) & (cp <= 57)
+    n_caracteres = eh_alnum.sum(axis=1)
+    n_digitos = eh_digito.sum(axis=1)
+    # CNPJ numérico no meio de texto (ex.: "CNPJ: 21.746.980/0001-46"): usa só os dígitos
+    so_digitos = (n_caracteres != 14) & (n_digitos == 14)
+    if so_digitos.any():
+        eh_alnum = np.where(so_digitos[:, None], eh_digito, eh_alnum)
+        n_caracteres = np.where(so_digitos, 14, n_caracteres)
+    # Compactação sem ordenação: a soma acumulada dá a posição de destino de cada
+    # caractere útil na linha; os 14 primeiros são espalhados na matriz de saída.
+    posicao = np.cumsum(eh_alnum, axis=1, dtype=np.int32) - 1
+    selecao = eh_alnum & (posicao < 14)
+    linhas = np.nonzero(selecao)[0]
+    caracteres = np.zeros((len(cp), 14), dtype=np.uint32)
+    caracteres[linhas, posicao[selecao]] = TABELA_MAIUSCULA[cp[selecao]]
+    return caracteres, n_caracteres, n_digitos
+
+def calcular_dvs(valores12: np.ndarray) -> np.ndarray:
+    r13 = (valores12 * PESOS_13).sum(axis=1) % 11
+    d13 = np.where(r13 < 2, 0, 11 - r13)
+    r14 = ((valores12 * PESOS_14[:12]).sum(axis=1) + d13 * PESOS_14[12]) % 11
+    d14 = np.where(r14 < 2, 0, 11 - r14)
+    return np.stack([d13, d14], axis=1)
+
+def caracteres_para_str(caracteres: np.ndarray) -> np.ndarray:
+    largura = caracteres.shape[1]
+    return np.ascontiguousarray(caracteres, dtype=np.uint32).view(f"<U{largura}").ravel()
+
+def validar_cnpjs(cnpjs) -> dict:
+    # Colunas paralelas (arrays de mesmo tamanho da entrada). "cnpj" e "matriz" ficam
+    # vazios quando a entrada não tem 14 caracteres alfanuméricos.
+    caracteres, n_caracteres, n_digitos = normalizar_cnpjs(cnpjs)
+    tamanho_ok = n_caracteres == 14
+    valores = TABELA_VALOR[caracteres]
+    dvs = calcular_dvs(valores[:, :12])
+    dv_numerico = (valores[:, 12:] <= 9).all(axis=1)
+    repetidos = (caracteres == caracteres[:, :1]).all(axis=1)
+    valido = tamanho_ok & dv_numerico & (dvs == valores[:, 12:]).all(axis=1) & ~repetidos
+
+    eh_matriz = (caracteres[:, 8:12] == ORDEM_MATRIZ).all(axis=1)
+    base_matriz = np.concatenate([caracteres[:, :8], np.broadcast_to(ORDEM_MATRIZ, (len(caracteres), 4))], axis=1)
+    matriz = np.concatenate([base_matriz, calcular_dvs(TABELA_VALOR[base_matriz]).astype(np.uint32) + 48], axis=1)
+
+    return {
+        "cnpj": np.where(tamanho_ok, caracteres_para_str(caracteres), ""),
+        "valido": valido,
+        "alfanumerico": tamanho_ok & (n_digitos < 14),
+        "n_caracteres": n_caracteres,
+        "n_digitos": n_digitos,
+        "raiz": np.where(tamanho_ok, caracteres_para_str(caracteres[:, :8]), ""),
+        "eh_matriz": tamanho_ok & eh_matriz,
+        "matriz": np.where(tamanho_ok, caracteres_para_str(matriz), ""),
+    }
+
+def validar_cnpjs_df(cnpjs):
+    import pandas as pd
+    colunas = validar_cnpjs(cnpjs)
+    df = pd.DataFrame(colunas)
+    df.insert(0, "entrada", np.asarray(cnpjs, dtype=object))
+    return df
+
+def agrupar_por_raiz(cnpjs) -> dict:
+    # raiz -> array de CNPJs válidos daquela raiz
+    colunas = validar_cnpjs(cnpjs)
+    validos = colunas["cnpj"][colunas["valido"]]
+    raizes = colunas["raiz"][colunas["valido"]]
+    if len(validos) == 0:
+        return {}
+    ordem = np.argsort(raizes, kind="stable")
+    raizes, validos = raizes[ordem], validos[ordem]
+    unicas, inicio = np.unique(raizes, return_index=True)
+    return dict(zip(unicas.tolist(), np.split(validos, inicio[1:])))
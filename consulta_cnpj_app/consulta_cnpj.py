@@ -1,14 +1,17 @@
 import streamlit as st
-import requests
-import re
 from pathlib import Path
-import time
 import datetime
-import io
-import csv
-
-URL_BRASILAPI_CNPJ = "https://brasilapi.com.br/api/cnpj/v1/"
-URL_OPEN_CNPJA = "https://open.cnpja.com/office/"
+import os
+import tempfile
+import time
+import weakref
+from cnpj_core import (
+    normalizar_cnpj, cnpj_valido, format_currency_brl, format_phone, format_cnpj_mask, to_matriz_if_filial,
+    normalizar_situacao_cadastral, regime_informado, CSV_COLS, SITUACAO_CREDITO_TEXTO, montar_linha_csv, build_csv_bytes,
+    get_cache, resolver_regime, fonte_regime, iniciar_consulta_paralela, aguardar_resultado,
+)
+from cnpj_core import provedores
+from cnpj_core.metricas import METRICAS
 
 st.set_page_config(page_title="Consulta CNPJ - Adapta", layout="centered", initial_sidebar_state="collapsed")
 
@@ -40,119 +43,27 @@ st.markdown("""
 
 IMAGE_DIR = Path(__file__).resolve().parent.parent / "images"
 
-def only_digits(s: str) -> str:
-    return re.sub(r'[^0-9]', '', s or "")
-
-def format_currency_brl(v):
-    try:
-        return f"R$ {float(v):,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
-    except:
-        return "N/A"
-
-def format_phone(ddd, num):
-    return f"({ddd}) {num}" if ddd and num else "N/A"
-
-def format_cnpj_mask(cnpj: str) -> str:
-    c = only_digits(cnpj)
-    return f"{c[0:2]}.{c[2:5]}.{c[5:8]}/{c[8:12]}-{c[12:14]}" if len(c) == 14 else cnpj
-
-# ---------- matriz utils ----------
-def calcular_digitos_verificadores_cnpj(cnpj_base_12_digitos: str) -> str:
-    pesos_12 = [5,4,3,2,9,8,7,6,5,4,3,2]
-    pesos_13 = [6,5,4,3,2,9,8,7,6,5,4,3,2]
-    def dv(base, pesos):
-        s = sum(int(base[i]) * pesos[i] for i in range(len(base)))
-        r = s % 11
-        return '0' if r < 2 else str(11 - r)
-    d13 = dv(cnpj_base_12_digitos[:12], pesos_12)
-    d14 = dv(cnpj_base_12_digitos[:12] + d13, pesos_13)
-    return d13 + d14
-
-def to_matriz_if_filial(cnpj_clean: str) -> str:
-    if len(cnpj_clean) != 14:
-        return cnpj_clean
-    if cnpj_clean[8:12] != "0001":
-        raiz = cnpj_clean[:8]
-        base12 = raiz + "0001"
-        dvs = calcular_digitos_verificadores_cnpj(base12)
-        return base12 + dvs
-    return cnpj_clean
-
-# ---------- consultas (white-label) ----------
-@st.cache_data(ttl=3600, show_spinner=False)
-def consulta_brasilapi_cnpj(cnpj_limpo: str):
-    try:
-        r = requests.get(f"{URL_BRASILAPI_CNPJ}{cnpj_limpo}", timeout=15)
-        if r.status_code in (400, 404):
-            return {"__error": "not_found"}
-        if r.status_code in (429, 500, 502, 503, 504):
-            return {"__error": "unavailable"}
-        r.raise_for_status()
-        return r.json()
-    except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
-        return {"__error": "unavailable"}
-    except requests.exceptions.HTTPError:
-        return {"__error": "unavailable"}
-    except Exception:
-        return {"__error": "unavailable"}
-
-@st.cache_data(ttl=3600, show_spinner=False)
-def consulta_ie_open_cnpja(cnpj_limpo: str, max_retries: int = 2):
-    url = f"{URL_OPEN_CNPJA}{cnpj_limpo}"
-    attempt = 0
-    while True:
-        try:
-            resp = requests.get(url, timeout=15)
-            if resp.status_code == 200:
-                data = resp.json()
-                regs = data.get("registrations", []) if isinstance(data, dict) else []
-                ies = []
-                for reg in regs:
-                    ies.append({
-                        "uf": (reg or {}).get("state"),
-                        "numero": (reg or {}).get("number"),
-                        "habilitada": (reg or {}).get("enabled"),
-                        "status_texto": ((reg or {}).get("status") or {}).get("text"),
-                        "tipo_texto": ((reg or {}).get("type") or {}).get("text"),
-                    })
-                return ies
-            if resp.status_code == 404:
-                return []
-            if resp.status_code == 429 and attempt < max_retries:
-                time.sleep(2 * (attempt + 1)); attempt += 1; continue
-            return None
-        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
-            return None
-        except Exception:
-            return None
-
-# ---------- regime unificado + badges ----------
-def determinar_regime_unificado(dados_cnpj: dict) -> str:
-    is_mei = dados_cnpj.get("opcao_pelo_mei")
-    if is_mei: return "MEI"
-    is_simples = dados_cnpj.get("opcao_pelo_simples")
-    if is_simples: return "SIMPLES NACIONAL"
-    regimes = dados_cnpj.get("regime_tributario") or []
-    if regimes:
-        current_year = datetime.date.today().year
-        anos = [r.get("ano") for r in regimes if isinstance(r.get("ano"), int)]
-        if anos:
-            candidatos = [a for a in anos if a <= current_year]
-            alvo = max(candidatos) if candidatos else max(anos)
-            regime_alvo = next((r for r in reversed(regimes) if r.get("ano") == alvo), regimes[-1])
-            forma = (regime_alvo or {}).get("forma_de_tributacao", "N/A")
-            return str(forma).upper()
-        forma = (regimes[-1] or {}).get("forma_de_tributacao", "N/A")
-        return str(forma).upper()
-    return "N/A"
+@st.cache_resource
+def carregar_imagem(nome: str) -> bytes:
+    # Lido do disco uma vez por processo; os reruns reaproveitam os bytes
+    return (IMAGE_DIR / nome).read_bytes()
+
+# ---------- badges ----------
+# (trecho do regime, (fundo, texto)) na ordem de teste; sem correspondência fica vermelho
+CORES_REGIME = (
+    ("MEI", ("#FB923C", "#111111")),              # laranja
+    ("SIMPLES", ("#FACC15", "#111111")),          # amarelo
+    ("LUCRO REAL", ("#3B82F6", "#FFFFFF")),       # azul
+    ("LUCRO PRESUMIDO", ("#22C55E", "#111111")),  # verde
+)
+COR_REGIME_PADRAO = ("#EF4444", "#FFFFFF")        # vermelho
 
 def badge_cor_regime(regime: str):
     r = (regime or "").upper()
-    if "MEI" in r: return "#FB923C", "#111111"        # laranja
-    if "SIMPLES" in r: return "#FACC15", "#111111"    # amarelo
-    if "LUCRO REAL" in r: return "#3B82F6", "#FFFFFF" # azul
-    if "LUCRO PRESUMIDO" in r: return "#22C55E", "#111111" # verde
-    return "#EF4444", "#FFFFFF"                       # vermelho
+    for trecho, cores in CORES_REGIME:
+        if trecho in r:
+            return cores
+    return COR_REGIME_PADRAO
 
 def render_badge(texto: str, bg: str, fg: str):
     st.markdown(
@@ -166,72 +77,503 @@ def render_regime_badge(regime: str):
     bg, fg = badge_cor_regime(regime)
     render_badge(regime, bg, fg)
 
-# ---------- Situação Cadastral (normalizada + bolinhas) ----------
-def normalizar_situacao_cadastral(txt: str) -> str:
-    s = (txt or "").strip().upper()
-    if not s:
-        return "N/A"
-    if "ATIV" in s:       return "ATIVO"
-    if "INAPT" in s:      return "INAPTO"
-    if "SUSP" in s:       return "SUSPENSO"
-    if "BAIX" in s:       return "BAIXADO"
-    return s
+# ---------- Situação Cadastral (bolinhas) ----------
+BADGE_SITUACAO = {
+    "ATIVO": ("🟢", "Ativo"),
+    "INAPTO": ("🟡", "Inapto"),
+    "SUSPENSO": ("🟠", "Suspenso"),
+    "BAIXADO": ("🔴", "Baixado"),
+}
 
 def render_situacao_badge(label: str, valor: str):
     s = (valor or "N/A").upper()
-    if s == "ATIVO":
-        icon, txt = "🟢", "Ativo"
-    elif s == "INAPTO":
-        icon, txt = "🟡", "Inapto"
-    elif s == "SUSPENSO":
-        icon, txt = "🟠", "Suspenso"
-    elif s == "BAIXADO":
-        icon, txt = "🔴", "Baixado"
-    else:
-        icon, txt = "⚪", (valor.title() if valor else "N/A")
+    icon, txt = BADGE_SITUACAO.get(s) or ("⚪", (valor.title() if valor else "N/A"))
     st.write(f"**{label}:** {icon} {txt}")
 
-# ---------- Helpers CSV ----------
-def join_ies_for_csv(ies_list):
-    if not ies_list:
-        return ""
-    blocks = []
-    for ie in ies_list:
-        uf = ie.get("uf") or ""
-        numero = ie.get("numero") or ""
-        habil = "Sim" if ie.get("habilitada") else "Não"
-        status_txt = ie.get("status_texto") or ""
-        tipo_txt = ie.get("tipo_texto") or ""
-        blocks.append(f"UF: {uf} | IE: {numero} | Habilitada: {habil} | Status: {status_txt} | Tipo: {tipo_txt}")
-    return " || ".join(blocks)
-
-def build_csv_bytes(row_dict: dict, field_order: list) -> bytes:
-    buf = io.StringIO()
-    writer = csv.DictWriter(buf, fieldnames=field_order, extrasaction="ignore")
-    writer.writeheader()
-    writer.writerow({k: ("" if row_dict.get(k) is None else str(row_dict.get(k))) for k in field_order})
-    return buf.getvalue().encode("utf-8-sig")
+# ---------- consulta em lote ----------
+def _apagar_arquivo(caminho: str):
+    try:
+        os.unlink(caminho)
+    except FileNotFoundError:
+        pass
+
+class ArquivoSessao:
+    # Arquivo temporário do resultado de um lote, guardado em st.session_state: é apagado
+    # quando outro lote o substitui ou quando a sessão é descartada (objeto coletado)
+    def __init__(self, sufixo: str):
+        fd, self.caminho = tempfile.mkstemp(prefix="lote_cnpj_", suffix=sufixo)
+        os.close(fd)
+        self._apagar = weakref.finalize(self, _apagar_arquivo, self.caminho)
+
+    def apagar(self):
+        self._apagar()
+
+# Os modos lote/empresa/monitoramento importam seus módulos só quando são abertos:
+# a consulta individual (tela inicial) não paga numpy, exportadores nem a fila de jobs.
+def render_consulta_lote():
+    from cnpj_core import (
+        FORMATOS_EXPORTACAO, LOTE_MAX_SINCRONO, executar_lote, extrair_cnpjs_lote, formatos_disponiveis, get_fila_jobs,
+    )
+    arquivo = st.file_uploader(
+        "Envie um arquivo CSV ou TXT com os CNPJs (um por linha ou por célula):",
+        type=["csv", "txt"],
+    )
+    formato = st.selectbox(
+        "Formato do arquivo de resultado:",
+        formatos_disponiveis(),
+        format_func=lambda f: FORMATOS_EXPORTACAO[f]["rotulo"],
+        help="Parquet e Arrow mantêm IEs, QSA e CNAEs secundários como listas; CSV e Excel trazem esses campos como texto.",
+    )
+    em_segundo_plano = st.checkbox(
+        "Processar em segundo plano",
+        help="O processamento continua mesmo se você fechar o navegador, retoma de onde parou após uma falha "
+             f"e permite baixar o resultado parcial. Lotes com mais de {LOTE_MAX_SINCRONO} CNPJs sempre vão "
+             "para segundo plano.",
+    )
+    if st.button("Processar lote"):
+        if arquivo is None:
+            st.warning("Por favor, envie um arquivo com os CNPJs para consultar.")
+            return
+        cnpjs, invalidos = extrair_cnpjs_lote(arquivo.getvalue())
+        if not cnpjs:
+            st.error("Nenhum CNPJ válido encontrado no arquivo.")
+            return
+        st.info(f"{len(cnpjs)} CNPJs únicos para consultar" + (f" ({invalidos} entradas inválidas ignoradas)." if invalidos else "."))
+        if len(cnpjs) > LOTE_MAX_SINCRONO and not em_segundo_plano:
+            # A consulta de IEs (~5/min) prenderia esta sessão por horas
+            st.info(f"Lotes com mais de {LOTE_MAX_SINCRONO} CNPJs são processados em segundo plano.")
+            em_segundo_plano = True
+        if em_segundo_plano:
+            fila = get_fila_jobs()
+            fila.criar(cnpjs, nome=arquivo.name, formato=formato)
+            fila.garantir_workers()
+            st.success("Lote enviado para processamento em segundo plano. Acompanhe o andamento abaixo.")
+            st.session_state.pop("lote_resumo", None)
+        else:
+            barra = st.progress(0.0, text="Iniciando consultas...")
+            def on_progress(feitos, total):
+                if feitos % 25 == 0 or feitos == total:
+                    barra.progress(feitos / total, text=f"{feitos}/{total} CNPJs consultados")
+            anterior = st.session_state.pop("lote_arquivo", None)
+            st.session_state.pop("lote_resumo", None)
+            if anterior is not None:
+                anterior.apagar()
+            arquivo_lote = ArquivoSessao(FORMATOS_EXPORTACAO[formato]["extensao"])
+            st.session_state["lote_arquivo"] = arquivo_lote
+            st.session_state["lote_resumo"] = executar_lote(cnpjs, arquivo_lote.caminho, on_progress, formato=formato)
+
+    arquivo_lote = st.session_state.get("lote_arquivo")
+    caminho = arquivo_lote.caminho if arquivo_lote is not None else None
+    resumo = st.session_state.get("lote_resumo")
+    if caminho and resumo and Path(caminho).exists():
+        st.success(f"Lote concluído: {resumo['ok']} consultas com sucesso, {resumo['erros']} com erro.")
+        info = FORMATOS_EXPORTACAO[resumo["formato"]]
+        # O arquivo só é lido do disco quando o usuário clica, não a cada rerun da página
+        st.download_button(
+            label=f"📤 Exportar {info['rotulo']} do lote",
+            data=lambda: Path(caminho).read_bytes(),
+            file_name=f"CNPJ_lote_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}{info['extensao']}",
+            mime=info["mime"],
+            help="Baixa o arquivo com uma linha por CNPJ consultado",
+            on_click="ignore",
+        )
+    render_jobs()
+
+def _baixar_job(job_id: str, formato: str):
+    from cnpj_core import FORMATOS_EXPORTACAO, get_fila_jobs
+    # Exporta o que já foi concluído (parcial enquanto o job roda) no clique do botão
+    fd, caminho = tempfile.mkstemp(prefix="job_cnpj_", suffix=FORMATOS_EXPORTACAO[formato]["extensao"])
+    os.close(fd)
+    try:
+        get_fila_jobs().exportar(job_id, caminho, formato)
+        return Path(caminho).read_bytes()
+    finally:
+        os.unlink(caminho)
+
+@st.fragment(run_every=3)
+def render_jobs():
+    # Só este trecho é redesenhado a cada 3s para mostrar o progresso dos jobs
+    from cnpj_core import FORMATOS_EXPORTACAO, JOB_ESTADO_TEXTO, get_fila_jobs
+    fila = get_fila_jobs()
+    jobs = fila.listar(limite=10)
+    if not jobs:
+        return
+    st.markdown("## Lotes em segundo plano")
+    if any(j["estado"] in ("na_fila", "executando") for j in jobs) and not fila.workers_ativos():
+        fila.garantir_workers()
+    for job in jobs:
+        rotulo = f"{job['nome'] or job['id']} · {job['feitos']}/{job['total']} CNPJs · {job['ok']} ok, {job['erros']} com erro"
+        st.progress(job["progresso"], text=f"{JOB_ESTADO_TEXTO.get(job['estado'], job['estado'])}: {rotulo}")
+        info = FORMATOS_EXPORTACAO[job["formato"]]
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button(
+                label=f"📤 Baixar {info['rotulo']}" + (" (parcial)" if job["estado"] != "concluido" else ""),
+                data=lambda job_id=job["id"], formato=job["formato"]: _baixar_job(job_id, formato),
+                file_name=f"CNPJ_lote_{job['id']}{info['extensao']}",
+                mime=info["mime"],
+                key=f"baixar_job_{job['id']}",
+                disabled=not job["feitos"],
+                on_click="ignore",
+            )
+        with col2:
+            if job["estado"] in ("na_fila", "executando"):
+                st.button("Cancelar", key=f"cancelar_job_{job['id']}", on_click=fila.cancelar, args=(job["id"],))
+            else:
+                st.button("Remover", key=f"remover_job_{job['id']}", on_click=fila.remover, args=(job["id"],))
+
+def render_consulta_grupo():
+    from cnpj_core import build_csv_grupo, consultar_grupo, extrair_raiz
+    entrada = st.text_input(
+        "Digite um CNPJ da empresa ou a raiz (8 primeiros caracteres):",
+        placeholder="Ex: 21.746.980 ou 21.746.980/0002-27",
+    )
+    outros = st.text_area(
+        "Outros CNPJs conhecidos da empresa (opcional, um por linha):",
+        help="Sem a base local de dados abertos, só a matriz e os CNPJs informados aqui são consultados.",
+    )
+    incluir_ies = st.checkbox("Consultar Inscrições Estaduais de cada estabelecimento", value=True)
+    if st.button("Consultar empresa"):
+        if extrair_raiz(entrada) is None:
+            st.error("Informe um CNPJ válido ou a raiz de 8 caracteres.")
+            return
+        barra = st.progress(0.0, text="Consultando estabelecimentos...")
+        def on_progress(feitos, total):
+            barra.progress(feitos / total, text=f"{feitos}/{total} estabelecimentos consultados")
+        st.session_state["grupo_resultado"] = consultar_grupo(
+            entrada, informados=outros.splitlines(), incluir_ies=incluir_ies, on_progress=on_progress
+        )
+
+    grupo = st.session_state.get("grupo_resultado")
+    if not grupo:
+        return
+    if grupo["erro"] == "not_found":
+        st.error("Nenhum estabelecimento encontrado para esta raiz.")
+        return
+    if grupo["erro"]:
+        st.error("Serviço temporariamente indisponível. Tente novamente em alguns instantes.")
+        return
+    st.markdown(
+        f"<div style='text-align:center; font-size: 1.6rem; font-weight: 800; color: #FFC300; margin: 6px 0 2px 0;'>{grupo['razao_social']}</div>",
+        unsafe_allow_html=True
+    )
+    st.markdown("## Regime Tributário (matriz)")
+    render_regime_badge(grupo["regime"])
+    estabelecimentos = grupo["estabelecimentos"]
+    encontrados = sum(1 for e in estabelecimentos if e["erro"] is None)
+    st.markdown("---")
+    st.markdown(f"## Estabelecimentos ({encontrados} de {len(estabelecimentos)})")
+    if grupo["origem_lista"] != "indice_local":
+        st.caption("Lista montada com a matriz e os CNPJs informados (base local de dados abertos não disponível).")
+    if grupo["truncado"]:
+        st.warning(f"A empresa tem mais estabelecimentos; apenas os {len(estabelecimentos)} primeiros foram consultados.")
+    tabela = []
+    for e in estabelecimentos:
+        dados = e["dados"] or {}
+        tabela.append({
+            "CNPJ": format_cnpj_mask(e["cnpj"]),
+            "Tipo": "Matriz" if e["matriz"] else "Filial",
+            "Situação": (e["situacao"] or "").title() if not e["erro"] else "",
+            "Município/UF": f"{dados.get('municipio') or ''}/{dados.get('uf') or ''}" if dados else "",
+            "IEs": ", ".join(f"{ie.get('uf')}: {ie.get('numero')}" for ie in (e["ies"] or [])),
+            "Status": "OK" if not e["erro"] else e["erro"],
+        })
+    st.dataframe(tabela, hide_index=True)
+    st.download_button(
+        label="📤 Exportar CSV da empresa",
+        data=lambda: build_csv_grupo(grupo),
+        file_name=f"CNPJ_raiz_{grupo['raiz']}.csv",
+        mime="text/csv",
+        help="Baixa um CSV com uma linha por estabelecimento, com o regime da matriz",
+        on_click="ignore",
+    )
+
+def render_monitoramento():
+    from cnpj_core import extrair_cnpjs_lote, get_monitoramento
+    monitor = get_monitoramento()
+    with st.expander("Adicionar CNPJs à carteira"):
+        arquivo = st.file_uploader("Arquivo CSV ou TXT com os CNPJs dos fornecedores:", type=["csv", "txt"], key="monitor_arquivo")
+        apelido = st.text_input("Apelido (opcional, ex.: nome da carteira ou do comprador):", key="monitor_apelido")
+        if st.button("Adicionar à carteira"):
+            if arquivo is None:
+                st.warning("Por favor, envie um arquivo com os CNPJs.")
+            else:
+                cnpjs, invalidos = extrair_cnpjs_lote(arquivo.getvalue())
+                novos = monitor.adicionar(cnpjs, apelido or None)
+                st.success(f"{novos} CNPJs adicionados ({len(cnpjs) - novos} já monitorados"
+                           + (f", {invalidos} entradas inválidas ignoradas)." if invalidos else ")."))
+
+    resumo = monitor.resumo()
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Monitorados", resumo["total"])
+    col2.metric("Verificação pendente", resumo["pendentes"])
+    col3.metric("Nunca verificados", resumo["nunca_verificados"])
+    if st.button("Verificar pendentes", disabled=not resumo["pendentes"]):
+        barra = st.progress(0.0, text="Verificando carteira...")
+        def on_progress(feitos, total):
+            barra.progress(feitos / total, text=f"{feitos}/{total} CNPJs verificados")
+        st.session_state["monitor_ciclo"] = monitor.executar_ciclo(limite=200, on_progress=on_progress)
+        st.rerun()  # atualiza os contadores acima
+    ciclo = st.session_state.get("monitor_ciclo")
+    if ciclo:
+        st.success(
+            f"{ciclo['verificados']} verificados: {ciclo['alterados']} com mudanças, "
+            f"{ciclo.get('cache', 0)} sem consulta nova (cache vigente), {ciclo.get('falha', 0)} com falha."
+        )
+
+    st.markdown("## Mudanças nos últimos 7 dias")
+    mudancas = monitor.mudancas(desde=time.time() - 7 * 24 * 3600)
+    if not mudancas:
+        st.caption("Nenhuma mudança detectada no período.")
+        return
+    st.dataframe([
+        {
+            "Detectado em": datetime.datetime.fromtimestamp(m["detectado_em"]).strftime("%d/%m/%Y %H:%M"),
+            "CNPJ": format_cnpj_mask(m["cnpj"]),
+            "Mudança": m["descricao"],
+        }
+        for m in mudancas
+    ], hide_index=True)
+
+# ---------- resultados da sessão ----------
+# Cada consulta individual concluída fica em st.session_state["resultados"] (por CNPJ),
+# e a tela é redesenhada a partir dali em qualquer rerun: baixar o CSV ou reabrir
+# uma consulta recente não dispara nenhuma chamada de rede. Resultado incompleto (IEs
+# indisponíveis, matriz sem resposta no prazo, fonte sem regime) é consultado de novo
+# quando o usuário clica em "Consultar CNPJ" para o mesmo CNPJ.
+RESULTADOS_MAX = 20
+
+def guardar_resultado(cnpj_limpo: str, dados_cnpj: dict, regime_final: str, ies, completo: bool = True):
+    resultados = st.session_state.setdefault("resultados", {})
+    resultados.pop(cnpj_limpo, None)
+    resultados[cnpj_limpo] = {"dados": dados_cnpj, "regime": regime_final, "ies": ies, "consultado_em": time.time(),
+                              "completo": completo}
+    while len(resultados) > RESULTADOS_MAX:
+        resultados.pop(next(iter(resultados)))
+    st.session_state["cnpj_aberto"] = cnpj_limpo
+
+def abrir_resultado(cnpj_limpo: str):
+    st.session_state["cnpj_aberto"] = cnpj_limpo
+
+def render_historico():
+    resultados = st.session_state.get("resultados") or {}
+    if not resultados:
+        return
+    with st.expander(f"Consultas recentes ({len(resultados)})"):
+        for cnpj_limpo, r in reversed(list(resultados.items())):
+            hora = datetime.datetime.fromtimestamp(r["consultado_em"]).strftime("%H:%M")
+            st.button(
+                f"{format_cnpj_mask(cnpj_limpo)} · {r['dados'].get('razao_social', 'N/A')} · {hora}",
+                key=f"historico_{cnpj_limpo}", on_click=abrir_resultado, args=(cnpj_limpo,),
+            )
+
+def render_resultado(dados_cnpj: dict, obter_regime, obter_ies):
+    # Desenha o resultado na ordem da tela; obter_regime/obter_ies esperam pela
+    # consulta em andamento ou devolvem o que já está guardado na sessão.
+    inicio_render = time.perf_counter()
+    st.success(f"Dados encontrados para o CNPJ: {format_cnpj_mask(dados_cnpj.get('cnpj','N/A'))}")
+    if dados_cnpj.get("__fonte") == "indice_local":
+        st.caption("Fonte: base local de dados abertos da Receita Federal")
+    elif dados_cnpj.get("__fonte") not in (None, "brasilapi"):
+        st.caption(f"Fonte alternativa: {dados_cnpj['__fonte']} (BrasilAPI indisponível)")
+    st.image(carregar_imagem("logo_resultado.png"), width=100)
+
+    # Situação para uso em título
+    sit_raw = dados_cnpj.get('descricao_situacao_cadastral', 'N/A')
+    sit_norm = normalizar_situacao_cadastral(sit_raw)
+
+    # Razão Social (com - (BAIXADO) quando aplicável)
+    razao = dados_cnpj.get('razao_social', 'N/A')
+    razao_exibida = f"{razao} - (BAIXADO)" if sit_norm == "BAIXADO" else razao
+    st.markdown(
+        f"<div style='text-align:center; font-size: 1.6rem; font-weight: 800; color: #FFC300; margin: 6px 0 2px 0;'>{razao_exibida}</div>",
+        unsafe_allow_html=True
+    )
+
+    # 1) Regime via MATRIZ – preenchido quando a consulta da matriz terminar
+    regime_slot = st.container()
+
+    # 2) Dados da Empresa
+    st.markdown("---")
+    st.markdown("## Dados da Empresa")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.write(f"**Razão Social:** {razao}")
+        st.write(f"**Nome Fantasia:** {dados_cnpj.get('nome_fantasia', 'N/A')}")
+        st.write(f"**CNPJ:** {format_cnpj_mask(dados_cnpj.get('cnpj', 'N/A'))}")
+        render_situacao_badge("Situação Cadastral", sit_norm)
+        st.write(f"**Data Início Atividade:** {dados_cnpj.get('data_inicio_atividade', 'N/A')}")
+        st.write(f"**CNAE Fiscal:** {dados_cnpj.get('cnae_fiscal_descricao', 'N/A')} ({dados_cnpj.get('cnae_fiscal', 'N/A')})")
+        st.write(f"**Porte:** {dados_cnpj.get('porte', 'N/A')}")
+    with col2:
+        st.write(f"**Natureza Jurídica:** {dados_cnpj.get('natureza_juridica', 'N/A')}")
+        st.write(f"**Capital Social:** {format_currency_brl(dados_cnpj.get('capital_social', 0))}")
+        st.write(f"**Telefone:** {format_phone(dados_cnpj.get('ddd_telefone_1'), dados_cnpj.get('telefone_1'))}")
+        tel2 = format_phone(dados_cnpj.get('ddd_telefone_2'), dados_cnpj.get('telefone_2'))
+        if tel2 != "N/A":
+            st.write(f"**Telefone 2:** {tel2}")
+        st.write(f"**Email:** {dados_cnpj.get('email', 'N/A')}")
+
+    # 3) Endereço
+    st.markdown("---")
+    st.markdown("## Endereço")
+    st.write(f"**Logradouro:** {dados_cnpj.get('descricao_tipo_de_logradouro', '')} {dados_cnpj.get('logradouro', 'N/A')}, {dados_cnpj.get('numero', 'N/A')}")
+    if dados_cnpj.get('complemento'):
+        st.write(f"**Complemento:** {dados_cnpj.get('complemento', 'N/A')}")
+    st.write(f"**Bairro:** {dados_cnpj.get('bairro', 'N/A')}")
+    st.write(f"**Município:** {dados_cnpj.get('municipio', 'N/A')}")
+    st.write(f"**UF:** {dados_cnpj.get('uf', 'N/A')}")
+    st.write(f"**CEP:** {dados_cnpj.get('cep', 'N/A')}")
+
+    # 4) QSA
+    if dados_cnpj.get('qsa'):
+        st.markdown("---")
+        st.markdown("## Quadro de Sócios e Administradores (QSA)")
+        for i, socio in enumerate(dados_cnpj['qsa']):
+            with st.expander(f"Sócio/Adm {i+1}: {socio.get('nome_socio', 'N/A')}"):
+                st.write(f"**Nome:** {socio.get('nome_socio', 'N/A')}")
+                st.write(f"**Qualificação:** {socio.get('qualificacao_socio', 'N/A')}")
+                st.write(f"**Data de Entrada:** {socio.get('data_entrada_sociedade', 'N/A')}")
+                st.write(f"**CNPJ/CPF do Sócio:** {socio.get('cnpj_cpf_do_socio', 'N/A')}")
+                if socio.get('nome_representante_legal'):
+                    st.write(f"**Representante Legal:** {socio.get('nome_representante_legal', 'N/A')}")
+                    st.write(f"**CPF do Representante Legal:** {socio.get('cpf_representante_legal', 'N/A')}")
+                    st.write(f"**Qualificação do Representante:** {socio.get('qualificacao_representante_legal', 'N/A')}")
+    else:
+        st.info("Não há informações de QSA disponíveis.")
+
+    # 5) CNAEs Secundários
+    st.markdown("---")
+    st.markdown("## CNAEs Secundários")
+    if dados_cnpj.get('cnaes_secundarios'):
+        for cnae in dados_cnpj['cnaes_secundarios']:
+            st.markdown(f"- **{cnae.get('codigo', 'N/A')}**: {cnae.get('descricao', 'N/A')}")
+    else:
+        st.info("Nenhum CNAE secundário encontrado para este CNPJ.")
+
+    METRICAS.observar("cnpj_etapa_segundos", time.perf_counter() - inicio_render, etapa="render", secao="dados")
+    regime_final = obter_regime()
+    with regime_slot:
+        st.markdown("---")
+        st.markdown("## Regime Tributário")
+        render_regime_badge(regime_final)
+
+        # Reformas – status simulados
+        st.write("")
+        render_badge(f"Situação do Fornecedor para crédito de CBS e IBS: {SITUACAO_CREDITO_TEXTO}", "#FACC15", "#111111")
+        if regime_final.upper() == "SIMPLES NACIONAL":
+            st.write("")
+            render_badge("Regime do Simples (Regular ou Normal): Em construção", "#FACC15", "#111111")
+
+    # 6) Inscrições Estaduais
+    st.markdown("---")
+    st.markdown("## Inscrições Estaduais")
+    ies = obter_ies()
+    if ies is None:
+        st.warning("Não foi possível recuperar as Inscrições Estaduais no momento.")
+    elif len(ies) == 0:
+        st.info("Nenhuma Inscrição Estadual encontrada para este CNPJ.")
+    else:
+        for idx, ie in enumerate(ies, start=1):
+            titulo = f"IE {idx} - {ie.get('uf') or 'UF N/A'}"
+            with st.expander(titulo):
+                st.write(f"**UF:** {ie.get('uf', 'N/A')}")
+                st.write(f"**Inscrição Estadual:** {ie.get('numero', 'N/A')}")
+                habilitada = ie.get('habilitada', False)
+                st.write(f"**Habilitada:** {'Sim' if habilitada else 'Não'}")
+                st.write(f"**Status:** {ie.get('status_texto', 'N/A')}")
+                st.write(f"**Tipo:** {ie.get('tipo_texto', 'N/A')}")
+
+    # 7) Exportação CSV
+    st.markdown("---")
+    st.subheader("Exportação")
+
+    # CSV montado só no clique; on_click="ignore" evita o rerun que apagava a tela
+    st.download_button(
+        label="📤 Exportar CSV",
+        data=lambda: build_csv_bytes(montar_linha_csv(dados_cnpj, regime_final, ies), CSV_COLS),
+        file_name=f"CNPJ_{normalizar_cnpj(dados_cnpj.get('cnpj',''))}.csv",
+        mime="text/csv",
+        help="Baixa um CSV com todas as informações principais deste CNPJ",
+        on_click="ignore",
+    )
+
+    # 8) Integração ERP (SAP Business One) – visual pronto (fake)
+    st.markdown("---")
+    st.subheader("Integração ERP (SAP Business One)")
+    st.markdown("""
+        <div class="ghost-buttons">
+            <div class="ghost-btn">🔗 Vincular PN ao SAP B1 <span class="tag">Em breve</span></div>
+            <div class="ghost-btn">⬆️ Exportar PN para SAP B1 <span class="tag">Em breve</span></div>
+            <div class="ghost-btn">🔄 Atualizar Cadastro no SAP B1 <span class="tag">Em breve</span></div>
+            <div class="ghost-btn">🧾 Sincronizar IE / CNAE no SAP <span class="tag">Em breve</span></div>
+        </div>
+        <div class="ghost-caption">Conectores prontos para ativação com credenciais do SAP Business One (Service Layer).</div>
+    """, unsafe_allow_html=True)
+    return regime_final, ies
 
 # ---------- UI ----------
-st.image(str(IMAGE_DIR / "logo_main.png"), width=150)
+st.image(carregar_imagem("logo_main.png"), width=150)
 st.markdown("<h1 style='text-align: center;'>Consulta de CNPJ</h1>", unsafe_allow_html=True)
 
+with st.sidebar:
+    st.markdown("### Cache de consultas")
+    cache_stats = get_cache().estatisticas()
+    st.caption(
+        f"{cache_stats['entradas']} entradas · taxa de acerto {cache_stats['taxa_acerto']:.0%} · "
+        f"hits {cache_stats['hit'] + cache_stats['hit_negativo']} · stale {cache_stats['stale']} · misses {cache_stats['miss']}"
+    )
+    st.markdown("### Provedores")
+    for nome, prov_stats in provedores.ESTATISTICAS.resumo().items():
+        st.caption(
+            f"{nome}: {prov_stats['chamadas']} chamadas · {prov_stats['latencia_ewma'] * 1000:.0f} ms · "
+            f"erro {prov_stats['taxa_erro']:.0%}"
+        )
+    with st.expander("Latência por etapa (p95)"):
+        for serie in METRICAS.resumo()["latencias"]:
+            rotulos = dict(serie["rotulos"])
+            etapa = rotulos.pop("etapa", serie["nome"])
+            detalhe = ", ".join(f"{v}" for v in rotulos.values())
+            st.caption(f"{etapa}{f' ({detalhe})' if detalhe else ''}: p95 {serie['p95_ms']:.0f} ms · {serie['total']}x")
+
+modo_consulta = st.radio("Modo de consulta", ["Individual", "Em lote", "Empresa (raiz)", "Monitoramento"], horizontal=True, label_visibility="collapsed")
+if modo_consulta == "Em lote":
+    render_consulta_lote()
+    st.stop()
+if modo_consulta == "Empresa (raiz)":
+    render_consulta_grupo()
+    st.stop()
+if modo_consulta == "Monitoramento":
+    render_monitoramento()
+    st.stop()
+
 cnpj_input = st.text_input(
-    "Digite o CNPJ (apenas números, ou com pontos, barras e traços):",
+    "Digite o CNPJ (com ou sem pontos, barras e traços; numérico ou alfanumérico):",
     placeholder="Ex: 00.000.000/0000-00 ou 00000000000000",
-    help="Serão aceitos CNPJs com ou sem formatação. Ex: 21746980000146 ou 21.746.980/0001-46"
+    help="Serão aceitos CNPJs com ou sem formatação, inclusive no novo formato alfanumérico. Ex: 21746980000146, 21.746.980/0001-46 ou 12.ABC.345/01DE-35"
 )
 
+historico_slot = st.container()
+consultou_agora = False
+
 if st.button("Consultar CNPJ"):
     if not cnpj_input:
         st.warning("Por favor, digite um CNPJ para consultar.")
     else:
-        cnpj_limpo = only_digits(cnpj_input)
+        cnpj_limpo = normalizar_cnpj(cnpj_input)
         if len(cnpj_limpo) != 14:
-            st.error("CNPJ inválido. Um CNPJ deve conter exatamente 14 dígitos numéricos.")
+            st.error("CNPJ inválido. Um CNPJ deve conter exatamente 14 caracteres (números, ou letras e números no formato alfanumérico).")
+        elif not cnpj_valido(cnpj_limpo):
+            st.error("CNPJ inválido. Os dígitos verificadores não conferem; verifique o número digitado.")
+        elif st.session_state.get("resultados", {}).get(cnpj_limpo, {}).get("completo", False):
+            abrir_resultado(cnpj_limpo)
         else:
+            st.session_state["cnpj_aberto"] = None
             with st.spinner(f"Consultando CNPJ {format_cnpj_mask(cnpj_limpo)}..."):
-                dados_cnpj = consulta_brasilapi_cnpj(cnpj_limpo)
+                inicio_consulta = time.perf_counter()
+                consulta = iniciar_consulta_paralela(cnpj_limpo)
+                with METRICAS.span("ui_espera", alvo="dados"):
+                    dados_cnpj = aguardar_resultado(consulta, "dados", {"__error": "unavailable"})
 
                 if isinstance(dados_cnpj, dict) and dados_cnpj.get("__error") == "not_found":
                     st.error("CNPJ inválido ou não encontrado. Verifique os dígitos e tente novamente.")
@@ -243,184 +585,30 @@ if st.button("Consultar CNPJ"):
                     st.error("Não foi possível concluir a consulta no momento.")
                     st.stop()
 
-                st.success(f"Dados encontrados para o CNPJ: {format_cnpj_mask(dados_cnpj.get('cnpj','N/A'))}")
-                st.image(str(IMAGE_DIR / "logo_resultado.png"), width=100)
-
-                # Situação para uso em título
-                sit_raw = dados_cnpj.get('descricao_situacao_cadastral', 'N/A')
-                sit_norm = normalizar_situacao_cadastral(sit_raw)
-
-                # Razão Social (com - (BAIXADO) quando aplicável)
-                razao = dados_cnpj.get('razao_social', 'N/A')
-                razao_exibida = f"{razao} - (BAIXADO)" if sit_norm == "BAIXADO" else razao
-                st.markdown(
-                    f"<div style='text-align:center; font-size: 1.6rem; font-weight: 800; color: #FFC300; margin: 6px 0 2px 0;'>{razao_exibida}</div>",
-                    unsafe_allow_html=True
-                )
-
-                # 1) Regime via MATRIZ
-                cnpj_matriz = to_matriz_if_filial(cnpj_limpo)
-                regime_source = dados_cnpj
-                if cnpj_matriz != cnpj_limpo:
-                    dados_matriz = consulta_brasilapi_cnpj(cnpj_matriz)
-                    if isinstance(dados_matriz, dict) and not dados_matriz.get("__error") and "cnpj" in dados_matriz:
-                        regime_source = dados_matriz
-
-                regime_final = determinar_regime_unificado(regime_source)
-
-                st.markdown("---")
-                st.markdown("## Regime Tributário")
-                render_regime_badge(regime_final)
-
-                # Reformas – status simulados
-                situacao_credito_text = "Em construção"
-                regime_simples_text = "Em construção" if regime_final.upper() == "SIMPLES NACIONAL" else ""
-
-                st.write("")
-                render_badge("Situação do Fornecedor para crédito de CBS e IBS: Em construção", "#FACC15", "#111111")
-                if regime_final.upper() == "SIMPLES NACIONAL":
-                    st.write("")
-                    render_badge("Regime do Simples (Regular ou Normal): Em construção", "#FACC15", "#111111")
-
-                # 2) Dados da Empresa
-                st.markdown("---")
-                st.markdown("## Dados da Empresa")
-                col1, col2 = st.columns(2)
-                with col1:
-                    st.write(f"**Razão Social:** {razao}")
-                    st.write(f"**Nome Fantasia:** {dados_cnpj.get('nome_fantasia', 'N/A')}")
-                    st.write(f"**CNPJ:** {format_cnpj_mask(dados_cnpj.get('cnpj', 'N/A'))}")
-                    render_situacao_badge("Situação Cadastral", sit_norm)
-                    st.write(f"**Data Início Atividade:** {dados_cnpj.get('data_inicio_atividade', 'N/A')}")
-                    st.write(f"**CNAE Fiscal:** {dados_cnpj.get('cnae_fiscal_descricao', 'N/A')} ({dados_cnpj.get('cnae_fiscal', 'N/A')})")
-                    st.write(f"**Porte:** {dados_cnpj.get('porte', 'N/A')}")
-                with col2:
-                    st.write(f"**Natureza Jurídica:** {dados_cnpj.get('natureza_juridica', 'N/A')}")
-                    st.write(f"**Capital Social:** {format_currency_brl(dados_cnpj.get('capital_social', 0))}")
-                    st.write(f"**Telefone:** {format_phone(dados_cnpj.get('ddd_telefone_1'), dados_cnpj.get('telefone_1'))}")
-                    tel2 = format_phone(dados_cnpj.get('ddd_telefone_2'), dados_cnpj.get('telefone_2'))
-                    if tel2 != "N/A":
-                        st.write(f"**Telefone 2:** {tel2}")
-                    st.write(f"**Email:** {dados_cnpj.get('email', 'N/A')}")
-
-                # 3) Endereço
-                st.markdown("---")
-                st.markdown("## Endereço")
-                st.write(f"**Logradouro:** {dados_cnpj.get('descricao_tipo_de_logradouro', '')} {dados_cnpj.get('logradouro', 'N/A')}, {dados_cnpj.get('numero', 'N/A')}")
-                if dados_cnpj.get('complemento'):
-                    st.write(f"**Complemento:** {dados_cnpj.get('complemento', 'N/A')}")
-                st.write(f"**Bairro:** {dados_cnpj.get('bairro', 'N/A')}")
-                st.write(f"**Município:** {dados_cnpj.get('municipio', 'N/A')}")
-                st.write(f"**UF:** {dados_cnpj.get('uf', 'N/A')}")
-                st.write(f"**CEP:** {dados_cnpj.get('cep', 'N/A')}")
-
-                # 4) QSA
-                if dados_cnpj.get('qsa'):
-                    st.markdown("---")
-                    st.markdown("## Quadro de Sócios e Administradores (QSA)")
-                    for i, socio in enumerate(dados_cnpj['qsa']):
-                        with st.expander(f"Sócio/Adm {i+1}: {socio.get('nome_socio', 'N/A')}"):
-                            st.write(f"**Nome:** {socio.get('nome_socio', 'N/A')}")
-                            st.write(f"**Qualificação:** {socio.get('qualificacao_socio', 'N/A')}")
-                            st.write(f"**Data de Entrada:** {socio.get('data_entrada_sociedade', 'N/A')}")
-                            st.write(f"**CNPJ/CPF do Sócio:** {socio.get('cnpj_cpf_do_socio', 'N/A')}")
-                            if socio.get('nome_representante_legal'):
-                                st.write(f"**Representante Legal:** {socio.get('nome_representante_legal', 'N/A')}")
-                                st.write(f"**CPF do Representante Legal:** {socio.get('cpf_representante_legal', 'N/A')}")
-                                st.write(f"**Qualificação do Representante:** {socio.get('qualificacao_representante_legal', 'N/A')}")
-                else:
-                    st.info("Não há informações de QSA disponíveis.")
-
-                # 5) CNAEs Secundários
-                st.markdown("---")
-                st.markdown("## CNAEs Secundários")
-                if dados_cnpj.get('cnaes_secundarios'):
-                    for cnae in dados_cnpj['cnaes_secundarios']:
-                        st.markdown(f"- **{cnae.get('codigo', 'N/A')}**: {cnae.get('descricao', 'N/A')}")
-                else:
-                    st.info("Nenhum CNAE secundário encontrado para este CNPJ.")
-
-                # 6) Inscrições Estaduais
-                st.markdown("---")
-                st.markdown("## Inscrições Estaduais")
-                ies = consulta_ie_open_cnpja(cnpj_limpo)
-                if ies is None:
-                    st.warning("Não foi possível recuperar as Inscrições Estaduais no momento.")
-                elif len(ies) == 0:
-                    st.info("Nenhuma Inscrição Estadual encontrada para este CNPJ.")
-                else:
-                    for idx, ie in enumerate(ies, start=1):
-                        titulo = f"IE {idx} - {ie.get('uf') or 'UF N/A'}"
-                        with st.expander(titulo):
-                            st.write(f"**UF:** {ie.get('uf', 'N/A')}")
-                            st.write(f"**Inscrição Estadual:** {ie.get('numero', 'N/A')}")
-                            habilitada = ie.get('habilitada', False)
-                            st.write(f"**Habilitada:** {'Sim' if habilitada else 'Não'}")
-                            st.write(f"**Status:** {ie.get('status_texto', 'N/A')}")
-                            st.write(f"**Tipo:** {ie.get('tipo_texto', 'N/A')}")
-
-                # 7) Exportação CSV
-                st.markdown("---")
-                st.subheader("Exportação")
-
-                cnae_cod = dados_cnpj.get('cnae_fiscal', '')
-                cnae_desc = dados_cnpj.get('cnae_fiscal_descricao', '')
-                tel1 = format_phone(dados_cnpj.get('ddd_telefone_1'), dados_cnpj.get('telefone_1'))
-                tel2 = format_phone(dados_cnpj.get('ddd_telefone_2'), dados_cnpj.get('telefone_2'))
-
-                csv_row = {
-                    "CNPJ": format_cnpj_mask(dados_cnpj.get('cnpj', '')),
-                    "Razão Social": razao,
-                    "Nome Fantasia": dados_cnpj.get('nome_fantasia', ''),
-                    "Situação Cadastral": sit_norm.title() if sit_norm != "N/A" else "",
-                    "Regime Tributário": regime_final,
-                    "Situação do Fornecedor p/ crédito CBS/IBS": situacao_credito_text,
-                    "Regime do Simples (Regular ou Normal)": regime_simples_text,
-                    "Data Início Atividade": dados_cnpj.get('data_inicio_atividade', ''),
-                    "CNAE Fiscal Código": cnae_cod if cnae_cod is not None else "",
-                    "CNAE Fiscal Descrição": cnae_desc if cnae_desc is not None else "",
-                    "Porte": dados_cnpj.get('porte', ''),
-                    "Natureza Jurídica": dados_cnpj.get('natureza_juridica', ''),
-                    "Capital Social": dados_cnpj.get('capital_social', ''),
-                    "Email": dados_cnpj.get('email', ''),
-                    "Telefone 1": "" if tel1 == "N/A" else tel1,
-                    "Telefone 2": "" if tel2 == "N/A" else tel2,
-                    "Logradouro": f"{dados_cnpj.get('descricao_tipo_de_logradouro','') or ''} {dados_cnpj.get('logradouro','') or ''}".strip(),
-                    "Número": dados_cnpj.get('numero', ''),
-                    "Complemento": dados_cnpj.get('complemento', ''),
-                    "Bairro": dados_cnpj.get('bairro', ''),
-                    "Município": dados_cnpj.get('municipio', ''),
-                    "UF": dados_cnpj.get('uf', ''),
-                    "CEP": dados_cnpj.get('cep', ''),
-                    "Inscrições Estaduais": join_ies_for_csv(ies) if ies else "",
-                    "Data/Hora da Consulta": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                }
-                csv_cols = [
-                    "CNPJ","Razão Social","Nome Fantasia","Situação Cadastral","Regime Tributário",
-                    "Situação do Fornecedor p/ crédito CBS/IBS","Regime do Simples (Regular ou Normal)",
-                    "Data Início Atividade","CNAE Fiscal Código","CNAE Fiscal Descrição","Porte",
-                    "Natureza Jurídica","Capital Social","Email","Telefone 1","Telefone 2",
-                    "Logradouro","Número","Complemento","Bairro","Município","UF","CEP",
-                    "Inscrições Estaduais","Data/Hora da Consulta"
-                ]
-                csv_bytes = build_csv_bytes(csv_row, csv_cols)
-                st.download_button(
-                    label="📤 Exportar CSV",
-                    data=csv_bytes,
-                    file_name=f"CNPJ_{only_digits(dados_cnpj.get('cnpj',''))}.csv",
-                    mime="text/csv",
-                    help="Baixa um CSV com todas as informações principais deste CNPJ"
-                )
-
-                # 8) Integração ERP (SAP Business One) – visual pronto (fake)
-                st.markdown("---")
-                st.subheader("Integração ERP (SAP Business One)")
-                st.markdown("""
-                    <div class="ghost-buttons">
-                        <div class="ghost-btn">🔗 Vincular PN ao SAP B1 <span class="tag">Em breve</span></div>
-                        <div class="ghost-btn">⬆️ Exportar PN para SAP B1 <span class="tag">Em breve</span></div>
-                        <div class="ghost-btn">🔄 Atualizar Cadastro no SAP B1 <span class="tag">Em breve</span></div>
-                        <div class="ghost-btn">🧾 Sincronizar IE / CNAE no SAP <span class="tag">Em breve</span></div>
-                    </div>
-                    <div class="ghost-caption">Conectores prontos para ativação com credenciais do SAP Business One (Service Layer).</div>
-                """, unsafe_allow_html=True)
+                regime_completo = []
+
+                def aguardar_regime():
+                    with METRICAS.span("ui_espera", alvo="matriz"):
+                        dados_matriz = aguardar_resultado(consulta, "matriz", {"__error": "unavailable"})
+                    fonte, origem = fonte_regime(cnpj_limpo, dados_cnpj, dados_matriz)
+                    filial_sem_matriz = origem == "propria" and to_matriz_if_filial(cnpj_limpo) != cnpj_limpo
+                    regime_completo.append(regime_informado(fonte) and not filial_sem_matriz)
+                    return resolver_regime(cnpj_limpo, dados_cnpj, dados_matriz)
+
+                def aguardar_ies():
+                    with METRICAS.span("ui_espera", alvo="ies"):
+                        return aguardar_resultado(consulta, "ies")
+
+                regime_final, ies = render_resultado(dados_cnpj, aguardar_regime, aguardar_ies)
+                guardar_resultado(cnpj_limpo, dados_cnpj, regime_final, ies,
+                                  completo=all(regime_completo) and ies is not None)
+                METRICAS.observar("cnpj_etapa_segundos", time.perf_counter() - inicio_consulta, etapa="ui_total")
+            consultou_agora = True
+
+# Sem consulta nova: redesenha a consulta aberta a partir da sessão, sem rede
+aberto = st.session_state.get("cnpj_aberto")
+salvo = (st.session_state.get("resultados") or {}).get(aberto)
+if salvo and not consultou_agora:
+    render_resultado(salvo["dados"], lambda: salvo["regime"], lambda: salvo["ies"])
+with historico_slot:
+    render_historico()
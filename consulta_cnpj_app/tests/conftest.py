@@ -0,0 +1,63 @@
+import os
+import tempfile
+
+# ---------- ambiente isolado ----------
+# Lido na importação de cnpj_core: cache e bancos em diretório temporário, sem índice
+# local, sem cota compartilhada entre processos e sem hedging (cada teste liga o que precisa).
+_TMP = tempfile.mkdtemp(prefix="cnpj_testes_")
+os.environ.update({
+    "CNPJ_CACHE_PATH": os.path.join(_TMP, "consultas.sqlite3"),
+    "CNPJ_INDICE_PATH": os.path.join(_TMP, "sem_indice.sqlite3"),
+    "CNPJ_JOBS_PATH": os.path.join(_TMP, "jobs.sqlite3"),
+    "CNPJ_MONITORAMENTO_PATH": os.path.join(_TMP, "monitoramento.sqlite3"),
+    "CNPJ_HEDGE_APOS": "0",
+})
+os.environ["CNPJ_COTA_PATH"] = ""
+
+import pytest
+
+from benchmarks.bench_carga import gerar_cnpjs_validos
+from benchmarks.stub_upstream import ConfigStub, StubUpstream
+from cnpj_core import get_cache, http_client, provedores
+
+
+@pytest.fixture
+def criar_stub():
+    # criar_stub(latencia_ms=..., taxa_erro=...) sobe um StubUpstream em porta livre
+    stubs = []
+
+    def criar(**config):
+        config.setdefault("latencia_ms", 5)
+        config.setdefault("jitter_ms", 0)
+        stub = StubUpstream(ConfigStub(**config)).iniciar()
+        stubs.append(stub)
+        return stub
+
+    yield criar
+    for stub in stubs:
+        stub.parar()
+
+
+@pytest.fixture
+def apontar_provedores(monkeypatch):
+    # apontar_provedores(stub_padrao, brasilapi=outro_stub, ...): cada provedor consulta o
+    # stub indicado, com clientes HTTP novos (sem cota apertada e backoff curto),
+    # estatísticas zeradas e cache vazio
+    def apontar(padrao, **por_provedor):
+        for provedor in provedores.PROVEDORES_DADOS:
+            stub = por_provedor.get(provedor.nome, padrao)
+            monkeypatch.setattr(provedor, "url_base", f"{stub.url_base}/{provedor.nome}/")
+        monkeypatch.setattr(http_client, "_clientes", {
+            nome: http_client.ClienteHTTP(nome, 1000, 1000, backoff_base=0.01, backoff_max=0.05)
+            for nome in http_client.CONFIG_PROVEDORES
+        })
+        monkeypatch.setattr(provedores, "ESTATISTICAS", provedores.EstatisticasProvedores())
+        get_cache().limpar()
+
+    yield apontar
+    get_cache().limpar()
+
+
+@pytest.fixture
+def cnpjs():
+    return gerar_cnpjs_validos(20, 7)
@@ -0,0 +1,107 @@
+import csv
+import io
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api
+from cnpj_core import formatos_disponiveis, get_fila_jobs, jobs
+from cnpj_core.lote import LOTE_CSV_COLS, LOTE_STATUS_COL
+
+
+@pytest.fixture
+def cliente(criar_stub, apontar_provedores, monkeypatch):
+    stub = criar_stub()
+    apontar_provedores(stub)
+    monkeypatch.setattr(jobs.subprocess, "Popen", lambda *a, **k: None)  # workers rodam no teste
+    with TestClient(api.app) as cliente:
+        yield cliente
+
+
+def _linhas_csv(texto):
+    return list(csv.DictReader(io.StringIO(texto.lstrip("\ufeff"))))
+
+
+def test_saude_e_metricas(cliente):
+    assert cliente.get("/saude").json() == {"status": "ok"}
+    assert "cnpj_etapa_segundos" in cliente.get("/metricas").text
+    assert isinstance(cliente.get("/metricas?formato=json").json(), dict)
+
+
+def test_consulta_individual(cliente, cnpjs):
+    corpo = cliente.get(f"/cnpj/{cnpjs[0]}").json()
+    assert corpo["dados"]["cnpj"] == cnpjs[0]
+    assert corpo["fonte"] == "brasilapi"
+    assert corpo["regime"] and corpo["ies"]
+    assert not any(k.startswith("__") for k in corpo["dados"])
+
+
+def test_consulta_individual_csv(cliente, cnpjs):
+    resp = cliente.get(f"/cnpj/{cnpjs[0]}?formato=csv")
+    assert resp.headers["content-type"].startswith("text/csv")
+    assert len(_linhas_csv(resp.text)) == 1
+
+
+def test_consulta_individual_erros(criar_stub, apontar_provedores, cnpjs):
+    cliente = TestClient(api.app)
+    assert cliente.get("/cnpj/123").status_code == 422
+    assert cliente.get("/cnpj/21746980000147").status_code == 422
+    apontar_provedores(criar_stub(taxa_nao_encontrado=1.0))
+    assert cliente.get(f"/cnpj/{cnpjs[0]}").status_code == 404
+    apontar_provedores(criar_stub(taxa_erro=1.0))
+    assert cliente.get(f"/cnpj/{cnpjs[1]}").status_code == 503
+
+
+def test_lote_json(cliente, cnpjs):
+    pedido = {"cnpjs": [cnpjs[0], cnpjs[1], cnpjs[0], "123", "21746980000147"]}
+    corpo = cliente.post("/cnpj/lote", json=pedido).json()
+    assert corpo["total"] == 2  # duplicado e inválidos descartados
+    assert sorted(r["cnpj"] for r in corpo["resultados"]) == sorted(cnpjs[:2])
+    assert all(r["erro"] is None and r["fonte"] == "brasilapi" for r in corpo["resultados"])
+
+
+def test_lote_sem_cnpj_valido(cliente):
+    assert cliente.post("/cnpj/lote", json={"cnpjs": ["123"]}).status_code == 422
+    assert cliente.post("/cnpj/lote", json={"cnpjs": []}).status_code == 422
+
+
+def test_lote_csv_em_streaming(cliente, cnpjs):
+    resp = cliente.post("/cnpj/lote?formato=csv", json={"cnpjs": cnpjs[:3]})
+    assert resp.text.startswith("\ufeff")
+    linhas = _linhas_csv(resp.text)
+    assert list(linhas[0]) == LOTE_CSV_COLS
+    assert [linha[LOTE_STATUS_COL] for linha in linhas] == ["OK"] * 3
+
+
+@pytest.mark.skipif("parquet" not in formatos_disponiveis(), reason="pyarrow não instalado")
+def test_lote_parquet_sincrono(cliente, cnpjs):
+    import pandas as pd
+    resp = cliente.post("/cnpj/lote?formato=parquet", json={"cnpjs": cnpjs[:3]})
+    assert resp.status_code == 200
+    assert len(pd.read_parquet(io.BytesIO(resp.content))) == 3
+
+
+@pytest.mark.parametrize("formato", ["json", "csv"])
+def test_lote_acima_do_limite_vira_job(cliente, cnpjs, monkeypatch, formato):
+    monkeypatch.setattr(api, "LOTE_MAX_SINCRONO", 3)
+    resp = cliente.post(f"/cnpj/lote?formato={formato}", json={"cnpjs": cnpjs[:5]})
+    assert resp.status_code == 202
+    corpo = resp.json()
+    assert corpo["total"] == 5
+    assert cliente.get(corpo["status"]).json()["estado"] == "na_fila"
+
+    fila = get_fila_jobs()
+    while (chunk := fila._reservar_chunk("teste")) is not None:
+        fila.processar_chunk(chunk, "teste")
+    assert cliente.get(corpo["status"]).json()["estado"] == "concluido"
+    resultados = cliente.get(corpo["resultados"]).json()["resultados"]
+    assert [r[LOTE_STATUS_COL] for r in resultados] == ["OK"] * 5
+    arquivo = cliente.get(corpo["arquivo"])
+    assert arquivo.headers["content-type"].startswith("text/csv")
+    assert len(_linhas_csv(arquivo.content.decode("utf-8"))) == 5
+
+
+def test_job_inexistente(cliente):
+    assert cliente.get("/jobs/nada").status_code == 404
+    assert cliente.get("/jobs/nada/resultados").status_code == 404
+    assert cliente.get("/jobs/nada/arquivo").status_code == 404
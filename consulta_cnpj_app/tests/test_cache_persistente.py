@@ -0,0 +1,138 @@
+import time
+
+import pytest
+
+from cnpj_core import cache_persistente
+from cnpj_core.cache_persistente import CachePersistente
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return CachePersistente(tmp_path / "cache.sqlite3", ttls={"x": 0.2}, ttls_negativos={"x": 0.1})
+
+
+def _carregador(valores):
+    chamadas = []
+
+    def carregar():
+        chamadas.append(1)
+        return valores[len(chamadas) - 1]
+
+    return carregar, chamadas
+
+
+def test_hit_dentro_do_ttl(cache):
+    carregar, chamadas = _carregador([{"v": 1}, {"v": 2}])
+    assert cache.buscar("x", "a", carregar) == {"v": 1}
+    assert cache.buscar("x", "a", carregar) == {"v": 1}
+    assert len(chamadas) == 1
+    assert cache.contadores["hit"] == 1
+
+
+def test_vencido_sem_stale_recarrega(cache):
+    carregar, chamadas = _carregador([{"v": 1}, {"v": 2}])
+    cache.buscar("x", "a", carregar)
+    time.sleep(0.25)
+    assert cache.obter("x", "a") == ({"v": 1}, "stale")
+    assert cache.buscar("x", "a", carregar, aceitar_stale=False) == {"v": 2}
+    assert len(chamadas) == 2
+
+
+def test_stale_devolve_e_revalida_em_segundo_plano(cache):
+    carregar, chamadas = _carregador([{"v": 1}, {"v": 2}])
+    cache.buscar("x", "a", carregar)
+    time.sleep(0.25)
+    assert cache.buscar("x", "a", carregar) == {"v": 1}
+    limite = time.monotonic() + 2
+    while cache.obter("x", "a")[1] != "fresh" and time.monotonic() < limite:
+        time.sleep(0.02)
+    assert cache.obter("x", "a") == ({"v": 2}, "fresh")
+
+
+def test_ttl_negativo(cache):
+    carregar, chamadas = _carregador([[], [{"uf": "SP"}]])
+    assert cache.buscar("x", "a", carregar, eh_negativo=lambda v: len(v) == 0) == []
+    meta = cache.metadados("x", "a")
+    assert meta["negativo"]
+    assert meta["expira_em"] - meta["gravado_em"] == pytest.approx(0.1)
+    assert cache.contadores["miss"] == 1
+    time.sleep(0.15)
+    assert cache.buscar("x", "a", carregar, eh_negativo=lambda v: len(v) == 0, aceitar_stale=False) == [{"uf": "SP"}]
+    assert not cache.metadados("x", "a")["negativo"]
+
+
+def test_ttl_por_valor(cache):
+    carregar, _ = _carregador([{"v": 1, "__fonte": "receitaws"}])
+    cache.buscar("x", "a", carregar, ttl_de=lambda v: 5 if v["__fonte"] != "brasilapi" else None)
+    meta = cache.metadados("x", "a")
+    assert meta["expira_em"] - meta["gravado_em"] == pytest.approx(5)
+
+
+def test_falha_transitoria_nao_grava(cache):
+    carregar, chamadas = _carregador([None, {"v": 1}])
+    assert cache.buscar("x", "a", carregar, eh_cacheavel=lambda v: v is not None) is None
+    assert cache.metadados("x", "a") is None
+    assert cache.buscar("x", "a", carregar, eh_cacheavel=lambda v: v is not None) == {"v": 1}
+    assert cache.contadores["erro"] == 1
+
+
+def test_negativo_vencido_nao_e_servido_stale(cache):
+    carregar, chamadas = _carregador([[], [{"uf": "SP"}]])
+    cache.buscar("x", "a", carregar, eh_negativo=lambda v: len(v) == 0)
+    time.sleep(0.15)
+    assert cache.obter("x", "a") == (None, None)
+    assert cache.buscar("x", "a", carregar, eh_negativo=lambda v: len(v) == 0) == [{"uf": "SP"}]
+    assert len(chamadas) == 2
+    assert cache.contadores["stale"] == 0
+
+
+def test_degradado_vencido_nao_e_servido_stale(cache):
+    carregar, chamadas = _carregador([{"v": 1, "__fonte": "receitaws"}, {"v": 2, "__fonte": "brasilapi"}])
+    ttl_de = lambda v: 0.05 if v["__fonte"] != "brasilapi" else None  # noqa: E731
+    cache.buscar("x", "a", carregar, ttl_de=ttl_de)
+    time.sleep(0.1)
+    assert cache.obter("x", "a") == (None, None)
+    assert cache.buscar("x", "a", carregar, ttl_de=ttl_de) == {"v": 2, "__fonte": "brasilapi"}
+    time.sleep(0.25)
+    # a resposta completa continua elegível para stale-while-revalidate
+    assert cache.obter("x", "a")[1] == "stale"
+
+
+def _acessado_em(cache, chave):
+    return cache._conn().execute("SELECT acessado_em FROM consultas WHERE fonte = 'x' AND chave = ?", (chave,)).fetchone()[0]
+
+
+def test_leitura_so_regrava_acesso_apos_resolucao(cache, monkeypatch):
+    cache.gravar("x", "a", 1)
+    gravado = _acessado_em(cache, "a")
+    time.sleep(0.02)
+    cache.obter("x", "a")
+    assert _acessado_em(cache, "a") == gravado
+    monkeypatch.setattr(cache_persistente, "RESOLUCAO_ACESSO", 0)
+    cache.obter("x", "a")
+    assert _acessado_em(cache, "a") > gravado
+
+
+def test_estatisticas_guarda_total_de_entradas(cache, monkeypatch):
+    cache.gravar("x", "a", 1)
+    assert cache.estatisticas()["entradas"] == 1
+    cache.gravar("x", "b", 2)
+    assert cache.estatisticas()["entradas"] == 1
+    monkeypatch.setattr(cache_persistente, "ESTATISTICAS_TTL", 0)
+    assert cache.estatisticas()["entradas"] == 2
+    cache.limpar()
+    assert cache.estatisticas()["entradas"] == 0
+
+
+def test_despejo_lru(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_persistente, "RESOLUCAO_ACESSO", 0)
+    cache = CachePersistente(tmp_path / "cache.sqlite3", max_entradas=3)
+    for chave in "abcd":
+        cache.gravar("x", chave, chave)
+        time.sleep(0.01)
+    cache.obter("x", "a")  # acesso recente protege "a" do despejo
+    cache.despejar_excedentes()
+    assert cache.obter("x", "a")[0] == "a"
+    assert cache.obter("x", "b") == (None, None)
+    assert [cache.obter("x", c)[0] for c in "cd"] == ["c", "d"]
+    assert cache.contadores["despejos"] == 1
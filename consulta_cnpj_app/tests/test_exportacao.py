@@ -0,0 +1,124 @@
+import csv
+import datetime
+import io
+
+import pytest
+
+from cnpj_core.exportacao import CSV_COLS, build_csv_bytes, montar_linha_csv
+from cnpj_core.exportadores import Exportador, exportar_linhas, formatos_disponiveis
+from cnpj_core.lote import LOTE_CSV_COLS, LOTE_STATUS_COL
+
+# Layout do CSV da consulta individual antes das colunas aninhadas novas
+COLS_ORIGINAIS = [
+    "CNPJ", "Razão Social", "Nome Fantasia", "Situação Cadastral", "Regime Tributário",
+    "Situação do Fornecedor p/ crédito CBS/IBS", "Regime do Simples (Regular ou Normal)",
+    "Data Início Atividade", "CNAE Fiscal Código", "CNAE Fiscal Descrição", "Porte",
+    "Natureza Jurídica", "Capital Social", "Email", "Telefone 1", "Telefone 2",
+    "Logradouro", "Número", "Complemento", "Bairro", "Município", "UF", "CEP",
+    "Inscrições Estaduais", "Data/Hora da Consulta",
+]
+
+DADOS = {
+    "cnpj": "21746980000146",
+    "razao_social": "EMPRESA TESTE LTDA",
+    "descricao_situacao_cadastral": "ATIVA",
+    "data_inicio_atividade": "2015-02-10",
+    "cnae_fiscal": 6201501,
+    "capital_social": 15000.5,
+    "uf": "SP",
+    "qsa": [{"nome_socio": "FULANO", "qualificacao_socio": "Sócio-Administrador"}],
+    "cnaes_secundarios": [{"codigo": 6202300, "descricao": "Desenvolvimento"}, {"codigo": 0, "descricao": ""}],
+}
+IES = [{"uf": "SP", "numero": 123456789, "habilitada": True, "status_texto": "Sem restrição", "tipo_texto": "Normal"}]
+
+
+def _linha():
+    return montar_linha_csv(DADOS, "SIMPLES NACIONAL", IES)
+
+
+def test_colunas_novas_no_fim():
+    assert CSV_COLS == COLS_ORIGINAIS + ["QSA", "CNAEs Secundários"]
+    assert LOTE_CSV_COLS == CSV_COLS + [LOTE_STATUS_COL]
+    assert list(_linha()) == CSV_COLS
+
+
+def test_cabecalho_csv_individual():
+    texto = build_csv_bytes(_linha(), CSV_COLS).decode("utf-8-sig")
+    cabecalho, valores = list(csv.reader(io.StringIO(texto)))
+    assert cabecalho == CSV_COLS
+    linha = dict(zip(cabecalho, valores))
+    assert linha["CNPJ"] == "21.746.980/0001-46"
+    assert linha["QSA"] == "Nome: FULANO | Qualificação: Sócio-Administrador"
+    assert linha["CNAEs Secundários"] == "Código: 6202300 | Descrição: Desenvolvimento"
+    assert linha["Inscrições Estaduais"].startswith("UF: SP | IE: 123456789 | Habilitada: Sim")
+
+
+def test_formatos_desconhecidos(tmp_path):
+    with pytest.raises(ValueError):
+        Exportador("ods", str(tmp_path / "x.ods"), CSV_COLS)
+
+
+def test_exportar_csv(tmp_path):
+    caminho = tmp_path / "lote.csv"
+    assert exportar_linhas((_linha() for _ in range(3)), CSV_COLS, "csv", str(caminho)) == 3
+    with open(caminho, newline="", encoding="utf-8-sig") as f:
+        linhas = list(csv.DictReader(f))
+    assert list(linhas[0]) == CSV_COLS
+    assert len(linhas) == 3
+    assert linhas[0]["Razão Social"] == "EMPRESA TESTE LTDA"
+
+
+def _requer(formato):
+    return pytest.mark.skipif(formato not in formatos_disponiveis(), reason=f"{formato} indisponível")
+
+
+@_requer("parquet")
+@pytest.mark.parametrize("formato", ["parquet", "arrow"])
+def test_exportar_arrow(tmp_path, monkeypatch, formato):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    from cnpj_core import exportadores
+
+    # grupos pequenos para exercitar mais de um row group / record batch
+    monkeypatch.setattr(exportadores, "LINHAS_POR_GRUPO", 2)
+    caminho = str(tmp_path / f"lote.{formato}")
+    assert exportar_linhas((_linha() for _ in range(5)), CSV_COLS, formato, caminho) == 5
+    if formato == "parquet":
+        arquivo = pq.ParquetFile(caminho)
+        assert arquivo.metadata.num_row_groups == 3
+        tabela = arquivo.read()
+    else:
+        with pa.ipc.open_file(caminho) as leitor:
+            assert leitor.num_record_batches == 3
+            tabela = leitor.read_all()
+    assert tabela.column_names == CSV_COLS
+    assert tabela.num_rows == 5
+    linha = tabela.to_pylist()[0]
+    assert linha["Capital Social"] == 15000.5
+    assert linha["Data Início Atividade"] == datetime.date(2015, 2, 10)
+    assert isinstance(linha["Data/Hora da Consulta"], datetime.datetime)
+    assert linha["QSA"] == [{"Nome": "FULANO", "Qualificação": "Sócio-Administrador"}]
+    assert linha["CNAEs Secundários"] == [{"Código": "6202300", "Descrição": "Desenvolvimento"}]
+    assert linha["Inscrições Estaduais"][0]["Habilitada"] is True
+    assert linha["Email"] is None
+
+
+@_requer("xlsx")
+def test_exportar_xlsx(tmp_path, monkeypatch):
+    from openpyxl import load_workbook
+    from cnpj_core import exportadores
+
+    # planilhas pequenas para exercitar a troca de aba
+    monkeypatch.setattr(exportadores, "XLSX_MAX_LINHAS", 2)
+    caminho = str(tmp_path / "lote.xlsx")
+    assert exportar_linhas((_linha() for _ in range(3)), CSV_COLS, "xlsx", caminho) == 3
+    wb = load_workbook(caminho, read_only=True)
+    assert wb.sheetnames == ["CNPJs", "CNPJs (2)"]
+    linhas = list(wb["CNPJs"].iter_rows(values_only=True))
+    assert list(linhas[0]) == CSV_COLS
+    assert len(linhas) == 3
+    assert len(list(wb["CNPJs (2)"].iter_rows(values_only=True))) == 2
+    linha = dict(zip(CSV_COLS, linhas[1]))
+    assert linha["Capital Social"] == 15000.5
+    assert linha["QSA"] == "Nome: FULANO | Qualificação: Sócio-Administrador"
+    wb.close()
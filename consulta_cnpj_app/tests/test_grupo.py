@@ -0,0 +1,94 @@
+import pytest
+
+from cnpj_core import grupo
+from cnpj_core.cnpj import calcular_digitos_verificadores_cnpj, matriz_da_raiz
+from cnpj_core.indice_local import IndiceLocal
+from cnpj_core.lote import LOTE_STATUS_COL
+from cnpj_core.regime import determinar_regime_unificado
+
+RAIZ = "21746980"
+MATRIZ = "21746980000146"
+
+
+def _filial(raiz, ordem):
+    base = f"{raiz}{ordem:04d}"
+    return base + calcular_digitos_verificadores_cnpj(base)
+
+
+@pytest.mark.parametrize("entrada, raiz", [
+    ("21746980", RAIZ),
+    ("21.746.980", RAIZ),
+    ("21.746.980/0002-27", RAIZ),
+    ("12.abc.345", "12ABC345"),
+    ("21.746.980/0002-28", None),
+    ("2174698", None),
+])
+def test_extrair_raiz(entrada, raiz):
+    assert grupo.extrair_raiz(entrada) == raiz
+
+
+def test_lista_sem_indice_usa_matriz_e_informados(monkeypatch):
+    monkeypatch.setattr(grupo, "get_indice_local", lambda: None)
+    informados = [_filial(RAIZ, 3), "21.746.980/0002-27", _filial(RAIZ, 3), _filial("11222333", 2), "lixo"]
+    cnpjs, origem = grupo.listar_estabelecimentos(RAIZ, informados)
+    assert origem == "informados"
+    assert cnpjs == [MATRIZ, "21746980000227", _filial(RAIZ, 3)]
+
+
+def test_lista_com_indice_local(tmp_path, monkeypatch):
+    indice = IndiceLocal(tmp_path / "indice.sqlite3", somente_leitura=False)
+    indice._conn().executemany(
+        "INSERT INTO estabelecimentos (cnpj, raiz) VALUES (?, ?)",
+        [(MATRIZ, RAIZ), (_filial(RAIZ, 5), RAIZ), (_filial("11222333", 1), "11222333")],
+    )
+    monkeypatch.setattr(grupo, "get_indice_local", lambda: indice)
+    cnpjs, origem = grupo.listar_estabelecimentos(RAIZ, ["21746980000227"])
+    assert origem == "indice_local"
+    assert cnpjs == [MATRIZ, "21746980000227", _filial(RAIZ, 5)]
+
+
+@pytest.fixture
+def stub_sem_indice(criar_stub, apontar_provedores, monkeypatch):
+    monkeypatch.setattr(grupo, "get_indice_local", lambda: None)
+    stub = criar_stub()
+    apontar_provedores(stub)
+    return stub
+
+
+def test_regime_resolvido_uma_vez_pela_matriz(stub_sem_indice):
+    filiais = [_filial(RAIZ, 2), _filial(RAIZ, 3)]
+    resultado = grupo.consultar_grupo(filiais[0], informados=filiais[1:])
+    assert resultado["erro"] is None
+    assert resultado["origem_lista"] == "informados"
+    assert [e["cnpj"] for e in resultado["estabelecimentos"]] == [MATRIZ] + filiais
+    assert [e["matriz"] for e in resultado["estabelecimentos"]] == [True, False, False]
+    matriz = resultado["estabelecimentos"][0]["dados"]
+    assert resultado["regime"] == determinar_regime_unificado(matriz)
+    # Uma consulta por estabelecimento: nenhuma filial busca a matriz de novo
+    assert sum(stub_sem_indice.contadores["brasilapi"].values()) == 3
+    linhas = grupo.linhas_csv_grupo(resultado)
+    assert {linha["Regime Tributário"] for linha in linhas} == {resultado["regime"]}
+    assert {linha[LOTE_STATUS_COL] for linha in linhas} == {"OK"}
+
+
+def test_sem_ies(stub_sem_indice):
+    resultado = grupo.consultar_grupo(RAIZ, incluir_ies=False)
+    assert [e["cnpj"] for e in resultado["estabelecimentos"]] == [matriz_da_raiz(RAIZ)]
+    assert "open_cnpja" not in stub_sem_indice.contadores
+    assert grupo.linhas_csv_grupo(resultado)[0][LOTE_STATUS_COL] == "OK"
+
+
+def test_truncado(stub_sem_indice):
+    informados = [_filial(RAIZ, n) for n in range(2, 8)]
+    resultado = grupo.consultar_grupo(RAIZ, informados=informados, incluir_ies=False, max_estabelecimentos=3)
+    assert resultado["truncado"]
+    assert len(resultado["estabelecimentos"]) == 3
+
+
+def test_erros(criar_stub, apontar_provedores, monkeypatch):
+    monkeypatch.setattr(grupo, "get_indice_local", lambda: None)
+    assert grupo.consultar_grupo("123")["erro"] == "invalid"
+    apontar_provedores(criar_stub(taxa_nao_encontrado=1.0))
+    resultado = grupo.consultar_grupo(RAIZ)
+    assert resultado["erro"] == "not_found"
+    assert grupo.linhas_csv_grupo(resultado)[0][LOTE_STATUS_COL] == "CNPJ não encontrado"
@@ -0,0 +1,93 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+import requests
+
+from cnpj_core.http_client import ClienteHTTP, parse_retry_after
+
+
+def _cliente(**kwargs):
+    kwargs.setdefault("backoff_base", 0.01)
+    kwargs.setdefault("backoff_max", 0.05)
+    return ClienteHTTP("teste", 1000, 1000, **kwargs)
+
+
+def test_retry_after_espera_e_repete(criar_stub, cnpjs):
+    # Rajada de 429 nos primeiros 0,3s com Retry-After 0,4: a segunda tentativa já passa
+    stub = criar_stub(rajada_429_a_cada=60, rajada_429_duracao=0.3, retry_after=0.4)
+    inicio = time.monotonic()
+    resp = _cliente().get(f"{stub.url_base}/brasilapi/{cnpjs[0]}")
+    assert resp.status_code == 200
+    assert time.monotonic() - inicio >= 0.4
+    assert stub.contadores["brasilapi"] == {429: 1, 200: 1}
+
+
+def test_429_esvazia_o_bucket_compartilhado(criar_stub, cnpjs):
+    # Enquanto uma thread espera o Retry-After, as outras do mesmo cliente também recuam
+    stub = criar_stub(rajada_429_a_cada=60, rajada_429_duracao=0.3, retry_after=0.4)
+    cliente = ClienteHTTP("teste", 10, 10)
+    thread = threading.Thread(target=cliente.get, args=(f"{stub.url_base}/brasilapi/{cnpjs[0]}",))
+    thread.start()
+    time.sleep(0.1)
+    assert not cliente.bucket.adquirir(timeout=0)
+    thread.join()
+
+
+def test_retry_after_acima_do_maximo_devolve_429(criar_stub, cnpjs):
+    stub = criar_stub(rajada_429_a_cada=60, rajada_429_duracao=30, retry_after=60)
+    resp = _cliente(retry_after_max=5).get(f"{stub.url_base}/brasilapi/{cnpjs[0]}")
+    assert resp.status_code == 429
+    assert stub.contadores["brasilapi"] == {429: 1}
+
+
+def test_5xx_repete_ate_esgotar_tentativas(criar_stub, cnpjs):
+    stub = criar_stub(taxa_erro=1.0)
+    resp = _cliente(max_tentativas=3).get(f"{stub.url_base}/brasilapi/{cnpjs[0]}")
+    assert resp.status_code == 503
+    assert stub.contadores["brasilapi"] == {503: 3}
+
+
+def test_uma_tentativa_nao_repete(criar_stub, cnpjs):
+    stub = criar_stub(taxa_erro=1.0)
+    assert _cliente(max_tentativas=1).get(f"{stub.url_base}/brasilapi/{cnpjs[0]}").status_code == 503
+    assert stub.contadores["brasilapi"] == {503: 1}
+
+
+def test_404_nao_repete(criar_stub, cnpjs):
+    stub = criar_stub(taxa_nao_encontrado=1.0)
+    resp = _cliente().get(f"{stub.url_base}/brasilapi/{cnpjs[0]}")
+    assert resp.status_code == 404
+    assert stub.contadores["brasilapi"] == {404: 1}
+
+
+def test_erro_de_rede_relancado_apos_tentativas(criar_stub):
+    stub = criar_stub()
+    url = f"{stub.url_base}/brasilapi/00000000000191"
+    stub.parar()
+    with pytest.raises(requests.exceptions.ConnectionError):
+        _cliente(max_tentativas=1, timeout_conexao=0.5).get(url)
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("2") == 2.0
+    assert parse_retry_after("-1") == 0.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("amanhã") is None
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+
+
+@pytest.mark.parametrize("valor, esperado", [(None, "cotas.sqlite3"), ("", "None"), ("/tmp/c.sqlite3", "/tmp/c.sqlite3")])
+def test_cota_compartilhada_por_padrao(valor, esperado):
+    # Sem configuração todo processo (app, API, workers) usa o mesmo arquivo de cota
+    env = {k: v for k, v in os.environ.items() if k != "CNPJ_COTA_PATH"}
+    if valor is not None:
+        env["CNPJ_COTA_PATH"] = valor
+    saida = subprocess.run(
+        [sys.executable, "-c", "from cnpj_core import http_client; print(http_client.COTA_COMPARTILHADA_PATH)"],
+        env=env, capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.dirname(__file__)),
+    ).stdout.strip()
+    assert saida.endswith(esperado)
@@ -0,0 +1,93 @@
+import zipfile
+
+import pytest
+
+from cnpj_core.indice_local import IndiceLocal
+
+
+def _zip(diretorio, nome, linhas):
+    # Mesmo formato dos dados abertos: CSV ";" em latin-1, sem cabeçalho, dentro de um zip
+    caminho = diretorio / f"{nome}.zip"
+    texto = "".join(";".join(f'"{c}"' for c in linha) + "\n" for linha in linhas)
+    with zipfile.ZipFile(caminho, "w") as zf:
+        zf.writestr(f"{nome}.CSV", texto.encode("latin-1"))
+    return caminho
+
+
+def _estabelecimento(raiz, ordem, dv, matriz_filial, uf):
+    linha = [""] * 30
+    linha[:6] = [raiz, ordem, dv, matriz_filial, "EXEMPLO", "02"]
+    linha[10:13] = ["20150302", "6201501", "6202300,6209100"]
+    linha[13:21] = ["AVENIDA", "PAULISTA", "1578", "", "BELA VISTA", "01310100", uf, "7107"]
+    linha[27] = "CONTATO@EXEMPLO.COM.BR"
+    return linha
+
+
+def _socio(raiz, nome):
+    return [raiz, "2", nome, "***123456**", "49", "20150302", "", "", "", "00", "4"]
+
+
+@pytest.fixture
+def dados_abertos(tmp_path):
+    diretorio = tmp_path / "2026-09"
+    diretorio.mkdir()
+    _zip(diretorio, "Cnaes", [["6201501", "Desenvolvimento de programas"], ["6202300", "Customizáveis"]])
+    _zip(diretorio, "Municipios", [["7107", "SAO PAULO"]])
+    _zip(diretorio, "Qualificacoes", [["49", "Sócio-Administrador"]])
+    _zip(diretorio, "Empresas0", [["21746980", "EMPRESA EXEMPLO LTDA", "2062", "49", "150000,00", "03", ""]])
+    _zip(diretorio, "Estabelecimentos0", [
+        _estabelecimento("21746980", "0001", "46", "1", "SP"),
+        _estabelecimento("21746980", "0002", "27", "2", "RJ"),
+    ])
+    _zip(diretorio, "Socios0", [_socio("21746980", "MARIA"), _socio("21746980", "JOSE")])
+    _zip(diretorio, "Simples", [["21746980", "S", "20150302", "00000000", "N", "", ""]])
+    return diretorio
+
+
+def test_importa_e_consulta(tmp_path, dados_abertos):
+    indice = IndiceLocal(tmp_path / "indice.sqlite3", somente_leitura=False)
+    resumo = indice.importar_diretorio(dados_abertos, "2026-09")
+    assert resumo["Estabelecimentos0.zip"] == 2
+    assert list(resumo)[:3] == ["Cnaes.zip", "Municipios.zip", "Qualificacoes.zip"]  # domínios primeiro
+
+    leitura = IndiceLocal(tmp_path / "indice.sqlite3")
+    dados = leitura.consultar("21746980000146")
+    assert dados["razao_social"] == "EMPRESA EXEMPLO LTDA"
+    assert dados["descricao_situacao_cadastral"] == "ATIVA"
+    assert dados["porte"] == "EMPRESA DE PEQUENO PORTE"
+    assert dados["capital_social"] == 150000.0
+    assert dados["cnae_fiscal_descricao"] == "Desenvolvimento de programas"
+    assert dados["municipio"] == "SAO PAULO"
+    assert dados["email"] == "contato@exemplo.com.br"
+    assert dados["opcao_pelo_simples"] is True and dados["opcao_pelo_mei"] is False
+    assert sorted(s["nome_socio"] for s in dados["qsa"]) == ["JOSE", "MARIA"]
+    assert dados["qsa"][0]["qualificacao_socio"] == "Sócio-Administrador"
+    assert [c["codigo"] for c in dados["cnaes_secundarios"]] == [6202300, 6209100]
+    assert dados["__fonte"] == "indice_local"
+    assert leitura.consultar("21746980000300") is None
+    assert leitura.listar_estabelecimentos("21746980") == ["21746980000146", "21746980000227"]
+
+
+def test_filtro_por_uf(tmp_path, dados_abertos):
+    indice = IndiceLocal(tmp_path / "indice.sqlite3", somente_leitura=False)
+    indice.importar_diretorio(dados_abertos, "2026-09", ufs={"SP"})
+    assert indice.listar_estabelecimentos("21746980") == ["21746980000146"]
+
+
+def test_reimportacao_incremental_pula_arquivos(tmp_path, dados_abertos):
+    indice = IndiceLocal(tmp_path / "indice.sqlite3", somente_leitura=False)
+    indice.importar_diretorio(dados_abertos, "2026-09")
+    assert sum(indice.importar_diretorio(dados_abertos, "2026-09").values()) == 0
+    # Nova referência: tudo é relido e o quadro de sócios é substituído, não somado
+    _zip(dados_abertos, "Socios0", [_socio("21746980", "ANA")])
+    assert indice.importar_diretorio(dados_abertos, "2026-10")["Socios0.zip"] == 1
+    assert [s["nome_socio"] for s in indice.consultar("21746980000146")["qsa"]] == ["ANA"]
+
+
+def test_socios_interrompido_nao_duplica(tmp_path, dados_abertos):
+    indice = IndiceLocal(tmp_path / "indice.sqlite3", somente_leitura=False)
+    indice.importar_diretorio(dados_abertos, "2026-09")
+    # Simula a interrupção: as linhas entraram, mas o arquivo não foi registrado
+    indice._conn().execute("DELETE FROM arquivos_importados WHERE arquivo = 'Socios0.zip'")
+    indice.importar_diretorio(dados_abertos, "2026-09")
+    assert len(indice.consultar("21746980000146")["qsa"]) == 2
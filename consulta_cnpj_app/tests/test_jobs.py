@@ -0,0 +1,88 @@
+import pytest
+
+from cnpj_core import jobs
+from cnpj_core.lote import LOTE_STATUS_COL
+
+
+@pytest.fixture
+def fila(tmp_path, criar_stub, apontar_provedores):
+    apontar_provedores(criar_stub())
+    return jobs.FilaJobs(tmp_path / "jobs.sqlite3")
+
+
+def _vencer_leases(fila):
+    fila._conn().execute("UPDATE chunks SET lease_ate = 0 WHERE estado = 'reservado'")
+
+
+def _processar_tudo(fila, worker_id):
+    while (chunk := fila._reservar_chunk(worker_id)) is not None:
+        fila.processar_chunk(chunk, worker_id)
+
+
+def test_retoma_chunk_apos_lease_vencido(fila, cnpjs):
+    job_id = fila.criar(cnpjs[:6], tamanho_chunk=3)
+    # Worker "morto": reservou o chunk, gravou um checkpoint parcial e parou de bater
+    morto = fila._reservar_chunk("morto")
+    assert fila._gravar_checkpoint(job_id, morto["chunk"], "morto", [(morto["inicio"], {"CNPJ": "x", LOTE_STATUS_COL: "OK"})])
+    assert fila._reservar_chunk("vivo")["chunk"] != morto["chunk"]  # lease ainda vale
+    _vencer_leases(fila)
+
+    _processar_tudo(fila, "vivo")
+    # Checkpoint tardio do worker antigo não é aceito: o chunk agora é do "vivo"
+    assert not fila._gravar_checkpoint(job_id, morto["chunk"], "morto", [(morto["inicio"] + 1, {})])
+
+    status = fila.status(job_id)
+    assert (status["estado"], status["feitos"], status["ok"], status["erros"]) == ("concluido", 6, 6, 0)
+    linhas = list(fila.linhas(job_id))
+    assert linhas[0] == {"CNPJ": "x", LOTE_STATUS_COL: "OK"}  # item do checkpoint não foi refeito
+    assert all(linha[LOTE_STATUS_COL] == "OK" for linha in linhas)
+    tentativas = dict(fila._conn().execute("SELECT chunk, tentativas FROM chunks WHERE job_id = ?", (job_id,)).fetchall())
+    assert tentativas[morto["chunk"]] == 2
+
+
+def test_chunk_abandonado_apos_max_tentativas(fila, cnpjs):
+    job_id = fila.criar(cnpjs[:3], tamanho_chunk=3)
+    for _ in range(jobs.CHUNK_MAX_TENTATIVAS):
+        assert fila._reservar_chunk("morto") is not None
+        _vencer_leases(fila)
+    assert fila._reservar_chunk("vivo") is None
+    status = fila.status(job_id)
+    assert (status["estado"], status["feitos"], status["erros"]) == ("concluido", 3, 3)
+    assert {linha[LOTE_STATUS_COL] for linha in fila.linhas(job_id)} == {"Falha no processamento"}
+
+
+def test_linhas_retentaveis_voltam_para_a_fila(fila, cnpjs, monkeypatch):
+    job_id = fila.criar(cnpjs[:3], tamanho_chunk=3)
+    processar = jobs.processar_cnpj_lote
+
+    def falhar_segundo(cnpj):
+        if cnpj == cnpjs[1]:
+            raise RuntimeError("banco ocupado")
+        return processar(cnpj)
+
+    monkeypatch.setattr(jobs, "processar_cnpj_lote", falhar_segundo)
+    _processar_tudo(fila, "w")
+    status = fila.status(job_id)
+    assert (status["estado"], status["ok"], status["erros"]) == ("executando", 2, 1)
+
+    monkeypatch.setattr(jobs, "processar_cnpj_lote", processar)
+    fila._conn().execute("UPDATE chunks SET disponivel_em = 0")
+    _processar_tudo(fila, "w")
+    status = fila.status(job_id)
+    assert (status["estado"], status["feitos"], status["ok"], status["erros"]) == ("concluido", 3, 3, 0)
+
+
+def test_disparo_de_workers_sob_lease(fila, monkeypatch):
+    disparos = []
+    monkeypatch.setattr(jobs.subprocess, "Popen", lambda *a, **k: disparos.append(a))
+    assert fila.garantir_workers(2) == 2
+    assert fila.garantir_workers(2) == 0  # outra sessão, antes dos workers se registrarem
+    assert len(disparos) == 2
+
+
+def test_workers_usam_a_cota_do_processo_que_os_sobe(fila, monkeypatch):
+    ambientes = []
+    monkeypatch.setattr(jobs.subprocess, "Popen", lambda *a, **k: ambientes.append(k["env"]))
+    monkeypatch.setattr(jobs, "COTA_COMPARTILHADA_PATH", "/tmp/cotas_teste.sqlite3")
+    fila.garantir_workers(1)
+    assert ambientes[0]["CNPJ_COTA_PATH"] == "/tmp/cotas_teste.sqlite3"
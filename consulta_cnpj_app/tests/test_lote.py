@@ -0,0 +1,67 @@
+import csv
+
+from cnpj_core.cnpj import format_cnpj_mask
+from cnpj_core.lote import LOTE_CSV_COLS, LOTE_STATUS_COL, executar_lote, extrair_cnpjs_lote, iterar_lote
+
+
+def test_extrai_cnpjs_de_csv_com_cabecalho_e_mascaras():
+    conteudo = (
+        "\ufeffCNPJ;Nome\r\n"
+        "21.746.980/0001-46;Matriz\r\n"
+        "21746980000227;Filial\r\n"
+        "12.abc.345/01de-35,\t12ABC345000188\n"
+        "21.746.980/0001-47;DV errado\n"
+        "123;curto\n"
+    ).encode("utf-8")
+    cnpjs, invalidos = extrair_cnpjs_lote(conteudo)
+    assert cnpjs == ["21746980000146", "21746980000227", "12ABC34501DE35", "12ABC345000188"]
+    assert invalidos == 2  # células com dígito que não formam CNPJ válido; "Nome"/"Matriz" são ignoradas
+
+
+def test_deduplica_mantendo_a_ordem():
+    conteudo = "21746980000227\n21.746.980/0001-46\n21.746.980/0002-27\n21746980000146\n".encode()
+    assert extrair_cnpjs_lote(conteudo) == (["21746980000227", "21746980000146"], 0)
+
+
+def test_arquivo_vazio_ou_latin1():
+    assert extrair_cnpjs_lote(b"") == ([], 0)
+    assert extrair_cnpjs_lote("Razão;21746980000146".encode("latin-1"))[0] == ["21746980000146"]
+
+
+def test_iterar_lote_le_a_entrada_sob_demanda():
+    # Janela limitada de futures: a entrada não é consumida inteira antes do primeiro resultado
+    lidos = []
+
+    def entradas():
+        for i in range(500):
+            lidos.append(i)
+            yield str(i)
+
+    resultados = iterar_lote(entradas(), processar=lambda cnpj: cnpj, max_workers=2)
+    next(resultados)
+    assert len(lidos) <= 2 * 4 + 1
+    assert len(list(resultados)) == 499
+
+
+def test_executar_lote_grava_csv_em_streaming(tmp_path, criar_stub, apontar_provedores, cnpjs):
+    apontar_provedores(criar_stub())
+    progresso = []
+    caminho = tmp_path / "lote.csv"
+    resumo = executar_lote(cnpjs[:5], str(caminho), lambda feitos, total: progresso.append((feitos, total)))
+    assert resumo == {"total": 5, "ok": 5, "erros": 0, "formato": "csv"}
+    assert progresso[-1] == (5, 5) and len(progresso) == 5
+    with open(caminho, encoding="utf-8-sig", newline="") as f:
+        leitor = csv.DictReader(f)
+        linhas = list(leitor)
+    assert leitor.fieldnames == LOTE_CSV_COLS
+    assert sorted(linha["CNPJ"] for linha in linhas) == sorted(format_cnpj_mask(c) for c in cnpjs[:5])
+    assert {linha[LOTE_STATUS_COL] for linha in linhas} == {"OK"}
+
+
+def test_executar_lote_linhas_de_erro(tmp_path, criar_stub, apontar_provedores, cnpjs):
+    apontar_provedores(criar_stub(taxa_nao_encontrado=1.0))
+    caminho = tmp_path / "lote.csv"
+    resumo = executar_lote(cnpjs[:3], str(caminho))
+    assert (resumo["ok"], resumo["erros"]) == (0, 3)
+    with open(caminho, encoding="utf-8-sig", newline="") as f:
+        assert {linha[LOTE_STATUS_COL] for linha in csv.DictReader(f)} == {"CNPJ não encontrado"}
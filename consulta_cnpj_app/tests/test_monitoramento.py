@@ -0,0 +1,72 @@
+import pytest
+
+from cnpj_core import get_cache
+from cnpj_core.monitoramento import Monitoramento, diferencas, estado_monitorado
+
+
+def _estado(**campos):
+    estado = {"situacao": "ATIVO", "regime": "SIMPLES NACIONAL", "simples": True, "mei": False,
+              "ies": [["SP", "123", True]]}
+    estado.update(campos)
+    return estado
+
+
+def test_estado_monitorado_marca_campos_ausentes_como_desconhecidos():
+    dados = {"descricao_situacao_cadastral": "ATIVA", "opcao_pelo_simples": True}
+    estado = estado_monitorado(dados, None, None)
+    assert estado["regime"] is None and estado["mei"] is None and estado["ies"] is None
+    assert estado["simples"] is True
+
+
+def test_sem_diferencas():
+    assert diferencas(_estado(), _estado()) == []
+
+
+def test_diferencas_de_situacao_simples_e_ie():
+    depois = _estado(situacao="INAPTO", simples=False, ies=[["SP", "123", False], ["MG", "9", True]])
+    mudancas = {(m["campo"], m["descricao"]) for m in diferencas(_estado(), depois)}
+    assert mudancas == {
+        ("situacao", "Situação cadastral: ATIVO → INAPTO"),
+        ("simples", "Saída do Simples Nacional"),
+        ("ie", "IE SP 123 desabilitada"),
+        ("ie", "Nova IE: MG 9"),
+    }
+
+
+def test_ie_removida():
+    assert [m["descricao"] for m in diferencas(_estado(), _estado(ies=[]))] == ["IE removida: SP 123"]
+
+
+@pytest.mark.parametrize("campo", ["regime", "simples", "mei", "ies"])
+def test_campo_desconhecido_nao_vira_mudanca(campo):
+    assert diferencas(_estado(), _estado(**{campo: None})) == []
+    assert diferencas(_estado(**{campo: None}), _estado()) == []
+
+
+@pytest.fixture
+def monitoramento(tmp_path, criar_stub, apontar_provedores):
+    stub = criar_stub()
+    apontar_provedores(stub)
+    return Monitoramento(tmp_path / "monitoramento.sqlite3"), stub
+
+
+def test_verificar_detecta_mudanca_no_upstream(monitoramento, cnpjs):
+    mon, stub = monitoramento
+    mon.adicionar([cnpjs[0]])
+    assert mon.verificar(cnpjs[0])["resultado"] == "baseline"
+    assert mon.verificar(cnpjs[0])["resultado"] == "cache"  # nada novo: sem rede
+
+    stub.alterar_payload("brasilapi", descricao_situacao_cadastral="INAPTA")
+    get_cache().limpar()
+    resultado = mon.verificar(cnpjs[0])
+    assert resultado["resultado"] == "alterado"
+    assert [m["campo"] for m in resultado["mudancas"]] == ["situacao"]
+    assert mon.mudancas()[0]["depois"] == "INAPTO"
+
+
+def test_verificar_ignora_falha_das_ies(monitoramento, cnpjs, criar_stub, apontar_provedores):
+    mon, stub = monitoramento
+    mon.adicionar([cnpjs[0]])
+    mon.verificar(cnpjs[0])
+    apontar_provedores(stub, open_cnpja=criar_stub(taxa_erro=1.0))
+    assert mon.verificar(cnpjs[0])["resultado"] == "sem_mudanca"
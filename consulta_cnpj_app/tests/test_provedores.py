@@ -0,0 +1,105 @@
+import time
+
+import pytest
+
+from cnpj_core import provedores
+
+
+def test_primeiro_provedor_responde(criar_stub, apontar_provedores, cnpjs):
+    stub = criar_stub()
+    apontar_provedores(stub)
+    dados = provedores.consultar_dados_cnpj(cnpjs[0])
+    assert dados["cnpj"] == cnpjs[0]
+    assert dados["__fonte"] == "brasilapi"
+    assert set(stub.contadores) == {"brasilapi"}
+
+
+def test_failover_quando_indisponivel(criar_stub, apontar_provedores, cnpjs):
+    fora = criar_stub(taxa_erro=1.0)
+    ok = criar_stub()
+    apontar_provedores(ok, brasilapi=fora)
+    dados = provedores.consultar_dados_cnpj(cnpjs[0])
+    assert dados["__fonte"] == "open_cnpja"
+    assert dados["cnpj"] == cnpjs[0]
+    assert "receitaws" not in ok.contadores
+
+
+def test_nao_encontrado_e_definitivo(criar_stub, apontar_provedores, cnpjs):
+    stub = criar_stub(taxa_nao_encontrado=1.0)
+    apontar_provedores(stub)
+    assert provedores.consultar_dados_cnpj(cnpjs[0]) == {"__error": "not_found"}
+    assert set(stub.contadores) == {"brasilapi"}
+
+
+def test_todos_indisponiveis(criar_stub, apontar_provedores, cnpjs):
+    stub = criar_stub(taxa_erro=1.0)
+    apontar_provedores(stub)
+    assert provedores.consultar_dados_cnpj(cnpjs[0]) == {"__error": "unavailable"}
+    assert set(stub.contadores) == {"brasilapi", "open_cnpja", "receitaws"}
+
+
+def test_sem_hedging_espera_o_provedor_lento(criar_stub, apontar_provedores, cnpjs):
+    lento = criar_stub(latencia_ms=800)
+    rapido = criar_stub()
+    apontar_provedores(rapido, brasilapi=lento)
+    inicio = time.monotonic()
+    dados = provedores.consultar_dados_cnpj(cnpjs[0], hedge_apos=0)
+    assert dados["__fonte"] == "brasilapi"
+    assert time.monotonic() - inicio >= 0.8
+    assert rapido.contadores == {}
+
+
+def test_hedge_disparado_apos_hedge_apos(criar_stub, apontar_provedores, cnpjs):
+    # O hedge sai só depois de hedge_apos, pula o open.cnpja (hedge=False) e a
+    # primeira resposta conclusiva vence
+    lento = criar_stub(latencia_ms=800)
+    rapido = criar_stub(latencia_ms=20)
+    apontar_provedores(rapido, brasilapi=lento)
+    inicio = time.monotonic()
+    dados = provedores.consultar_dados_cnpj(cnpjs[0], hedge_apos=0.3)
+    decorrido = time.monotonic() - inicio
+    assert dados["__fonte"] == "receitaws"
+    assert 0.3 <= decorrido < 0.7
+    assert set(rapido.contadores) == {"receitaws"}
+
+
+def test_hedge_nao_disparado_se_resposta_chega_antes(criar_stub, apontar_provedores, cnpjs):
+    stub = criar_stub(latencia_ms=50)
+    apontar_provedores(stub)
+    dados = provedores.consultar_dados_cnpj(cnpjs[0], hedge_apos=0.3)
+    assert dados["__fonte"] == "brasilapi"
+    assert set(stub.contadores) == {"brasilapi"}
+
+
+def _nomes(ordem):
+    return [p.nome for p in ordem]
+
+
+def test_historico_normal_nao_muda_a_ordem(monkeypatch):
+    # Dez sucessos de 1,2s da BrasilAPI não a colocam atrás de provedores sem histórico
+    monkeypatch.setattr(provedores, "ESTATISTICAS", provedores.EstatisticasProvedores())
+    for _ in range(10):
+        provedores.ESTATISTICAS.registrar("brasilapi", 1.2, True)
+    assert _nomes(provedores.ordenar_provedores()) == ["brasilapi", "open_cnpja", "receitaws"]
+
+
+def test_rebaixado_nao_promove_provedor_de_cota_apertada(monkeypatch):
+    monkeypatch.setattr(provedores, "ESTATISTICAS", provedores.EstatisticasProvedores())
+    for _ in range(5):
+        provedores.ESTATISTICAS.registrar("brasilapi", 0.1, False)
+    assert _nomes(provedores.ordenar_provedores()) == ["receitaws", "open_cnpja", "brasilapi"]
+    for _ in range(5):
+        provedores.ESTATISTICAS.registrar("receitaws", 0.1, False)
+    # Todos os demais rebaixados: ainda assim o open.cnpja não vai para a frente
+    assert _nomes(provedores.ordenar_provedores())[0] != "open_cnpja"
+    for _ in range(20):
+        provedores.ESTATISTICAS.registrar("brasilapi", 0.1, True)
+    assert _nomes(provedores.ordenar_provedores()) == ["brasilapi", "open_cnpja", "receitaws"]
+
+
+def test_provedor_exige_normalizar():
+    class SemNormalizar(provedores.Provedor):
+        nome = "teste"
+
+    with pytest.raises(TypeError):
+        SemNormalizar()
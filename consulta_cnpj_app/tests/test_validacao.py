@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+
+from benchmarks.bench_carga import gerar_cnpjs_validos
+from cnpj_core.cnpj import cnpj_valido, matriz_da_raiz, normalizar_cnpj, to_matriz_if_filial
+from cnpj_core.validacao import agrupar_por_raiz, validar_cnpjs
+
+CASOS = [
+    ("21746980000146", True),
+    ("21.746.980/0001-46", True),
+    ("CNPJ: 21.746.980/0002-27 (filial)", True),
+    ("21.746.980/0001-47", False),   # DV errado
+    ("11111111111111", False),       # dígitos repetidos passam no cálculo, mas são inválidos
+    ("00000000000000", False),
+    ("2174698000014", False),        # 13 caracteres
+    ("", False),
+    ("sem número", False),
+]
+
+
+@pytest.mark.parametrize("entrada, valido", CASOS)
+def test_cnpj_valido_escalar(entrada, valido):
+    assert cnpj_valido(entrada) is valido
+
+
+def test_validar_cnpjs_vetorizado():
+    colunas = validar_cnpjs([entrada for entrada, _ in CASOS])
+    assert colunas["valido"].tolist() == [valido for _, valido in CASOS]
+    assert colunas["cnpj"][2] == "21746980000227"
+    assert colunas["cnpj"][6] == ""  # tamanho errado fica vazio
+
+
+def test_lista_vazia():
+    colunas = validar_cnpjs([])
+    assert all(len(v) == 0 for v in colunas.values())
+    assert agrupar_por_raiz([]) == {}
+
+
+def test_paridade_escalar_vetorizado():
+    # CNPJs válidos e as mesmas bases com o último dígito trocado
+    validos = gerar_cnpjs_validos(300, 11)
+    trocados = [c[:13] + str((int(c[13]) + 1) % 10) for c in validos]
+    entradas = validos + trocados + [c for c, _ in CASOS]
+    colunas = validar_cnpjs(entradas)
+    assert colunas["valido"].tolist() == [cnpj_valido(c) for c in entradas]
+    assert colunas["cnpj"].tolist() == [normalizar_cnpj(c) if len(normalizar_cnpj(c)) == 14 else "" for c in entradas]
+
+
+def test_derivacao_da_matriz():
+    colunas = validar_cnpjs(["21746980000227", "21746980000146"])
+    assert colunas["matriz"].tolist() == ["21746980000146", "21746980000146"]
+    assert colunas["eh_matriz"].tolist() == [False, True]
+    assert colunas["raiz"].tolist() == ["21746980", "21746980"]
+    assert to_matriz_if_filial("21746980000227") == matriz_da_raiz("21746980") == "21746980000146"
+
+
+def test_agrupar_por_raiz():
+    grupos = agrupar_por_raiz(["21746980000227", "21.746.980/0001-46", "21746980000147"])
+    assert list(grupos) == ["21746980"]
+    assert sorted(grupos["21746980"].tolist()) == ["21746980000146", "21746980000227"]
+    assert isinstance(grupos["21746980"], np.ndarray)
+
+
+# ---------- CNPJ alfanumérico ----------
+ALFANUMERICOS = [
+    ("12ABC34501DE35", True),
+    ("12.ABC.345/01DE-35", True),
+    ("12.abc.345/01de-35", True),     # minúsculas são normalizadas
+    ("12ABC34501DE36", False),
+    ("12ABC34501DEA5", False),        # DV precisa ser numérico
+    ("AAAAAAAAAAAAAA", False),
+]
+
+
+@pytest.mark.parametrize("entrada, valido", ALFANUMERICOS)
+def test_alfanumerico_escalar_e_vetorizado(entrada, valido):
+    assert cnpj_valido(entrada) is valido
+    colunas = validar_cnpjs([entrada])
+    assert bool(colunas["valido"][0]) is valido
+    assert bool(colunas["alfanumerico"][0])
+
+
+def test_alfanumerico_normalizado_em_maiusculas():
+    assert normalizar_cnpj("12.abc.345/01de-35") == "12ABC34501DE35"
+    assert validar_cnpjs(["12.abc.345/01de-35"])["cnpj"][0] == "12ABC34501DE35"
+
+
+def test_matriz_alfanumerica():
+    colunas = validar_cnpjs(["12ABC34501DE35"])
+    assert colunas["matriz"][0] == "12ABC345000188"
+    assert colunas["raiz"][0] == "12ABC345"
+    assert to_matriz_if_filial("12ABC34501DE35") == matriz_da_raiz("12ABC345") == "12ABC345000188"
+    assert cnpj_valido("12ABC345000188")
+
+
+def test_paridade_alfanumerica():
+    entradas = [c for c, _ in ALFANUMERICOS] + ["12ABC345000188", "CNPJ 12.ABC.345/01DE-35"]
+    colunas = validar_cnpjs(entradas)
+    assert colunas["valido"].tolist() == [cnpj_valido(c) for c in entradas]